@@ -9,7 +9,7 @@
     "author": "Midhexe",
     "website": "",
     "license": "AGPL-3",
-    "version": "17.0.1.0",
+    "version": "17.0.1.1",
     "depends": ["web", "mail"],
     "data": [
         "security/ir.model.access.csv",
@@ -18,8 +18,19 @@
         "views/res_config_settings_views.xml",
         "views/pricing_tier_views.xml",
         "views/backup_views.xml",
+        "views/backup_restore_views.xml",
+        "views/job_views.xml",
+        "views/port_views.xml",
+        "views/metric_views.xml",
+        "views/tier_rollout_views.xml",
         "views/menu.xml",
         "data/backup_cron.xml",
+        "data/job_cron.xml",
+        "data/port_data.xml",
+        "data/reconcile_cron.xml",
+        "data/events_cron.xml",
+        "data/metrics_cron.xml",
+        "data/rollout_cron.xml",
     ],
     'assets': {
         'web.assets_backend': [
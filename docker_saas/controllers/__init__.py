@@ -2,3 +2,4 @@
 from . import backup_download
 from . import module_upload
 
+from . import git_webhook
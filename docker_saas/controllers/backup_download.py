@@ -1,8 +1,29 @@
 # -*- coding: utf-8 -*-
+import mimetypes
 import os
+from urllib.parse import quote
+
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
 
 from odoo import http
-from odoo.http import request, content_disposition
+from odoo.http import Stream, request, content_disposition
+
+from ..tools.backup_stream import CHUNK_SIZE
+
+# Compressed archives are sent as such, not as the archive they contain
+ENCODING_MIMETYPES = {
+    'gzip': 'application/gzip',
+    'bzip2': 'application/x-bzip2',
+    'xz': 'application/x-xz',
+}
+
+
+def guess_mimetype(file_name):
+    mimetype, encoding = mimetypes.guess_type(file_name)
+    if encoding:
+        return ENCODING_MIMETYPES.get(encoding, 'application/octet-stream')
+    return mimetype or 'application/octet-stream'
 
 
 class BackupDownloadController(http.Controller):
@@ -16,13 +37,57 @@ class BackupDownloadController(http.Controller):
         if not backup.file_path or not os.path.exists(backup.file_path):
             return request.not_found()
 
-        file_name = backup.name or os.path.basename(backup.file_path)
-        with open(backup.file_path, 'rb') as backup_file:
-            file_content = backup_file.read()
-        
-        headers = [
-            ('Content-Type', 'application/zip'),
-            ('Content-Disposition', content_disposition(file_name)),
-        ]
-        return request.make_response(file_content, headers=headers)
+        file_path = os.path.abspath(backup.file_path)
+        file_name = backup.name or os.path.basename(file_path)
+        mimetype = guess_mimetype(file_name)
+
+        if backup.storage == 'repository':
+            return self._stream_repository_backup(backup, file_name, mimetype)
+
+        accel_prefix = request.env['ir.config_parameter'].sudo().get_param('docker_saas.backup_accel_redirect_prefix')
+        if accel_prefix:
+            # Let the reverse proxy stream the file (ranges included) from an internal location
+            headers = [
+                ('Content-Type', mimetype),
+                ('Content-Disposition', content_disposition(file_name)),
+                ('X-Accel-Redirect', accel_prefix.rstrip('/') + quote(file_path)),
+            ]
+            if backup.checksum:
+                headers.append(('ETag', f'"{backup.checksum}"'))
+            return request.make_response(b'', headers=headers)
+
+        # Streams from disk in chunks and answers Range / If-None-Match requests. Built
+        # directly: Stream.from_path only serves files from the addons paths.
+        stat = os.stat(file_path)
+        return Stream(
+            type='path',
+            path=file_path,
+            mimetype=mimetype,
+            download_name=file_name,
+            etag=backup.checksum or f'{int(stat.st_mtime)}-{stat.st_size}',
+            last_modified=stat.st_mtime,
+            size=stat.st_size,
+            max_age=0,
+        ).get_response(as_attachment=True)
+
+    def _stream_repository_backup(self, backup, file_name, mimetype):
+        """Rebuild a deduplicated backup from its chunks while sending it.
 
+        Range requests only rebuild the chunks they cover: the archive seeks
+        through the chunk sizes listed in the manifest.
+        """
+        # Opened now: the response is sent after the request cursor is closed
+        archive = backup._open_archive()
+        response = Response(
+            wrap_file(request.httprequest.environ, archive, CHUNK_SIZE),
+            mimetype=mimetype,
+            headers=[('Content-Disposition', content_disposition(file_name))],
+            direct_passthrough=True,
+        )
+        response.content_length = int(backup.file_size)
+        response.accept_ranges = 'bytes'
+        if backup.checksum:
+            response.set_etag(backup.checksum)
+        return response.make_conditional(
+            request.httprequest, accept_ranges=True, complete_length=int(backup.file_size),
+        )
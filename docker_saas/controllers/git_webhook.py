@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import hmac
+import json
+import logging
+
+from odoo import http
+from odoo.http import request
+
+from ..tools.git_sync import normalize_repo_url
+
+_logger = logging.getLogger(__name__)
+
+
+class GitWebhookController(http.Controller):
+
+    def _check_signature(self, payload):
+        """Verify GitHub's HMAC-SHA256 signature of the raw payload"""
+        secret = request.env['ir.config_parameter'].sudo().get_param('docker_saas.git_webhook_secret')
+        signature = request.httprequest.headers.get('X-Hub-Signature-256', '')
+        if not secret or not signature:
+            return False
+        expected = 'sha256=' + hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    @http.route('/docker_saas/git/webhook', type='http', auth='public', methods=['POST'], csrf=False)
+    def git_webhook(self, **kwargs):
+        """Queue the addons synchronization of the instances a push targets"""
+        payload = request.httprequest.get_data()
+        if not self._check_signature(payload):
+            _logger.warning("Rejected git webhook with a missing or invalid signature")
+            return http.Response("Invalid signature", status=403)
+
+        event = request.httprequest.headers.get('X-GitHub-Event', 'push')
+        if event == 'ping':
+            return http.Response("pong")
+        if event != 'push':
+            return http.Response("Ignored", status=202)
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return http.Response("Invalid payload", status=400)
+
+        repository = data.get('repository') or {}
+        urls = {
+            normalize_repo_url(repository.get(key))
+            for key in ('clone_url', 'html_url', 'ssh_url', 'git_url')
+            if repository.get(key)
+        }
+        ref = data.get('ref') or ''
+        if not urls or not ref.startswith('refs/heads/') or data.get('deleted'):
+            return http.Response("Ignored", status=202)
+        branch = ref[len('refs/heads/'):]
+
+        Instance = request.env['docker.instance'].sudo()
+        instances = Instance.search([('github_repo_url', '!=', False), ('state', '!=', 'draft')]).filtered(
+            lambda inst: normalize_repo_url(inst.github_repo_url) in urls
+            and (inst.git_branch or repository.get('default_branch')) == branch
+        )
+        if instances:
+            _logger.info("Push to %s on %s: syncing %s", branch, ', '.join(sorted(urls)), ', '.join(instances.mapped('name')))
+            request.env['docker.instance.job'].sudo()._enqueue(instances, 'sync_addons')
+        return http.Response(f"Queued {len(instances)} instances", status=202)
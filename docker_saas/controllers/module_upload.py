@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-
+import json
 import logging
 import os
 import shutil
-import zipfile
+import uuid
 from urllib.parse import unquote
 
 from werkzeug.exceptions import NotFound
 
 from odoo import http
 from odoo.http import request
+from odoo.tools import config
+
+from ..tools.backup_stream import CHUNK_SIZE
+from ..tools.module_index import module_index
+from ..tools.module_upload import ChunkedUpload, UploadError, extract_modules
 
 _logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_UPLOAD_MB = 200
+DEFAULT_MAX_ENTRIES = 20000
+
 
 class DockerSaasModuleController(http.Controller):
 
@@ -26,40 +35,63 @@ class DockerSaasModuleController(http.Controller):
         os.makedirs(normalized, exist_ok=True)
         return normalized
 
-    @http.route('/docker_saas/files/list', type='json', auth='user')
-    def list_files(self, **kwargs):
-        addons_path = kwargs.get('addons_path')
-        if not addons_path:
-            _logger.debug("list_files called without addons_path")
-            return {'files': []}
-        addons_path = self._ensure_path(addons_path)
-        _logger.info("Listing custom modules in %s", addons_path)
-        entries = []
-        if os.path.exists(addons_path):
-            for entry in sorted(os.listdir(addons_path)):
-                if entry.startswith('.'):
-                    continue
-                full_path = os.path.join(addons_path, entry)
-                if os.path.isdir(full_path):
-                    entries.append(entry)
-                    _logger.debug("Found module directory: %s", entry)
-        else:
-            _logger.warning("Custom addons path does not exist: %s", addons_path)
-        return {'files': entries}
+    @http.route('/docker_saas/modules/index/<int:instance_id>', type='http', auth='user', methods=['GET'])
+    def get_module_index(self, instance_id, **kwargs):
+        """Module catalog of the addons of an instance, answering 304 while it is unchanged"""
+        instance = request.env['docker.instance'].browse(instance_id).exists()
+        if not instance:
+            raise NotFound("Instance not found")
+        instance.check_access_rule('read')
+        if not instance.instance_path:
+            return http.Response("Instance path is not configured", status=400)
+        modules, etag = module_index.get(os.path.join(instance.instance_path, 'addons'))
+        headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'no-cache')]
+        if f'"{etag}"' in request.httprequest.headers.get('If-None-Match', ''):
+            return http.Response(status=304, headers=headers)
+        return request.make_response(
+            json.dumps({'modules': modules, 'etag': etag}),
+            headers=headers + [('Content-Type', 'application/json')],
+        )
+
+    def _get_upload_limits(self):
+        params = request.env['ir.config_parameter'].sudo()
+        max_mb = int(params.get_param('docker_saas.module_upload_max_mb', DEFAULT_MAX_UPLOAD_MB) or DEFAULT_MAX_UPLOAD_MB)
+        max_entries = int(params.get_param('docker_saas.module_upload_max_entries', DEFAULT_MAX_ENTRIES)
+                          or DEFAULT_MAX_ENTRIES)
+        return max_mb * 1024 ** 2, max_entries
+
+    def _get_upload_root(self):
+        return os.path.join(config['data_dir'], 'docker_saas', 'uploads')
+
+    def _install_modules(self, zip_path, pvc_path, instance):
+        """Extract an uploaded module archive and schedule the reload of the instance"""
+        max_size, max_entries = self._get_upload_limits()
+        changed = extract_modules(zip_path, pvc_path, max_size, max_entries)
+        if not changed:
+            _logger.info("Uploaded modules identical to those in %s, nothing to reload", pvc_path)
+            return changed
+        _logger.info("Installed %s into %s", ', '.join(changed), pvc_path)
+        instance_rec = self._get_instance_by_name(instance)
+        _logger.info("Scheduling reload of instance '%s' after module upload", instance)
+        instance_rec._schedule_module_reload()
+        return changed
 
     @http.route('/docker_saas/file/upload/<path:pvc_path>/<string:instance>', type='http', auth='user', methods=['POST'], csrf=False)
     def upload_file(self, pvc_path, instance, **kwargs):
         pvc_path = self._ensure_path(unquote(pvc_path))
         _logger.info("Received upload request for instance '%s' into path %s", instance, pvc_path)
-        
+
         # Handle both old-style and new-style file uploads
         uploaded_file = None
         if 'filepond' in request.httprequest.files:
             uploaded_file = request.httprequest.files['filepond']
         elif 'file' in request.httprequest.files:
             uploaded_file = request.httprequest.files['file']
-        
+
         if not uploaded_file:
+            upload_length = request.httprequest.headers.get('Upload-Length')
+            if upload_length:
+                return self._open_chunked_upload(pvc_path, instance, upload_length)
             _logger.error("Upload failed: no file provided")
             return http.Response("No file uploaded", status=400)
 
@@ -68,28 +100,72 @@ class DockerSaasModuleController(http.Controller):
             _logger.error("Upload failed: non-zip file '%s'", filename)
             return http.Response("Only ZIP archives are supported", status=400)
 
-        target_zip = os.path.join(pvc_path, filename)
+        target_zip = os.path.join(pvc_path, f'.{filename}.{uuid.uuid4().hex}')
         _logger.debug("Saving uploaded file to %s", target_zip)
-        with open(target_zip, 'wb') as destination:
-            destination.write(uploaded_file.read())
-
         try:
-            with zipfile.ZipFile(target_zip, 'r') as archive:
-                _logger.info("Extracting ZIP '%s' into %s", filename, pvc_path)
-                archive.extractall(pvc_path)
-        except zipfile.BadZipFile:
-            _logger.exception("Bad ZIP archive uploaded: %s", filename)
-            os.remove(target_zip)
-            return http.Response("Invalid ZIP archive", status=400)
+            # Streamed to disk, never held in memory as a whole
+            uploaded_file.save(target_zip, buffer_size=CHUNK_SIZE)
+            self._install_modules(target_zip, pvc_path, instance)
+        except UploadError as exc:
+            _logger.error("Module upload '%s' rejected: %s", filename, exc)
+            return http.Response(str(exc), status=exc.status)
         finally:
             if os.path.exists(target_zip):
                 _logger.debug("Removing temporary ZIP %s", target_zip)
                 os.remove(target_zip)
 
-        instance_rec = self._get_instance_by_name(instance)
-        _logger.info("Restarting instance '%s' after module upload", instance)
-        instance_rec.action_restart_instance()
+        return http.Response("File processed successfully")
 
+    def _open_chunked_upload(self, pvc_path, instance, upload_length):
+        """Start a FilePond chunked transfer and answer with its id"""
+        max_size, _max_entries = self._get_upload_limits()
+        try:
+            length = int(upload_length)
+        except ValueError:
+            return http.Response("Invalid Upload-Length", status=400)
+        if length <= 0 or length > max_size:
+            return http.Response(f"Uploads are limited to {max_size // 1024 ** 2} MiB", status=413)
+        upload = ChunkedUpload.open(self._get_upload_root(), length, {
+            'pvc_path': pvc_path,
+            'instance': instance,
+            'uid': request.env.uid,
+        })
+        _logger.info("Opened chunked upload %s (%s bytes) for instance '%s'", upload.transfer_id, length, instance)
+        return http.Response(upload.transfer_id, mimetype='text/plain')
+
+    @http.route('/docker_saas/file/upload/chunk/<string:transfer_id>', type='http', auth='user', methods=['HEAD', 'PATCH'], csrf=False)
+    def upload_chunk(self, transfer_id, **kwargs):
+        """Receive a chunk (PATCH) or report where to resume a transfer (HEAD)"""
+        httprequest = request.httprequest
+        try:
+            upload = ChunkedUpload(self._get_upload_root(), transfer_id)
+            metadata = upload.metadata
+            if metadata['uid'] != request.env.uid:
+                raise UploadError("Unknown transfer", status=404)
+            if httprequest.method == 'HEAD':
+                return http.Response(headers=[('Upload-Offset', str(metadata['offset']))])
+
+            filename = os.path.basename(httprequest.headers.get('Upload-Name', ''))
+            if not filename.endswith('.zip'):
+                upload.discard()
+                raise UploadError("Only ZIP archives are supported")
+            offset = int(httprequest.headers.get('Upload-Offset', -1))
+            size = httprequest.content_length
+            if offset < 0 or size is None:
+                raise UploadError("Missing Upload-Offset or Content-Length")
+            if not upload.write_chunk(offset, size, httprequest.stream):
+                return http.Response(status=204)
+
+            _logger.info("Chunked upload %s of '%s' complete", transfer_id, filename)
+            try:
+                self._install_modules(upload.data_path, metadata['pvc_path'], metadata['instance'])
+            finally:
+                upload.discard()
+        except UploadError as exc:
+            _logger.error("Chunked upload %s rejected: %s", transfer_id, exc)
+            return http.Response(str(exc), status=exc.status)
+        except ValueError:
+            return http.Response("Invalid Upload-Offset", status=400)
         return http.Response("File processed successfully")
 
     @http.route('/docker_saas/file/delete', type='json', auth='user', methods=['POST'], csrf=False)
@@ -118,8 +194,8 @@ class DockerSaasModuleController(http.Controller):
             os.remove(target)
 
         if instance:
-            _logger.info("Restarting instance '%s' after deleting module '%s'", instance, file_name)
-            self._get_instance_by_name(instance).action_restart_instance()
+            _logger.info("Scheduling reload of instance '%s' after deleting module '%s'", instance, file_name)
+            self._get_instance_by_name(instance)._schedule_module_reload()
 
         return {'status': 'success'}
 
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+
+def _migrate_retention(cr):
+    # days_to_keep gave way to keep_daily / keep_weekly / keep_monthly: keep
+    # one backup per day over the same period instead of the new defaults
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_name = 'docker_backup_config' AND column_name = 'days_to_keep'
+    """)
+    if not cr.fetchone():
+        return
+    cr.execute("""
+        UPDATE docker_backup_config
+           SET keep_daily = GREATEST(days_to_keep, 0),
+               keep_weekly = 0,
+               keep_monthly = 0,
+               auto_prune = auto_prune AND COALESCE(days_to_keep, 0) > 0
+    """)
+    cr.execute("ALTER TABLE docker_backup_config DROP COLUMN days_to_keep")
+
+
+def _migrate_addons_sync_method(cr):
+    # The built-in synchronization became the default: installs relying on Jenkins keep it
+    cr.execute("""
+        INSERT INTO ir_config_parameter (key, value, create_date, write_date)
+        SELECT 'docker_saas.addons_sync_method', 'jenkins', now() at time zone 'UTC', now() at time zone 'UTC'
+         WHERE EXISTS (
+                   SELECT 1 FROM ir_config_parameter
+                    WHERE key = 'docker_saas.jenkins_url' AND COALESCE(value, '') != ''
+               )
+           AND NOT EXISTS (
+                   SELECT 1 FROM ir_config_parameter WHERE key = 'docker_saas.addons_sync_method'
+               )
+    """)
+
+
+def migrate(cr, version):
+    _migrate_retention(cr)
+    _migrate_addons_sync_method(cr)
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    # Ports are reserved per Docker host: the same HTTP port may be used on two hosts
+    cr.execute("ALTER TABLE docker_instance DROP CONSTRAINT IF EXISTS docker_instance_unique_http_port")
@@ -2,4 +2,9 @@ from . import docker_instance
 from . import res_config_settings
 from . import backup_config
 from . import pricing_tier
-
+from . import docker_instance_job
+from . import port_reservation
+from . import docker_event_cursor
+from . import docker_instance_metric
+from . import tier_rollout
+from . import backup_restore
@@ -1,6 +1,17 @@
 # -*- coding: utf-8 -*-
+import io
 import logging
 import os
+import shlex
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+import contextlib
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import requests
@@ -9,8 +20,26 @@ from dateutil.relativedelta import relativedelta
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 
+from ..tools.archive import DUMP_PREFIX, FILESTORE_PREFIX, METADATA_NAME, TarSplitter, add_json, add_tar_stream
+from ..tools.backup_stream import CHUNK_SIZE, BackupWriter
+from ..tools.chunk_store import MANIFEST_SUFFIX, ChunkStore, ManifestReader, RepositoryWriter
+from ..tools.compression import COMPRESSIONS, EXTENSIONS, CompressingWriter, open_decompressed, zstd_available
+from ..tools.pool import run_in_threads
+
 _logger = logging.getLogger(__name__)
 
+BACKUP_METHODS = [
+    ('http', 'Odoo Database Manager (zip)'),
+    ('pg_dump', 'Parallel pg_dump (tar)'),
+]
+BACKUP_STORAGES = [
+    ('archive', 'Standalone Archive'),
+    ('repository', 'Deduplicated Repository'),
+]
+FILESTORE_ROOT = '/var/lib/odoo/filestore'
+# Chunk repository shared by the backups of a directory
+REPOSITORY_DIR = '.repository'
+
 
 class DockerBackupConfig(models.Model):
     _name = 'docker.backup.config'
@@ -47,15 +76,63 @@ class DockerBackupConfig(models.Model):
         help='Absolute path where backup archives will be stored.',
         tracking=True,
     )
+    backup_method = fields.Selection(
+        BACKUP_METHODS,
+        default='http',
+        required=True,
+        tracking=True,
+        help="Odoo Database Manager: zip produced by the instance's own /web/database/backup endpoint.\n"
+             "Parallel pg_dump: directory-format dump run with several jobs inside the database "
+             "container, plus the filestore read from the Odoo container, in one tar archive.",
+    )
+    storage = fields.Selection(
+        BACKUP_STORAGES,
+        default='archive',
+        required=True,
+        tracking=True,
+        help="Standalone Archive: one complete file per backup.\n"
+             "Deduplicated Repository: backups are cut into content-addressed chunks stored once in "
+             "the backup directory, so each backup only adds what changed since the others. "
+             "Works best with the pg_dump method, whose tar archive is cut at file boundaries.",
+    )
+    compression = fields.Selection(
+        COMPRESSIONS,
+        default='none',
+        required=True,
+        tracking=True,
+        help="Compression applied while the backup is captured. Repositories compress each chunk "
+             "separately so chunks stay shareable. The database manager zip is already deflated: "
+             "compression pays off with the pg_dump method, whose dump is then left uncompressed.",
+    )
+    compression_level = fields.Integer(
+        default=3,
+        help="zstd: 1 (fastest) to 19; gzip: 1 to 9.",
+    )
+    compression_threads = fields.Integer(
+        default=0,
+        help="zstd worker threads: 0 compresses in the backup thread, -1 uses one per CPU.",
+    )
+    dump_jobs = fields.Integer(
+        string='Dump Jobs',
+        default=4,
+        help="Number of parallel pg_dump / pg_restore jobs.",
+    )
     auto_prune = fields.Boolean(
         string='Remove Old Backups',
         default=True,
-        help='Automatically delete backups older than configured days.',
+        help='Automatically delete the backups the retention policy no longer keeps.',
+    )
+    keep_daily = fields.Integer(
+        default=7,
+        help="Keep the latest backup of each of the last N days with a backup.",
     )
-    days_to_keep = fields.Integer(
-        string='Keep Backups (days)',
-        default=30,
-        help='Backups older than this will be deleted automatically.',
+    keep_weekly = fields.Integer(
+        default=4,
+        help="Keep the latest backup of each of the last N weeks with a backup.",
+    )
+    keep_monthly = fields.Integer(
+        default=12,
+        help="Keep the latest backup of each of the last N months with a backup.",
     )
     last_execution = fields.Datetime(readonly=True, tracking=True)
     next_execution = fields.Datetime(readonly=True, tracking=True)
@@ -85,11 +162,30 @@ class DockerBackupConfig(models.Model):
             if path:
                 self.backup_directory = os.path.join(path, 'backups')
 
-    @api.constrains('days_to_keep')
-    def _check_days_to_keep(self):
+    @api.constrains('dump_jobs')
+    def _check_dump_jobs(self):
+        for record in self:
+            if record.dump_jobs < 1:
+                raise UserError(_("Dump jobs must be at least 1."))
+
+    @api.constrains('compression', 'compression_level')
+    def _check_compression(self):
+        for record in self:
+            if record.compression == 'zstd' and not zstd_available():
+                raise UserError(_("zstd compression requires the Python package 'zstandard'."))
+            if record.compression == 'zstd' and not 1 <= record.compression_level <= 19:
+                raise UserError(_("The zstd level must be between 1 and 19."))
+            if record.compression == 'gzip' and not 1 <= record.compression_level <= 9:
+                raise UserError(_("The gzip level must be between 1 and 9."))
+
+    @api.constrains('auto_prune', 'keep_daily', 'keep_weekly', 'keep_monthly')
+    def _check_retention(self):
         for record in self:
-            if record.auto_prune and record.days_to_keep <= 0:
-                raise UserError(_("Days to keep must be greater than zero."))
+            counts = (record.keep_daily, record.keep_weekly, record.keep_monthly)
+            if min(counts) < 0:
+                raise UserError(_("Retention counts cannot be negative."))
+            if record.auto_prune and not any(counts):
+                raise UserError(_("Keep at least one daily, weekly or monthly backup."))
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -141,20 +237,63 @@ class DockerBackupConfig(models.Model):
                 ('next_execution', '<=', now),
             ]
         )
-        for config in configs:
-            try:
-                config.execute_backup()
-            except Exception as exc:
-                _logger.exception("Backup failed for %s", config.instance_id.name)
-                config._handle_backup_failure(str(exc))
+        if not configs:
+            return
+
+        params = self.env['ir.config_parameter'].sudo()
+        max_workers = max(int(params.get_param('docker_saas.backup_max_workers', '4') or 1), 1)
+        host_limit = int(params.get_param('docker_saas.backup_host_limit', '2') or 0)
+        disk_limit = int(params.get_param('docker_saas.backup_disk_limit', '2') or 0)
+
+        hosts = {config.id: config.instance_id.docker_host or '' for config in configs}
+        disks = {config.id: config._get_backup_device() for config in configs}
+        results = run_in_threads(
+            self.env, configs.ids,
+            lambda env, config_id: env['docker.backup.config'].browse(config_id)._run_scheduled_backup(),
+            max_workers=max_workers,
+            limits=[(hosts.get, host_limit), (disks.get, disk_limit)],
+        )
+        failed = [config_id for config_id, (ok, result) in results.items() if not ok or not result]
+        _logger.info("Scheduled backups finished: %s run, %s failed", len(results), len(failed))
 
-    def execute_backup(self, manual=False):
+    def _run_scheduled_backup(self):
+        """Run one scheduled backup; meant to own its transaction"""
+        self.ensure_one()
+        try:
+            self.execute_backup(publish=True)
+        except Exception as exc:
+            _logger.exception("Backup failed for %s", self.instance_id.name)
+            self.env.cr.rollback()
+            self._handle_backup_failure(str(exc))
+            return False
+        return True
+
+    def _get_backup_device(self):
+        """Identify the filesystem backups are written to, to throttle per disk"""
+        self.ensure_one()
+        path = self.backup_directory or self.instance_id.instance_path or os.path.expanduser('~')
+        while path and not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return path
+
+    def execute_backup(self, manual=False, publish=False):
+        """Capture a backup of the instance.
+
+        With ``publish``, for callers owning their transaction, the running
+        record is committed first so its progress can be followed.
+        """
         self.ensure_one()
         if not self.instance_id:
             raise UserError(_("No instance linked."))
 
         instance = self.instance_id
-        if not instance.http_port:
+        if self.backup_method == 'http' and not instance.http_port:
             raise UserError(_("Instance %s has no HTTP port.") % instance.name)
 
         if not instance.db_name:
@@ -163,47 +302,79 @@ class DockerBackupConfig(models.Model):
         backup_dir = self._ensure_backup_directory()
         now = fields.Datetime.now()
         timestamp = fields.Datetime.context_timestamp(self, now).strftime('%Y%m%d_%H%M%S')
-        file_name = f"{instance.db_name}_{timestamp}.zip"
-        file_path = os.path.join(backup_dir, file_name)
-
-        url = f"http://127.0.0.1:{instance.http_port}/web/database/backup"
-        payload = {
-            'master_pwd': instance.admin_password or 'admin',
-            'name': instance.db_name,
-            'backup_format': 'zip',
-        }
+        extension = 'tar' if self.backup_method == 'pg_dump' else 'zip'
+        file_name = f"{instance.db_name}_{timestamp}.{extension}"
+        level = self.compression_level if self.compression != 'none' else None
+        if self.storage == 'repository':
+            store = ChunkStore(
+                os.path.join(backup_dir, REPOSITORY_DIR), self.compression, level, self.compression_threads
+            )
+            file_path = store.manifest_path(file_name)
+        else:
+            file_name += EXTENSIONS[self.compression]
+            file_path = os.path.join(backup_dir, file_name)
 
         _logger.info("Starting backup for %s (DB: %s)", instance.name, instance.db_name)
-        try:
-            response = requests.post(url, data=payload, timeout=600)
-            response.raise_for_status()
-        except requests.RequestException as exc:
-            raise UserError(_("Backup request failed: %s") % exc) from exc
-
-        with open(file_path, 'wb') as backup_file:
-            backup_file.write(response.content)
-
-        file_size = os.path.getsize(file_path)
-
-        backup_record = self.env['docker.backup'].create({
+        backup = self.env['docker.backup'].create({
             'name': file_name,
             'instance_id': instance.id,
             'config_id': self.id,
             'file_path': file_path,
-            'file_size': file_size,
             'backup_date': now,
+            'backup_method': self.backup_method,
+            'storage': self.storage,
+            'compression': self.compression,
+            'status': 'running',
+            'message': _('Backup in progress'),
+        })
+        if publish:
+            self.env.cr.commit()
+        started = time.monotonic()
+        try:
+            with backup._progress_reporter() as progress_callback:
+                if self.storage == 'repository':
+                    writer = RepositoryWriter(store, file_name, progress_callback=progress_callback)
+                else:
+                    writer = BackupWriter(file_path, progress_callback=progress_callback)
+                with writer:
+                    if self.storage == 'repository':
+                        self._capture_backup(writer)
+                    else:
+                        with CompressingWriter(writer, self.compression, level, self.compression_threads) as compressor:
+                            self._capture_backup(compressor)
+        except Exception:
+            if publish:
+                # Already committed: the caller rolls back its own transaction
+                with self.env.registry.cursor() as cr:
+                    backup.with_env(backup.env(cr=cr)).unlink()
+            else:
+                backup.unlink()
+            raise
+        duration = time.monotonic() - started
+        if self.storage == 'repository':
+            # Chunks are compressed one by one: the ratio covers the new ones
+            captured = writer.size
+            raw_size, compressed_size = writer.new_size, writer.stored_size
+        else:
+            captured = raw_size = compressor.raw_size
+            compressed_size = writer.size
+
+        backup.write({
             'status': 'success',
+            'file_size': writer.size,
+            'progress_bytes': writer.size,
+            'stored_size': getattr(writer, 'stored_size', writer.size),
+            'compression_ratio': raw_size / compressed_size if compressed_size else 0.0,
+            'duration': duration,
+            'throughput': captured / duration / 1024 ** 2 if duration else 0.0,
+            'checksum': writer.sha256,
             'message': f'Stored locally at {file_path}',
         })
-
         self.last_execution = now
         self.last_status = 'success'
         self.last_message = f'Backup created: {file_name}'
         self._schedule_next_execution(now)
 
-        if self.auto_prune:
-            self._prune_old_backups()
-
         _logger.info("Backup completed: %s", file_path)
         if manual:
             return {
@@ -216,7 +387,77 @@ class DockerBackupConfig(models.Model):
                     'sticky': False,
                 }
             }
-        return backup_record
+        return backup
+
+    def _capture_backup(self, writer):
+        """Stream the instance backup into ``writer`` with the configured method"""
+        self.ensure_one()
+        return getattr(self, f'_capture_backup_{self.backup_method}')(writer)
+
+    def _capture_backup_http(self, writer):
+        """Stream the zip produced by the instance database manager into ``writer``"""
+        self.ensure_one()
+        instance = self.instance_id
+        url = f"http://127.0.0.1:{instance.http_port}/web/database/backup"
+        payload = {
+            'master_pwd': instance.admin_password or 'admin',
+            'name': instance.db_name,
+            'backup_format': 'zip',
+        }
+        try:
+            with requests.post(url, data=payload, timeout=600, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    writer.write(chunk)
+        except requests.RequestException as exc:
+            raise UserError(_("Backup request failed: %s") % exc) from exc
+
+    def _capture_backup_pg_dump(self, writer):
+        """Write a tar archive of a directory-format dump and the filestore into ``writer``.
+
+        ``pg_dump -Fd -j N`` runs inside the database container, so neither the
+        tenant's HTTP workers nor a request timeout are involved. The dump
+        directory is then streamed out with tar, followed by the filestore of
+        the Odoo container; both are re-packed on the fly under ``dump/`` and
+        ``filestore/`` without touching the local disk.
+        """
+        self.ensure_one()
+        instance = self.instance_id
+        db_container, odoo_container = instance._get_container_names()
+        dump_dir = f"/tmp/docker_saas_dump_{uuid.uuid4().hex}"
+        # Leave the compression to the backup itself rather than compressing twice
+        dump_compression = '-Z 0 ' if self.compression != 'none' else ''
+        filestore = f"{FILESTORE_ROOT}/{instance.db_name}"
+        with tarfile.open(fileobj=writer, mode='w|') as archive:
+            add_json(archive, METADATA_NAME, {
+                'method': 'pg_dump',
+                'db_name': instance.db_name,
+                'odoo_version': instance.odoo_version,
+                'dump_jobs': self.dump_jobs,
+            })
+            try:
+                instance._run(
+                    f"docker exec {shlex.quote(db_container)} pg_dump -U {shlex.quote(instance.db_user)} "
+                    f"-Fd {dump_compression}-j {self.dump_jobs} -f {dump_dir} {shlex.quote(instance.db_name)}"
+                )
+                proc = instance._docker_popen(
+                    ['docker', 'exec', db_container, 'tar', '-C', dump_dir, '-cf', '-', '.'],
+                    stdout=subprocess.PIPE,
+                )
+                add_tar_stream(archive, proc.stdout, DUMP_PREFIX)
+                instance._docker_wait(proc)
+            finally:
+                instance._run(f"docker exec {shlex.quote(db_container)} rm -rf {dump_dir}")
+
+            # An instance without attachments yet has no filestore directory
+            proc = instance._docker_popen(
+                ['docker', 'exec', odoo_container, 'sh', '-c',
+                 f"if [ -d {shlex.quote(filestore)} ]; then tar -C {shlex.quote(filestore)} -cf - .; "
+                 f"else tar -cf - -T /dev/null; fi"],
+                stdout=subprocess.PIPE,
+            )
+            add_tar_stream(archive, proc.stdout, FILESTORE_PREFIX)
+            instance._docker_wait(proc)
 
     def action_execute_backup(self):
         self.ensure_one()
@@ -245,17 +486,91 @@ class DockerBackupConfig(models.Model):
         os.makedirs(self.backup_directory, exist_ok=True)
         return self.backup_directory
 
-    def _prune_old_backups(self):
-        self.ensure_one()
-        if not self.auto_prune or self.days_to_keep <= 0:
-            return
-
-        cutoff = fields.Datetime.now() - timedelta(days=self.days_to_keep)
-        old_backups = self.backup_record_ids.filtered(
-            lambda rec: rec.status == 'success' and rec.backup_date and rec.backup_date < cutoff
+    # --------------------------------------------------
+    # RETENTION
+    # --------------------------------------------------
+    @api.model
+    def _cron_prune_backups(self):
+        """Apply the retention policy of every configuration in one pass"""
+        self.search([('auto_prune', '=', True)])._prune_backups()
+
+    def _get_expired_backup_ids(self):
+        """Ids of the successful backups of ``self`` kept by no grandfather-father-son rule.
+
+        A backup is kept when it is the latest of its day, week or month and
+        that period is among the last ``keep_daily`` days, ``keep_weekly``
+        weeks or ``keep_monthly`` months having a backup.
+        """
+        if not self:
+            return []
+        self.env['docker.backup'].flush_model(['config_id', 'status', 'backup_date'])
+        self.flush_recordset(['keep_daily', 'keep_weekly', 'keep_monthly'])
+        self.env.cr.execute(
+            """
+            WITH periods AS (
+                SELECT b.id, b.config_id, b.backup_date,
+                       date_trunc('day', b.backup_date) AS day,
+                       date_trunc('week', b.backup_date) AS week,
+                       date_trunc('month', b.backup_date) AS month
+                  FROM docker_backup b
+                 WHERE b.config_id IN %s
+                   AND b.status = 'success'
+                   AND b.backup_date IS NOT NULL
+            ), ranked AS (
+                SELECT id, config_id,
+                       row_number() OVER (PARTITION BY config_id, day ORDER BY backup_date DESC, id DESC) AS day_rank,
+                       row_number() OVER (PARTITION BY config_id, week ORDER BY backup_date DESC, id DESC) AS week_rank,
+                       row_number() OVER (PARTITION BY config_id, month ORDER BY backup_date DESC, id DESC) AS month_rank,
+                       dense_rank() OVER (PARTITION BY config_id ORDER BY day DESC) AS day_no,
+                       dense_rank() OVER (PARTITION BY config_id ORDER BY week DESC) AS week_no,
+                       dense_rank() OVER (PARTITION BY config_id ORDER BY month DESC) AS month_no
+                  FROM periods
+            )
+            SELECT r.id
+              FROM ranked r
+              JOIN docker_backup_config c ON c.id = r.config_id
+             WHERE NOT (
+                       (r.day_rank = 1 AND r.day_no <= c.keep_daily)
+                    OR (r.week_rank = 1 AND r.week_no <= c.keep_weekly)
+                    OR (r.month_rank = 1 AND r.month_no <= c.keep_monthly)
+                   )
+            """,
+            [tuple(self.ids)],
         )
-        for backup in old_backups:
-            backup.unlink()
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _prune_backups(self):
+        """Delete the backups the retention policy of ``self`` no longer keeps.
+
+        Records go in one ``unlink``; once the deletion is committed their
+        files are removed in a batch, then the chunk repositories they used
+        are garbage-collected.
+        """
+        configs = self.filtered('auto_prune')
+        expired = self.env['docker.backup'].browse(configs._get_expired_backup_ids())
+        if not expired:
+            return 0
+        repositories = {
+            os.path.dirname(os.path.dirname(backup.file_path))
+            for backup in expired if backup.storage == 'repository' and backup.file_path
+        }
+        count = len(expired)
+        expired.unlink()
+        _logger.info("Backup retention: removing %s backups of %s configurations", count, len(configs))
+        if repositories:
+            # Runs after the manifests are removed by docker.backup.unlink
+            self.env.cr.postcommit.add(lambda: [self._collect_repository(root) for root in repositories])
+        return count
+
+    @api.model
+    def _collect_repository(self, root):
+        """Remove the repository chunks no remaining backup references"""
+        if not os.path.isdir(root):
+            return
+        removed, freed = ChunkStore(root).collect()
+        if removed:
+            _logger.info("Backup repository %s: removed %s unreferenced chunks (%s)",
+                         root, removed, self.env['docker.backup']._get_human_size(freed))
 
 
 class DockerBackup(models.Model):
@@ -268,10 +583,41 @@ class DockerBackup(models.Model):
     config_id = fields.Many2one('docker.backup.config', ondelete='set null')
     backup_date = fields.Datetime(default=fields.Datetime.now, readonly=True)
     file_path = fields.Char()
-    file_size = fields.Integer()
+    backup_method = fields.Selection(BACKUP_METHODS, default='http', readonly=True)
+    storage = fields.Selection(BACKUP_STORAGES, default='archive', readonly=True)
+    # Sizes in bytes are Floats: Integer fields are 32-bit columns and overflow past 2 GiB
+    file_size = fields.Float(digits=(20, 0))
+    compression = fields.Selection(COMPRESSIONS, default='none', readonly=True)
+    compression_ratio = fields.Float(
+        digits=(16, 2),
+        readonly=True,
+        help="Uncompressed / compressed size of the data written by this backup.",
+    )
+    duration = fields.Float(string='Duration (s)', digits=(16, 1), readonly=True)
+    throughput = fields.Float(
+        string='Throughput (MiB/s)',
+        digits=(16, 1),
+        readonly=True,
+        help="Uncompressed backup data captured per second.",
+    )
+    stored_size = fields.Float(
+        digits=(20, 0),
+        readonly=True,
+        help="Bytes this backup added to the disk; lower than the size when chunks are shared "
+             "with other backups of a deduplicated repository.",
+    )
+    readable_stored_size = fields.Char(string='Stored', compute='_compute_readable_size')
+    progress_bytes = fields.Float(string='Written', digits=(20, 0), readonly=True)
     readable_size = fields.Char(compute='_compute_readable_size')
+    readable_progress = fields.Char(string='Progress', compute='_compute_readable_size')
+    checksum = fields.Char(
+        string='SHA-256',
+        readonly=True,
+        help='SHA-256 of the archive, used as ETag by the download endpoint.',
+    )
     status = fields.Selection(
         [
+            ('running', 'In Progress'),
             ('success', 'Success'),
             ('failed', 'Failed'),
         ],
@@ -282,6 +628,31 @@ class DockerBackup(models.Model):
     def _compute_readable_size(self):
         for record in self:
             record.readable_size = record._get_human_size(record.file_size)
+            record.readable_progress = record._get_human_size(record.progress_bytes)
+            record.readable_stored_size = record._get_human_size(record.stored_size)
+
+    @contextlib.contextmanager
+    def _progress_reporter(self):
+        """Yield a callback saving the bytes written so far through one side cursor.
+
+        The updates are no-ops until the record is committed; the final
+        figures are written with the caller's transaction anyway.
+        """
+        self.ensure_one()
+        cr = None
+
+        def report(written):
+            nonlocal cr
+            if cr is None:
+                cr = self.env.registry.cursor()
+            cr.execute("UPDATE docker_backup SET progress_bytes = %s WHERE id = %s", [written, self.id])
+            cr.commit()
+
+        try:
+            yield report
+        finally:
+            if cr is not None:
+                cr.close()
 
     @staticmethod
     def _get_human_size(size):
@@ -295,6 +666,281 @@ class DockerBackup(models.Model):
             n += 1
         return f"{size:.2f} {labels[n]}"
 
+    def _open_archive(self):
+        """Return a binary stream reading the backup archive"""
+        self.ensure_one()
+        if not self.file_path or not os.path.exists(self.file_path):
+            raise UserError(_("Backup file %s not found.") % (self.file_path or self.name))
+        if self.storage == 'repository':
+            # Rebuilt on the fly from the chunks listed in the manifest
+            manifests_dir, manifest = os.path.split(self.file_path)
+            store = ChunkStore(os.path.dirname(manifests_dir))
+            return io.BufferedReader(
+                ManifestReader(store, manifest[:-len(MANIFEST_SUFFIX)]), buffer_size=CHUNK_SIZE
+            )
+        return open_decompressed(self.file_path, self.compression)
+
+    def _open_seekable_archive(self):
+        """Return a seekable stream of the archive, spooling it to a temporary file if needed"""
+        self.ensure_one()
+        source = self._open_archive()
+        if source.seekable():
+            return source
+        spool = tempfile.TemporaryFile(dir=os.path.dirname(self.file_path))
+        with source:
+            shutil.copyfileobj(source, spool, CHUNK_SIZE)
+        spool.seek(0)
+        return spool
+
+    def _restore_into(self, instance, jobs=4):
+        """Restore this backup into ``instance`` and return the stage timings (seconds).
+
+        The database and the filestore are loaded next to the live ones while
+        the instance keeps running; Odoo is only stopped to switch them over
+        once the whole archive is in. A failed load leaves the instance as it
+        was.
+        """
+        self.ensure_one()
+        started = time.monotonic()
+        backend = self._prepare_restore_target(instance)
+        timings = {'prepare': time.monotonic() - started}
+        try:
+            if self.backup_method == 'pg_dump':
+                timings.update(self._restore_pg_dump(instance, jobs=jobs))
+            else:
+                timings.update(self._restore_zip(instance))
+        except Exception:
+            self._discard_restore_target(instance)
+            raise
+        stage_started = time.monotonic()
+        self._switch_restore_target(instance, backend)
+        timings['switch'] = time.monotonic() - stage_started
+        timings['total'] = time.monotonic() - started
+        _logger.info("Restored %s into %s: %s", self.name, instance.name,
+                     {stage: round(seconds, 1) for stage, seconds in timings.items()})
+        return timings
+
+    @staticmethod
+    def _restore_names(instance):
+        """Names of the scratch database and filestore a restore is loaded into"""
+        # PostgreSQL truncates names to 63 bytes
+        db_name = f"{instance.db_name[:50]}_restoring"
+        return db_name, f"{FILESTORE_ROOT}/{db_name}"
+
+    def _prepare_restore_target(self, instance):
+        """Create the empty scratch database of a restore into ``instance``"""
+        db_container = instance._get_container_names()[0]
+        user = shlex.quote(instance.db_user)
+        scratch_db = shlex.quote(self._restore_names(instance)[0])
+        instance._run(
+            f"docker exec {shlex.quote(db_container)} sh -c "
+            + shlex.quote(f"dropdb -U {user} --if-exists --force {scratch_db} && createdb -U {user} -O {user} {scratch_db}")
+        )
+        return instance._get_container_backend()
+
+    def _filestore_shell_args(self, instance, script):
+        """docker command running ``script`` with the volumes of the Odoo container of ``instance``"""
+        odoo_container = instance._get_container_names()[1]
+        # The Odoo container may be stopped: reach its volume from a throwaway container
+        return [
+            'docker', 'run', '--rm', '-i', '--volumes-from', odoo_container, '--user', 'root',
+            '--entrypoint', 'sh', instance._get_odoo_image(), '-c', script,
+        ]
+
+    def _filestore_restore_args(self, instance):
+        """docker command unpacking the tar read on stdin as the scratch filestore of ``instance``"""
+        staging = shlex.quote(self._restore_names(instance)[1])
+        return self._filestore_shell_args(
+            instance, f"rm -rf {staging} && mkdir -p {staging} && tar -xf - -C {staging} && chown -R odoo: {staging}",
+        )
+
+    def _switch_restore_target(self, instance, backend):
+        """Replace the database and filestore of ``instance`` with the restored ones.
+
+        The live database and filestore are first renamed aside, and only
+        removed once the restored ones have taken their place: a failure
+        halfway leaves them as ``<db>_old`` rather than lost.
+        """
+        db_container, odoo_container = instance._get_container_names()
+        user, db_name = shlex.quote(instance.db_user), instance.db_name
+        scratch_db, staging = self._restore_names(instance)
+        old_db = f"{db_name[:50]}_old"
+        filestore, old_filestore = f"{FILESTORE_ROOT}/{db_name}", f"{FILESTORE_ROOT}/{old_db}"
+        # Renaming needs the databases to be unused
+        disconnect = (f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                      f"WHERE datname IN ('{db_name}', '{scratch_db}') AND pid != pg_backend_pid()")
+        # Both renames commit together
+        rename = f"""
+            DO $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM pg_database WHERE datname = '{db_name}') THEN
+                    ALTER DATABASE "{db_name}" RENAME TO "{old_db}";
+                END IF;
+                ALTER DATABASE "{scratch_db}" RENAME TO "{db_name}";
+            END $$;
+        """
+        staging, filestore, old_filestore = map(shlex.quote, (staging, filestore, old_filestore))
+        has_odoo = backend.exists(odoo_container)
+        if has_odoo:
+            backend.stop([odoo_container])
+        try:
+            instance._run(
+                f"docker exec {shlex.quote(db_container)} sh -c "
+                + shlex.quote(f"dropdb -U {user} --if-exists --force {shlex.quote(old_db)} "
+                              f"&& psql -q -v ON_ERROR_STOP=1 -U {user} -d postgres "
+                              f"-c {shlex.quote(disconnect)} -c {shlex.quote(rename)}")
+            )
+            instance._run(shlex.join(self._filestore_shell_args(
+                instance,
+                f"if [ -d {staging} ]; then rm -rf {old_filestore} "
+                f"&& {{ [ ! -d {filestore} ] || mv {filestore} {old_filestore}; }} "
+                f"&& mv {staging} {filestore}; fi",
+            )))
+        finally:
+            if has_odoo:
+                backend.start([odoo_container])
+        instance._run(
+            f"docker exec {shlex.quote(db_container)} dropdb -U {user} --if-exists --force {shlex.quote(old_db)}"
+        )
+        instance._run(shlex.join(self._filestore_shell_args(instance, f"rm -rf {old_filestore}")))
+
+    def _discard_restore_target(self, instance):
+        """Remove the scratch database and filestore of a failed restore"""
+        db_container = instance._get_container_names()[0]
+        scratch_db, staging = self._restore_names(instance)
+        try:
+            instance._run(
+                f"docker exec {shlex.quote(db_container)} dropdb -U {shlex.quote(instance.db_user)} "
+                f"--if-exists --force {shlex.quote(scratch_db)}"
+            )
+            instance._run(shlex.join(self._filestore_shell_args(instance, f"rm -rf {shlex.quote(staging)}")))
+        except Exception as exc:
+            _logger.warning("Unable to clean up the restore of %s into %s: %s", self.name, instance.name, exc)
+
+    def _restore_zip(self, instance):
+        """Restore a database manager zip into ``instance`` and return the stage timings.
+
+        ``dump.sql`` is piped into psql while the ``filestore/`` entries are
+        re-packed as a tar stream into the volume of the Odoo container, both
+        into the scratch database and filestore and at the same time.
+        """
+        self.ensure_one()
+        db_container = instance._get_container_names()[0]
+        timings = {}
+
+        psql = instance._docker_popen(
+            ['docker', 'exec', '-i', db_container, 'psql', '-q', '-U', instance.db_user,
+             '-d', self._restore_names(instance)[0]],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+        )
+        unpack = instance._docker_popen(self._filestore_restore_args(instance), stdin=subprocess.PIPE)
+
+        def load_database(archive):
+            stage_started = time.monotonic()
+            with psql.stdin, archive.open('dump.sql') as dump:
+                shutil.copyfileobj(dump, psql.stdin, CHUNK_SIZE)
+            return time.monotonic() - stage_started
+
+        def unpack_filestore(archive):
+            stage_started = time.monotonic()
+            with unpack.stdin, tarfile.open(fileobj=unpack.stdin, mode='w|') as target:
+                for entry in archive.infolist():
+                    if not entry.filename.startswith(f'{FILESTORE_PREFIX}/') or entry.is_dir():
+                        continue
+                    info = tarfile.TarInfo(entry.filename[len(FILESTORE_PREFIX) + 1:])
+                    info.size = entry.file_size
+                    info.mtime = time.mktime(entry.date_time + (0, 0, -1))
+                    with archive.open(entry) as data:
+                        target.addfile(info, data)
+            return time.monotonic() - stage_started
+
+        try:
+            with self._open_seekable_archive() as source, zipfile.ZipFile(source) as archive:
+                if 'dump.sql' not in archive.namelist():
+                    raise UserError(_("Backup %s contains no dump.sql.") % self.name)
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    database = executor.submit(load_database, archive)
+                    filestore = executor.submit(unpack_filestore, archive)
+                    timings['database'] = database.result()
+                    timings['filestore'] = filestore.result()
+            instance._docker_wait(psql)
+            instance._docker_wait(unpack)
+        finally:
+            for proc in (psql, unpack):
+                if proc.returncode is None:
+                    proc.kill()
+                    proc.wait()
+        return timings
+
+    def _restore_pg_dump(self, instance, jobs=4):
+        """Restore a pg_dump backup into ``instance`` and return the stage timings.
+
+        The archive is read once, sequentially. Its ``dump/`` part is unpacked
+        in the database container, then ``pg_restore -j N`` starts in the
+        background while the ``filestore/`` part is unpacked into the volume of
+        the Odoo container, both into the scratch database and filestore.
+        """
+        self.ensure_one()
+        if self.backup_method != 'pg_dump':
+            raise UserError(_("Backup %s was not made with pg_dump.") % self.name)
+        db_container = instance._get_container_names()[0]
+        restore_dir = f"/tmp/docker_saas_restore_{uuid.uuid4().hex}"
+        timings = {}
+        started = time.monotonic()
+
+        procs = {}
+        restore_started = []
+
+        def open_target(prefix):
+            if prefix == DUMP_PREFIX:
+                args = ['docker', 'exec', '-i', db_container, 'sh', '-c',
+                        f"mkdir -p {restore_dir} && tar -xf - -C {restore_dir}"]
+            elif prefix == FILESTORE_PREFIX:
+                args = self._filestore_restore_args(instance)
+            else:
+                raise UserError(_("Unexpected entry %s in backup archive.") % prefix)
+            procs[prefix] = instance._docker_popen(args, stdin=subprocess.PIPE)
+            return procs[prefix].stdin
+
+        def on_switch(prefix):
+            instance._docker_wait(procs[prefix])
+            timings[f'unpack_{prefix}'] = time.monotonic() - started - sum(timings.values())
+            if prefix == DUMP_PREFIX:
+                # Runs in the background while the filestore is unpacked
+                restore_started.append(time.monotonic())
+                procs['pg_restore'] = instance._docker_popen([
+                    'docker', 'exec', db_container, 'pg_restore', '-U', instance.db_user, '-j', str(jobs),
+                    '--no-owner', '--no-privileges', '-d', self._restore_names(instance)[0], restore_dir,
+                ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+
+        try:
+            with self._open_archive() as source:
+                TarSplitter(open_target, on_switch).split(source)
+            if 'pg_restore' not in procs:
+                raise UserError(_("Backup %s contains no database dump.") % self.name)
+            instance._docker_wait(procs['pg_restore'])
+            timings['pg_restore'] = time.monotonic() - restore_started[0]
+        finally:
+            for proc in procs.values():
+                if proc.returncode is None:
+                    proc.kill()
+                    proc.wait()
+            instance._run(f"docker exec {shlex.quote(db_container)} rm -rf {restore_dir}")
+        return timings
+
+    def action_restore(self):
+        """Prepare a restore of this backup"""
+        self.ensure_one()
+        restore = self.env['docker.backup.restore']._prepare(self)
+        return {
+            'name': restore.name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'docker.backup.restore',
+            'res_id': restore.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
     def action_download(self):
         self.ensure_one()
         if not self.file_path:
@@ -306,11 +952,20 @@ class DockerBackup(models.Model):
         }
 
     def unlink(self):
-        for record in self:
-            if record.file_path and os.path.exists(record.file_path):
-                try:
-                    os.remove(record.file_path)
-                except OSError as exc:
-                    _logger.warning("Unable to remove: %s - %s", record.file_path, exc)
-        return super().unlink()
+        # Files go once the deletion is committed, so a rollback never loses an archive
+        paths = [path for path in self.mapped('file_path') if path]
+        res = super().unlink()
+        if paths:
+            self.env.cr.postcommit.add(lambda: self._remove_files(paths))
+        return res
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as exc:
+                _logger.warning("Unable to remove: %s - %s", path, exc)
 
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import time
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+from .tier_rollout import TIER_FIELDS
+
+# Stage keys reported by the restore engines, in display order
+RESTORE_STAGES = [
+    ('provision', 'Provision'),
+    ('prepare', 'Prepare database'),
+    ('unpack_dump', 'Unpack dump'),
+    ('database', 'Load database'),
+    ('pg_restore', 'pg_restore'),
+    ('unpack_filestore', 'Unpack filestore'),
+    ('filestore', 'Copy filestore from zip'),
+    ('switch', 'Switch over'),
+    ('finalize', 'Finalize'),
+    ('total', 'Total'),
+]
+
+
+class DockerBackupRestore(models.Model):
+    """Restore of a backup into a new or an existing instance.
+
+    Prepared as a draft from the backup, then run as a ``restore`` job on
+    the target instance: a new instance is provisioned first, then the
+    archive is streamed into its containers, database and filestore in
+    parallel. The duration of each stage is kept on the record.
+    """
+    _name = 'docker.backup.restore'
+    _description = 'Docker Backup Restore'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+
+    name = fields.Char(required=True, readonly=True)
+    backup_id = fields.Many2one('docker.backup', required=True, ondelete='cascade', readonly=True)
+    source_instance_id = fields.Many2one(related='backup_id.instance_id', string='Source Instance')
+    target = fields.Selection(
+        [
+            ('new', 'New Instance'),
+            ('existing', 'Existing Instance'),
+        ],
+        default='new',
+        required=True,
+    )
+    new_instance_name = fields.Char(help="Name of the instance provisioned for the restore.")
+    instance_id = fields.Many2one(
+        'docker.instance',
+        string='Target Instance',
+        ondelete='set null',
+        help="Instance whose database and filestore are replaced by the backup.",
+    )
+    jobs = fields.Integer(
+        string='Restore Jobs',
+        default=4,
+        help="Number of parallel pg_restore jobs (pg_dump backups).",
+    )
+    user_id = fields.Many2one('res.users', string='Requested By', default=lambda self: self.env.user, readonly=True)
+    state = fields.Selection(
+        [
+            ('draft', 'Draft'),
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        default='draft',
+        required=True,
+        tracking=True,
+        readonly=True,
+    )
+    job_id = fields.Many2one('docker.instance.job', readonly=True, ondelete='set null')
+    timings = fields.Json(readonly=True)
+    timing_summary = fields.Text(string='Stage Timings', compute='_compute_timing_summary')
+    duration = fields.Float(string='Duration (s)', digits=(16, 1), readonly=True)
+    message = fields.Text(readonly=True)
+
+    @api.depends('timings')
+    def _compute_timing_summary(self):
+        labels = dict(RESTORE_STAGES)
+        for restore in self:
+            timings = restore.timings or {}
+            restore.timing_summary = '\n'.join(
+                f"{labels[stage]}: {timings[stage]:.1f} s" for stage in labels if stage in timings
+            ) or False
+
+    # --------------------------------------------------
+    # LAUNCH
+    # --------------------------------------------------
+    @api.model
+    def _prepare(self, backup):
+        if backup.status != 'success':
+            raise UserError(_("Only successful backups can be restored."))
+        return self.create({
+            'name': _("Restore %s") % backup.name,
+            'backup_id': backup.id,
+            'new_instance_name': _("%s-restore") % backup.instance_id.name,
+            'jobs': backup.config_id.dump_jobs or 4,
+        })
+
+    def action_start(self):
+        for restore in self.filtered(lambda r: r.state == 'draft'):
+            if restore.jobs < 1:
+                raise UserError(_("Restore jobs must be at least 1."))
+            if restore.target == 'new':
+                if not restore.new_instance_name:
+                    raise UserError(_("Set the name of the new instance."))
+                restore.instance_id = restore._create_instance()
+            elif not restore.instance_id:
+                raise UserError(_("Select the instance to restore into."))
+            elif restore.instance_id.state == 'draft':
+                raise UserError(_("Start instance %s before restoring into it.") % restore.instance_id.name)
+            job = self.env['docker.instance.job']._enqueue(restore.instance_id, 'restore')
+            # Never replay a restore half-way through on its own
+            job.max_attempts = 1
+            restore.write({'state': 'queued', 'job_id': job.id})
+        return True
+
+    def _create_instance(self):
+        """Create the instance to restore into, sized and placed like the source one"""
+        self.ensure_one()
+        source = self.source_instance_id
+        vals = source.read(TIER_FIELDS)[0]
+        del vals['id']
+        vals.update({
+            'name': self.new_instance_name,
+            'odoo_version': source.odoo_version,
+            'docker_host': source.docker_host,
+            'pricing_tier_id': source.pricing_tier_id.id,
+            'map_domain': source.map_domain,
+            'need_custom_addons': source.need_custom_addons,
+        })
+        return self.env['docker.instance'].create(vals)
+
+    # --------------------------------------------------
+    # EXECUTION
+    # --------------------------------------------------
+    def _execute(self):
+        """Run the restore on the target instance; called by the ``restore`` job"""
+        self.ensure_one()
+        instance = self.instance_id
+        self.write({'state': 'running', 'message': False})
+        # Publish the state: the restore may take a long time
+        self.env.cr.commit()
+        started = time.monotonic()
+        timings = {}
+        try:
+            if instance.state != 'running':
+                instance._start_instance()
+                timings['provision'] = time.monotonic() - started
+                self.env.cr.commit()
+            timings.update(self.backup_id._restore_into(instance, jobs=self.jobs))
+            if instance != self.source_instance_id:
+                stage_started = time.monotonic()
+                instance._reset_database_identity()
+                timings['finalize'] = time.monotonic() - stage_started
+        except Exception as exc:
+            self.env.cr.rollback()
+            self.write({
+                'state': 'failed',
+                'timings': timings,
+                'duration': time.monotonic() - started,
+                'message': str(exc),
+            })
+            self.env.cr.commit()
+            raise
+        timings['total'] = time.monotonic() - started
+        self.write({'state': 'done', 'timings': timings, 'duration': timings['total']})
+        instance.message_post(body=_("Restored from backup %(backup)s in %(duration)s s.",
+                                     backup=self.backup_id.name, duration=round(timings['total'], 1)))
+        return timings
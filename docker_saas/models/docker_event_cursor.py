@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from odoo import api, fields, models
+
+
+class DockerEventCursor(models.Model):
+    _name = 'docker.event.cursor'
+    _description = 'Docker Host Event Stream Position'
+    _rec_name = 'docker_host'
+
+    docker_host = fields.Char(string='Docker Host', required=True, help="'local' for the local daemon.")
+    since = fields.Char(help="Docker 'since' value the next read of the event stream starts from.")
+
+    _sql_constraints = [
+        ('docker_host_uniq', 'UNIQUE(docker_host)', 'A Docker host has a single event cursor.'),
+    ]
+
+    @api.model
+    def _for_host(self, docker_host):
+        """Cursor of ``docker_host``, created on first use"""
+        key = docker_host or 'local'
+        return self.search([('docker_host', '=', key)], limit=1) or self.create({'docker_host': key})
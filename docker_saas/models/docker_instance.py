@@ -1,22 +1,51 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import logging
+import secrets
 import os
 import random
-import socket
 import string
 import subprocess
 import re
 import shlex
 import tempfile
-from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError, UserError
+import time
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError
+
+from ..tools.compose import check_compose_content, pull_images
+from ..tools.container_backend import CliBackend, EngineApiBackend, parse_memory
+from ..tools.docker_api import DEFAULT_SOCKET, DockerAPIError, get_client
+from ..tools.docker_events import EventDebouncer, format_since, parse_event
+from ..tools.git_sync import GitError, GitMirror, needs_reload
+from ..tools.pool import run_in_threads, run_parallel
+from ..tools.provisioning import GITHUB_API_URL, Provisioner, get_github_client, get_jenkins_client
 
-from github import Github 
-import jenkins 
+_logger = logging.getLogger(__name__)
 
-JenkinsNotFound = getattr(jenkins, 'NotFoundException', Exception)
+PORT_FIELDS = [('http', 'http_port'), ('longpolling', 'longpolling_port')]
 
-_logger = logging.getLogger(__name__)
+# Errors raised by container backends, reported like failed CLI commands
+CONTAINER_ERRORS = (UserError, DockerAPIError, OSError)
+EVENTS_WINDOW_SECONDS = 5
+
+POSTGRES_IMAGE = 'postgres:15'
+# Stages of the first start, in order; scm, pull and validate run concurrently
+PROVISIONING_STAGES = [
+    ('directories', 'Create directories'),
+    ('scm', 'Provision repository'),
+    ('pull', 'Pull images'),
+    ('validate', 'Validate compose'),
+    ('config', 'Write configuration'),
+    ('up', 'Start containers'),
+    ('total', 'Total'),
+]
+
+SETTINGS_PREFIX = 'docker_saas.'
+# Operations that deploy the rendered compose file
+COMPOSE_OPERATIONS = ('start', 'recreate', 'update_resources')
 
 
 class DockerInstance(models.Model):
@@ -41,9 +70,23 @@ class DockerInstance(models.Model):
         ('19.0', 'Odoo 19'),
     ], string='Odoo Version', default='17.0', required=True)
 
-    # Ports
-    http_port = fields.Char(string='HTTP Port', tracking=True)
-    longpolling_port = fields.Char(string='Longpolling Port')
+    # Host
+    docker_host = fields.Char(
+        string='Docker Host',
+        tracking=True,
+        help="Docker daemon endpoint (DOCKER_HOST) the instance runs on, e.g. 'ssh://user@host'. "
+             "Leave empty to use the local daemon."
+    )
+
+    auto_restart = fields.Boolean(
+        string='Auto Restart',
+        tracking=True,
+        help="Queue a restart when a container of the instance dies and Docker does not bring it back."
+    )
+
+    # Ports (allocated from the docker.port.reservation table when left empty)
+    http_port = fields.Char(string='HTTP Port', tracking=True, copy=False)
+    longpolling_port = fields.Char(string='Longpolling Port', copy=False)
 
     # Paths
     instance_path = fields.Char(string='Instance Path', compute='_compute_instance_path', store=True)
@@ -86,8 +129,14 @@ class DockerInstance(models.Model):
     need_custom_addons = fields.Boolean(
         string='Enable GitHub Integration',
         default=True,
-        help="Create a GitHub repository and Jenkins job to synchronize custom addons into this instance."
+        help="Create a GitHub repository whose pushes are synchronized into the custom addons of this instance."
+    )
+    git_branch = fields.Char(
+        string='Deployed Branch',
+        help="Branch synchronized into the git addons directory; the repository's default branch when empty."
     )
+    git_commit = fields.Char(string='Deployed Commit', readonly=True, copy=False)
+    git_synced_at = fields.Datetime(string='Last Git Sync', readonly=True, copy=False)
 
     pricing_tier_id = fields.Many2one(
         'docker.pricing.tier',
@@ -151,17 +200,46 @@ class DockerInstance(models.Model):
     backup_config_count = fields.Integer(compute='_compute_backup_counts')
     backup_count = fields.Integer(compute='_compute_backup_counts')
 
-    # Generated content
-    docker_compose_content = fields.Text(string='Docker Compose YAML', compute='_compute_docker_compose_content')
-    odoo_conf_content = fields.Text(string='Odoo Configuration', compute='_compute_odoo_conf_content')
-
-    _sql_constraints = [
-        ('unique_http_port', 'UNIQUE(http_port)', 'HTTP port must be unique.'),
-    ]
+    # Queued lifecycle operations
+    job_ids = fields.One2many('docker.instance.job', 'instance_id', string='Jobs', readonly=True)
+    job_count = fields.Integer(compute='_compute_job_count')
+    cpu_usage_24h = fields.Float(string='CPU (24h avg %)', compute='_compute_usage_24h')
+    memory_peak_24h = fields.Float(string='Memory Peak (24h, MiB)', compute='_compute_usage_24h')
+
+    # Generated content, rendered on change and addressed by hash
+    docker_compose_content = fields.Text(
+        string='Docker Compose YAML', compute='_compute_docker_compose_content', store=True)
+    compose_hash = fields.Char(string='Compose Hash', compute='_compute_docker_compose_content', store=True)
+    # Hash of the compose without the resource sections: containers must be recreated when it changes
+    compose_structure_hash = fields.Char(
+        string='Compose Structure Hash', compute='_compute_docker_compose_content', store=True)
+    odoo_conf_content = fields.Text(
+        string='Odoo Configuration', compute='_compute_odoo_conf_content', store=True)
+    conf_hash = fields.Char(string='Configuration Hash', compute='_compute_odoo_conf_content', store=True)
+    # Last compose rendering that passed "docker compose config", and the files on disk
+    validated_compose_hash = fields.Char(string='Validated Compose Hash', readonly=True, copy=False)
+    deployed_compose_hash = fields.Char(string='Deployed Compose Hash', readonly=True, copy=False)
+    deployed_conf_hash = fields.Char(string='Deployed Configuration Hash', readonly=True, copy=False)
+    # Compose the current containers were created (or live-updated) from
+    applied_compose_hash = fields.Char(string='Applied Compose Hash', readonly=True, copy=False)
+    applied_structure_hash = fields.Char(string='Applied Structure Hash', readonly=True, copy=False)
+    # First start: durations of the completed stages, so a failed one resumes where it stopped
+    provisioning_timings = fields.Json(readonly=True, copy=False)
+    provisioning_summary = fields.Text(string='Provisioning Timings', compute='_compute_provisioning_summary')
+    provisioned_at = fields.Datetime(string='Provisioned On', readonly=True, copy=False)
 
     # --------------------------------------------------
     # COMPUTE FIELDS
     # --------------------------------------------------
+    @api.depends('provisioning_timings')
+    def _compute_provisioning_summary(self):
+        labels = dict(PROVISIONING_STAGES)
+        for instance in self:
+            timings = instance.provisioning_timings or {}
+            instance.provisioning_summary = '\n'.join(
+                f"{labels[stage]}: {timings[stage]:.1f} s" for stage in labels if stage in timings
+            ) or False
+
     @api.depends('name')
     def _compute_instance_path(self):
         for instance in self:
@@ -194,11 +272,10 @@ class DockerInstance(models.Model):
 
     @api.depends('name', 'map_domain')
     def _compute_mapped_domain(self):
-        config = self.env['ir.config_parameter'].sudo()
-        subdomain = config.get_param('docker_saas.traefik_subdomain', '').strip()
-        enable_https = config.get_param('docker_saas.traefik_enable_https', 'True') == 'True'
-        protocol = 'https' if enable_https else 'http'
-        
+        settings = self._get_rendering_settings()
+        subdomain = settings['traefik_subdomain']
+        protocol = 'https' if settings['traefik_enable_https'] else 'http'
+
         for instance in self:
             if instance.map_domain and subdomain and instance.name:
                 slug = instance._get_instance_slug()
@@ -209,7 +286,49 @@ class DockerInstance(models.Model):
 
     def is_development_mode(self):
         self.ensure_one()
-        return self.env['ir.config_parameter'].sudo().get_param('docker_saas.development_mode', 'False') == 'True'
+        return self._get_rendering_settings()['development_mode']
+
+    # --------------------------------------------------
+    # SETTINGS SNAPSHOT
+    # --------------------------------------------------
+    @api.model
+    @tools.ormcache()
+    def _get_settings_snapshot(self):
+        """All ``docker_saas.*`` parameters (without prefix), read in one query.
+
+        Cached until the registry caches are cleared, which every write to
+        ``ir.config_parameter`` does.
+        """
+        self.env['ir.config_parameter'].flush_model(['key', 'value'])
+        self.env.cr.execute(
+            "SELECT key, value FROM ir_config_parameter WHERE key LIKE %s",
+            [SETTINGS_PREFIX.replace('_', '\\_') + '%'],
+        )
+        return tools.frozendict(
+            (key[len(SETTINGS_PREFIX):], value) for key, value in self.env.cr.fetchall()
+        )
+
+    @api.model
+    def _get_rendering_settings(self):
+        """Settings the compose file and the mapped domain are rendered from"""
+        settings = self._get_settings_snapshot()
+        return {
+            'development_mode': settings.get('development_mode', 'False') == 'True',
+            'traefik_subdomain': (settings.get('traefik_subdomain') or '').strip(),
+            'traefik_enable_https': settings.get('traefik_enable_https', 'True') == 'True',
+            'traefik_cert_resolver': settings.get('traefik_cert_resolver', 'letsencrypt'),
+            'traefik_http_entrypoint': settings.get('traefik_http_entrypoint', 'web'),
+            'traefik_https_entrypoint': settings.get('traefik_https_entrypoint', 'websecure'),
+        }
+
+    @api.model
+    def _refresh_rendering(self):
+        """Re-render the stored compose files and domains after a settings change"""
+        instances = self.search([])
+        for fname in ('docker_compose_content', 'compose_hash', 'mapped_domain'):
+            self.env.add_to_compute(self._fields[fname], instances)
+        instances.flush_recordset()
+        return instances
 
     # --------------------------------------------------
     # GITHUB / JENKINS INTEGRATION
@@ -239,82 +358,113 @@ class DockerInstance(models.Model):
         slug = self._get_instance_slug()
         return f"{slug}-docker-saas"
 
-    def create_github_repo(self):
-        self.ensure_one()
+    @api.model
+    def _get_provisioning_settings(self):
+        """GitHub and Jenkins settings, read once for a whole provisioning batch"""
         config_parameter = self.env['ir.config_parameter'].sudo()
-        git_auth_user = config_parameter.get_param('docker_saas.git_auth_user', False)
-        git_auth_password = config_parameter.get_param('docker_saas.git_auth_password', False)
-        git_webhook_url = config_parameter.get_param('docker_saas.git_webhook_url', False)
+        settings = {
+            'git_auth_user': config_parameter.get_param('docker_saas.git_auth_user', False),
+            'git_auth_password': config_parameter.get_param('docker_saas.git_auth_password', False),
+            'github_api_url': config_parameter.get_param('docker_saas.github_api_url') or GITHUB_API_URL,
+            'jenkins_url': config_parameter.get_param('docker_saas.jenkins_url', False),
+            'jenkins_username': config_parameter.get_param('docker_saas.jenkins_username', False),
+            'jenkins_password': config_parameter.get_param('docker_saas.jenkins_password', False),
+            'native_sync': self._get_addons_sync_method() == 'native',
+            'workers': max(int(config_parameter.get_param('docker_saas.provisioning_workers', 4) or 1), 1),
+        }
+        if settings['native_sync']:
+            base_url = config_parameter.get_param('web.base.url', 'http://localhost').rstrip('/')
+            settings['hook_config'] = {
+                'url': f"{base_url}/docker_saas/git/webhook",
+                'secret': self._get_git_webhook_secret(),
+            }
+        else:
+            settings['hook_config'] = {'url': config_parameter.get_param('docker_saas.git_webhook_url', False)}
+        return settings
+
+    @api.model
+    def _check_provisioning_settings(self, settings, jenkins_required=None):
+        """Return why provisioning cannot run with ``settings``, or None"""
+        if not settings['git_auth_user'] or not settings['git_auth_password']:
+            return _("GitHub credentials are not configured. Please set them in Docker SaaS settings.")
+        if jenkins_required is None:
+            jenkins_required = not settings['native_sync']
+        if jenkins_required and not (settings['jenkins_url'] and settings['jenkins_username']
+                                     and settings['jenkins_password']):
+            return _("Jenkins credentials are not configured. Please set them in Docker SaaS settings.")
+        return None
+
+    @api.model
+    def _get_provisioner(self, settings, with_jenkins=None, batch=False):
+        """Provisioner for these settings; a ``batch`` lists the existing repositories and jobs once"""
+        if with_jenkins is None:
+            with_jenkins = not settings['native_sync']
+        github = get_github_client(settings['git_auth_user'], settings['git_auth_password'], settings['github_api_url'])
+        server = get_jenkins_client(
+            settings['jenkins_url'], settings['jenkins_username'], settings['jenkins_password'],
+        ) if with_jenkins else None
+        return Provisioner(github, server, max_workers=settings['workers'], prefetch=batch)
+
+    def _get_provisioning_spec(self, settings, with_jenkins=None):
+        """Everything the provisioning threads need for this instance, read from the ORM beforehand"""
+        self.ensure_one()
+        if with_jenkins is None:
+            with_jenkins = not settings['native_sync']
+        if with_jenkins and not self.instance_path:
+            raise UserError(_("Instance path is not configured. Save the record first."))
+        addons_path = self.ensure_git_addons_directory()
+        repo_name = self.get_repo_name_for_github()
+        return {
+            'repo_name': repo_name,
+            'description': f'Custom addons repository for Docker SaaS instance: {self.name}',
+            'job_name': self.get_jenkins_job_name() if with_jenkins else False,
+            'job_config': self._render_jenkins_config(settings, repo_name, addons_path) if with_jenkins else False,
+        }
 
-        if not git_auth_user or not git_auth_password:
-            raise UserError(_("GitHub credentials are not configured. Please set them in Docker SaaS settings."))
+    @staticmethod
+    def _provision_one(provisioner, spec, hook_config):
+        repo = provisioner.ensure_repo(spec['repo_name'], spec['description'], hook_config)
+        if spec['job_name']:
+            provisioner.ensure_job(spec['job_name'], spec['job_config'])
+        return repo.clone_url
 
+    def create_github_repo(self):
+        self.ensure_one()
+        settings = self._get_provisioning_settings()
+        error = self._check_provisioning_settings(settings, jenkins_required=False)
+        if error:
+            raise UserError(error)
+        spec = self._get_provisioning_spec(settings, with_jenkins=False)
         try:
-            github = Github(git_auth_user, git_auth_password)
-            repo_name = self.get_repo_name_for_github()
-            user = github.get_user()
-
-            try:
-                existing_repo = user.get_repo(repo_name)
-                self.github_repo_url = existing_repo.clone_url
-                _logger.info("GitHub repository %s already exists; reusing.", repo_name)
-                return existing_repo
-            except Exception:
-                pass
-
-            repo_description = f'Custom addons repository for Docker SaaS instance: {self.name}'
-            new_repo = user.create_repo(
-                repo_name,
-                description=repo_description,
-                private=True
-            )
-            self.github_repo_url = new_repo.clone_url
-            _logger.info("Created GitHub repository %s", new_repo.clone_url)
-
-            if git_webhook_url:
-                try:
-                    new_repo.create_hook(
-                        name="web",
-                        config={
-                            "url": git_webhook_url,
-                            "content_type": "json",
-                        },
-                        events=["push", "pull_request"],
-                        active=True
-                    )
-                    _logger.info("Configured webhook for repository %s", repo_name)
-                except Exception as hook_error:
-                    _logger.warning("Failed to configure webhook for repo %s: %s", repo_name, hook_error)
-
-            return new_repo
+            repo = self._get_provisioner(settings, with_jenkins=False).ensure_repo(
+                spec['repo_name'], spec['description'], settings['hook_config'])
         except Exception as e:
             _logger.error("Failed to create GitHub repository: %s", e, exc_info=True)
             raise UserError(_("Failed to create GitHub repository: %s") % e) from e
+        self.github_repo_url = repo.clone_url
+        return repo
 
     def create_jenkins_job(self):
         self.ensure_one()
-        config_parameter = self.env['ir.config_parameter'].sudo()
-        git_auth_user = config_parameter.get_param('docker_saas.git_auth_user', False)
-        git_auth_password = config_parameter.get_param('docker_saas.git_auth_password', False)
-        jenkins_url = config_parameter.get_param('docker_saas.jenkins_url', False)
-        jenkins_username = config_parameter.get_param('docker_saas.jenkins_username', False)
-        jenkins_password = config_parameter.get_param('docker_saas.jenkins_password', False)
-
-        if not all([jenkins_url, jenkins_username, jenkins_password]):
-            raise UserError(_("Jenkins credentials are not configured. Please set them in Docker SaaS settings."))
-        if not git_auth_user or not git_auth_password:
-            raise UserError(_("GitHub credentials are not configured. Please set them in Docker SaaS settings."))
+        settings = self._get_provisioning_settings()
+        error = self._check_provisioning_settings(settings, jenkins_required=True)
+        if error:
+            raise UserError(error)
+        spec = self._get_provisioning_spec(settings, with_jenkins=True)
+        try:
+            self._get_provisioner(settings, with_jenkins=True).ensure_job(spec['job_name'], spec['job_config'])
+        except Exception as e:
+            _logger.error("Failed to configure Jenkins job: %s", e, exc_info=True)
+            raise UserError(_("Failed to configure Jenkins job: %s") % e) from e
 
-        repo_name = self.get_repo_name_for_github()
-        job_name = self.get_jenkins_job_name()
+    def _render_jenkins_config(self, settings, repo_name, addons_path):
+        self.ensure_one()
+        git_auth_user = settings['git_auth_user']
+        git_auth_password = settings['git_auth_password']
         instance_label = self.name or self._get_instance_slug()
         instance_path = self.instance_path
-        if not instance_path:
-            raise UserError(_("Instance path is not configured. Save the record first."))
 
-        addons_path = self.ensure_git_addons_directory()
-
-        jenkins_config_xml = f"""<?xml version='1.1' encoding='UTF-8'?>
+        return f"""<?xml version='1.1' encoding='UTF-8'?>
 <project>
     <actions/>
     <description>Automated deployment of custom addons from GitHub for Docker instance: {instance_label}</description>
@@ -394,52 +544,69 @@ echo "=== Deployment Completed ==="
 </project>
 """
 
-        try:
-            server = jenkins.Jenkins(jenkins_url, username=jenkins_username, password=jenkins_password)
-            try:
-                server.get_job_config(job_name)
-                server.reconfig_job(job_name, jenkins_config_xml)
-                _logger.info("Updated existing Jenkins job %s", job_name)
-            except JenkinsNotFound:
-                server.create_job(job_name, jenkins_config_xml)
-                _logger.info("Created Jenkins job %s", job_name)
-        except Exception as e:
-            _logger.error("Failed to configure Jenkins job: %s", e, exc_info=True)
-            raise UserError(_("Failed to configure Jenkins job: %s") % e) from e
-
-    def enable_github_integration(self, raise_on_error=True):
-        self.ensure_one()
+    @api.model
+    def _get_addons_sync_method(self):
+        """Configured synchronization; installs already set up with Jenkins keep using it"""
         config_parameter = self.env['ir.config_parameter'].sudo()
-        git_auth_user = config_parameter.get_param('docker_saas.git_auth_user', False)
-        git_auth_password = config_parameter.get_param('docker_saas.git_auth_password', False)
-        jenkins_url = config_parameter.get_param('docker_saas.jenkins_url', False)
-        jenkins_username = config_parameter.get_param('docker_saas.jenkins_username', False)
-        jenkins_password = config_parameter.get_param('docker_saas.jenkins_password', False)
-
-        if not git_auth_user or not git_auth_password:
-            message = _("GitHub credentials are not configured. Please set them in Docker SaaS settings.")
-            if raise_on_error:
-                raise UserError(message)
-            _logger.warning(message)
-            return False
-        if not jenkins_url or not jenkins_username or not jenkins_password:
-            message = _("Jenkins credentials are not configured. Please set them in Docker SaaS settings.")
+        method = config_parameter.get_param('docker_saas.addons_sync_method')
+        if not method:
+            method = 'jenkins' if config_parameter.get_param('docker_saas.jenkins_url') else 'native'
+        return method
+
+    @api.model
+    def _get_git_webhook_secret(self):
+        """Secret signing the GitHub webhooks of the native sync, generated on first use"""
+        config_parameter = self.env['ir.config_parameter'].sudo()
+        secret = config_parameter.get_param('docker_saas.git_webhook_secret')
+        if not secret:
+            secret = secrets.token_hex(32)
+            config_parameter.set_param('docker_saas.git_webhook_secret', secret)
+        return secret
+
+    def _provision_github_integration(self, raise_on_error=True):
+        """Create the repositories (and Jenkins jobs) of the instances as one batch.
+
+        Settings are read and existing repositories and jobs listed once,
+        then the instances are provisioned concurrently through shared
+        clients; only the network calls run in the threads. Returns the
+        instances provisioned.
+        """
+        settings = self._get_provisioning_settings()
+        error = self._check_provisioning_settings(settings)
+        if error:
             if raise_on_error:
-                raise UserError(message)
-            _logger.warning(message)
-            return False
+                raise UserError(error)
+            _logger.warning(error)
+            return self.browse()
 
+        specs = {instance.id: instance._get_provisioning_spec(settings) for instance in self}
+        hook_config = settings['hook_config']
         try:
-            self.ensure_git_addons_directory()
-            self.create_github_repo()
-            self.create_jenkins_job()
-            self.need_custom_addons = True
-            return True
+            provisioner = self._get_provisioner(settings, batch=len(self) > 1)
+            results = provisioner.run(
+                self.ids, lambda prov, instance_id: self._provision_one(prov, specs[instance_id], hook_config))
         except Exception as e:
-            _logger.error("Failed to enable GitHub/Jenkins integration: %s", e, exc_info=True)
+            results = {instance_id: (False, e) for instance_id in self.ids}
+
+        provisioned = self.browse()
+        failures = []
+        for instance in self:
+            ok, result = results[instance.id]
+            if ok:
+                instance.write({'github_repo_url': result, 'need_custom_addons': True})
+                provisioned |= instance
+            else:
+                failures.append(f"{instance.name}: {result}")
+        if failures:
+            message = _("Failed to enable GitHub integration: %s") % '; '.join(failures)
             if raise_on_error:
-                raise UserError(_("Failed to enable GitHub integration: %s") % e) from e
-            return False
+                raise UserError(message)
+            _logger.error(message)
+        return provisioned
+
+    def enable_github_integration(self, raise_on_error=True):
+        self.ensure_one()
+        return bool(self._provision_github_integration(raise_on_error=raise_on_error))
 
     def action_enable_github_integration(self):
         self.ensure_one()
@@ -449,42 +616,110 @@ echo "=== Deployment Completed ==="
             'tag': 'display_notification',
             'params': {
                 'title': _('GitHub Integration Enabled'),
-                'message': _('GitHub repository and Jenkins job have been configured for this instance.'),
+                'message': _('GitHub repository and addons synchronization have been configured for this instance.'),
                 'type': 'success',
                 'sticky': False,
             }
         }
 
-    @api.onchange('name')
-    def onchange_name(self):
-        if self.name and not self.http_port:
-            port = self._get_available_port()
-            self.http_port = str(port)
-            self.longpolling_port = str(self._get_available_port(start_port=port + 1))
+    def action_bulk_enable_github_integration(self):
+        instances = self.filtered(lambda i: not i.github_repo_url)
+        provisioned = instances._provision_github_integration(raise_on_error=False)
+        failed = len(instances) - len(provisioned)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('GitHub Integration'),
+                'message': _("%(done)s instances provisioned, %(failed)s failed.",
+                             done=len(provisioned), failed=failed),
+                'type': 'warning' if failed else 'success',
+                'sticky': bool(failed),
+            }
+        }
+
+    def _get_git_mirror(self):
+        self.ensure_one()
+        if not self.github_repo_url:
+            raise UserError(_("Instance %s has no GitHub repository.") % self.name)
+        config_parameter = self.env['ir.config_parameter'].sudo()
+        root = config_parameter.get_param('docker_saas.git_mirror_path') or os.path.join(
+            tools.config['data_dir'], 'docker_saas', 'git_mirrors')
+        git_auth_user = config_parameter.get_param('docker_saas.git_auth_user', False)
+        git_auth_password = config_parameter.get_param('docker_saas.git_auth_password', False)
+        auth = (git_auth_user, git_auth_password) if git_auth_user and git_auth_password else None
+        return GitMirror(root, self.github_repo_url, auth=auth)
+
+    def action_sync_git_addons(self):
+        return self._enqueue_job('sync_addons')
+
+    def _sync_git_addons(self):
+        """Bring git_addons to the tip of the deployed branch.
+
+        The repository is fetched into a local mirror and only the files
+        changed since the last sync are written. Odoo is reloaded when
+        Python files (manifests included) changed, not for data or static
+        files, which it reads from disk.
+        """
+        self.ensure_one()
+        mirror = self._get_git_mirror()
+        try:
+            mirror.fetch()
+            commit = mirror.resolve(self.git_branch)
+            if not commit:
+                _logger.info("Nothing to deploy from %s for instance %s", self.github_repo_url, self.name)
+                return False
+            with mirror.locked():
+                previous, changed = mirror.checkout(commit, self.ensure_git_addons_directory())
+        except GitError as e:
+            self.message_post(body=_("Failed to synchronize custom addons: %s") % e)
+            raise UserError(_("Failed to synchronize custom addons: %s") % e) from e
+
+        self.write({'git_commit': commit, 'git_synced_at': fields.Datetime.now()})
+        if not changed:
+            return True
+        reload = needs_reload(changed) and self.state == 'running'
+        self.message_post(body=_(
+            "Custom addons synchronized to %(commit)s: %(count)s files changed%(reload)s.",
+            commit=commit[:12], count=len(changed),
+            reload=_(", Odoo will be reloaded") if reload else "",
+        ))
+        if reload:
+            self._schedule_module_reload()
+        return True
 
     # --------------------------------------------------
     # PORT MANAGEMENT
     # --------------------------------------------------
-    def _get_used_ports(self):
-        used = set()
-        for inst in self.env['docker.instance'].search([]):
-            for p in [inst.http_port, inst.longpolling_port]:
-                if p and p.isdigit():
-                    used.add(int(p))
-        return used
-
-    def _get_available_port(self, start_port=8069, end_port=9000):
-        used_ports = self._get_used_ports()
-        for port in range(start_port, end_port + 1):
-            if port in used_ports:
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_port_reservations()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if not self.env.context.get('skip_port_sync') and {'http_port', 'longpolling_port', 'docker_host'} & set(vals):
+            self._sync_port_reservations()
+        return res
+
+    def _sync_port_reservations(self):
+        """Reserve the instance ports, allocating free ones from the host pool when empty"""
+        Reservation = self.env['docker.port.reservation']
+        for instance in self:
+            missing = []
+            for kind, field_name in PORT_FIELDS:
+                value = instance[field_name]
+                if value and value.isdigit():
+                    Reservation._reserve(instance, kind, int(value))
+                else:
+                    missing.append((kind, field_name))
+            if not missing:
                 continue
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                try:
-                    sock.bind(('0.0.0.0', port))
-                    return port
-                except OSError:
-                    continue
-        raise ValidationError(_("No free port found between %s–%s") % (start_port, end_port))
+            ports = Reservation._allocate(instance, [kind for kind, _field_name in missing])
+            instance.with_context(skip_port_sync=True).write({
+                field_name: str(port) for (_kind, field_name), port in zip(missing, ports)
+            })
 
     # --------------------------------------------------
     # RESOURCE MANAGEMENT
@@ -563,43 +798,84 @@ echo "=== Deployment Completed ==="
         return lines
 
     def action_update_resources(self):
-        """Update resource limits and restart instance if running"""
+        """Queue a resource update; running containers are updated in place when possible"""
+        for instance in self:
+            if instance.state == 'draft':
+                raise UserError(_("Cannot update resources for draft instance."))
+        return self._enqueue_job('update_resources')
+
+    def _update_resources(self):
+        """Update resource limits, live when only the limits changed.
+
+        The compose file is always rewritten so the limits survive a
+        recreate. Running containers get the new limits through
+        ``docker update`` unless something else in the compose changed, or a
+        limit is being removed, in which case they are recreated.
+        """
         self.ensure_one()
-        
+
         if self.state == 'draft':
             raise UserError(_("Cannot update resources for draft instance."))
-        
+
         # Regenerate docker-compose with new resource limits
-        compose_path = os.path.join(self.instance_path, 'docker-compose.yml')
-        self._write_compose_file(compose_path, self.docker_compose_content)
-        
-        if self.state == 'running':
-            # Restart to apply new resource limits
+        compose_path = self._deploy_files()
+
+        if self.state != 'running':
+            self.message_post(body=_("Resource limits saved. Will apply on next start."))
+            return
+        if self.applied_compose_hash == self.compose_hash:
+            self.message_post(body=_("Resource limits already applied."))
+            return
+
+        limits = self._get_live_limits()
+        if limits and self.applied_structure_hash == self.compose_structure_hash:
+            backend = self._get_container_backend()
             try:
-                self._run(f"docker compose -f {compose_path} up -d --force-recreate")
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _('Resources Updated'),
-                        'message': _('Resource limits updated and containers recreated.'),
-                        'type': 'success',
-                        'sticky': False,
-                    }
-                }
-            except Exception as e:
-                raise UserError(_("Failed to update resources: %s") % str(e)) from e
-        
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _('Resources Updated'),
-                'message': _('Resource limits saved. Will apply on next start.'),
-                'type': 'success',
-                'sticky': False,
-            }
-        }
+                for name, container_limits in zip(self._get_container_names(), limits):
+                    backend.update(name, **container_limits)
+            except CONTAINER_ERRORS as e:
+                _logger.warning("Live resource update of %s failed, recreating: %s", self.name, e)
+            else:
+                self._mark_applied()
+                self.message_post(body=_("Resource limits applied to the running containers."))
+                return
+
+        try:
+            self._run(f"docker compose -f {compose_path} up -d --force-recreate")
+        except Exception as e:
+            raise UserError(_("Failed to update resources: %s") % str(e)) from e
+        self._mark_applied()
+        self.message_post(body=_("Resource limits updated and containers recreated."))
+
+    def _get_live_limits(self):
+        """Limits of the db and odoo containers for ``docker update``, in that order.
+
+        Returns None when a CPU or memory limit is unset: removing a limit
+        from a running container is left to a recreate. CPU reservations
+        have no runtime equivalent and only apply on the next recreate.
+        """
+        self.ensure_one()
+        limits = []
+        for cpus, memory, reservation in (
+            (self.postgres_cpu_limit, self.postgres_memory_limit, self.postgres_memory_reservation),
+            (self.cpu_limit, self.memory_limit, self.memory_reservation),
+        ):
+            memory_bytes = parse_memory(memory)
+            if cpus <= 0 or not memory_bytes:
+                return None
+            limits.append({
+                'cpus': cpus,
+                'memory': memory_bytes,
+                'memory_reservation': parse_memory(reservation) or 0,
+            })
+        return limits
+
+    def _mark_applied(self, applied=True):
+        """Record that the containers now match the rendered compose (or are gone)"""
+        self.write({
+            'applied_compose_hash': self.compose_hash if applied else False,
+            'applied_structure_hash': self.compose_structure_hash if applied else False,
+        })
 
     # --------------------------------------------------
     # TRAEFIK HELPERS
@@ -612,21 +888,21 @@ echo "=== Deployment Completed ==="
         slug = re.sub(r'-+', '-', slug).strip('-')
         return slug or 'instance'
 
-    def _get_traefik_labels(self):
+    def _get_traefik_labels(self, settings=None):
         """Generate Traefik labels for docker-compose with Odoo websocket support"""
         self.ensure_one()
         if not self.map_domain:
             return []
 
-        config = self.env['ir.config_parameter'].sudo()
-        subdomain = config.get_param('docker_saas.traefik_subdomain', '').strip()
+        settings = settings or self._get_rendering_settings()
+        subdomain = settings['traefik_subdomain']
         if not subdomain:
             return []
 
-        enable_https = config.get_param('docker_saas.traefik_enable_https', 'True') == 'True'
-        cert_resolver = config.get_param('docker_saas.traefik_cert_resolver', 'letsencrypt')
-        http_entrypoint = config.get_param('docker_saas.traefik_http_entrypoint', 'web')
-        https_entrypoint = config.get_param('docker_saas.traefik_https_entrypoint', 'websecure')
+        enable_https = settings['traefik_enable_https']
+        cert_resolver = settings['traefik_cert_resolver']
+        http_entrypoint = settings['traefik_http_entrypoint']
+        https_entrypoint = settings['traefik_https_entrypoint']
 
         slug = self._get_instance_slug()
         host = f"{slug}.{subdomain}"
@@ -672,22 +948,22 @@ echo "=== Deployment Completed ==="
         'postgres_memory_limit', 'postgres_memory_reservation'
     )
     def _compute_docker_compose_content(self):
+        # Settings are read once for the whole batch
+        settings = self._get_rendering_settings()
         for inst in self:
             if not inst.name:
                 inst.docker_compose_content = ''
+                inst.compose_hash = False
+                inst.compose_structure_hash = False
                 continue
 
-            odoo_image = {
-                '17.0': 'odoo:17.0',
-                '18.0': 'odoo:18.0',
-                '19.0': 'odoo:19.0',
-            }.get(inst.odoo_version)
+            odoo_image = inst._get_odoo_image()
 
             path = inst.instance_path
-            traefik_labels = inst._get_traefik_labels()
+            traefik_labels = inst._get_traefik_labels(settings)
 
             ports_lines = []
-            if inst.is_development_mode():
+            if settings['development_mode']:
                 if inst.http_port:
                     ports_lines.append(f'      - "{inst.http_port}:8069"')
                 if inst.longpolling_port:
@@ -713,7 +989,7 @@ echo "=== Deployment Completed ==="
             lines = [
                 "services:",
                 "  db:",
-                "    image: postgres:15",
+                f"    image: {POSTGRES_IMAGE}",
                 f"    container_name: {inst.db_name}_db",
                 "    environment:",
                 "      POSTGRES_DB: postgres",
@@ -782,12 +1058,17 @@ echo "=== Deployment Completed ==="
             ])
 
             inst.docker_compose_content = "\n".join(lines)
+            inst.compose_hash = inst._content_hash(inst.docker_compose_content)
+            resource_lines = set(db_resources) | set(odoo_resources)
+            inst.compose_structure_hash = inst._content_hash(
+                "\n".join(line for line in lines if line not in resource_lines))
 
     @api.depends('admin_password', 'db_password', 'db_user', 'db_name')
     def _compute_odoo_conf_content(self):
         for inst in self:
             if not inst.name:
                 inst.odoo_conf_content = ''
+                inst.conf_hash = False
                 continue
             inst.odoo_conf_content = f"""[options]
 admin_passwd = {inst.admin_password}
@@ -798,6 +1079,19 @@ db_password = {inst.db_password}
 db_name = {inst.name}
 addons_path = /mnt/extra-addons,/mnt/extra-addons/git_addons,/usr/lib/python3/dist-packages/odoo/addons
 """
+            inst.conf_hash = inst._content_hash(inst.odoo_conf_content)
+
+    def _get_odoo_image(self):
+        self.ensure_one()
+        return {
+            '17.0': 'odoo:17.0',
+            '18.0': 'odoo:18.0',
+            '19.0': 'odoo:19.0',
+        }.get(self.odoo_version)
+
+    @api.model
+    def _content_hash(self, content):
+        return hashlib.sha256((content or '').encode()).hexdigest()
 
     # --------------------------------------------------
     # HELPER FUNCTIONS
@@ -810,18 +1104,19 @@ addons_path = /mnt/extra-addons,/mnt/extra-addons/git_addons,/usr/lib/python3/di
         with open(path, 'w') as f:
             f.write(content)
 
-    def _write_compose_file(self, path, content):
+    def _write_compose_file(self, path, content, validate=True):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         fd, tmp_path = tempfile.mkstemp(prefix='docker-compose-', suffix='.yml', dir=os.path.dirname(path))
         try:
             with os.fdopen(fd, 'w') as tmp_file:
                 tmp_file.write(content)
-            try:
-                quoted_tmp = shlex.quote(tmp_path)
-                self._run(f"docker compose -f {quoted_tmp} config")
-            except UserError as err:
-                _logger.error("docker compose config validation failed for %s: %s", self.name, err)
-                raise UserError(_("Invalid docker-compose generated"))
+            if validate:
+                try:
+                    quoted_tmp = shlex.quote(tmp_path)
+                    self._run(f"docker compose -f {quoted_tmp} config")
+                except UserError as err:
+                    _logger.error("docker compose config validation failed for %s: %s", self.name, err)
+                    raise UserError(_("Invalid docker-compose generated"))
             os.replace(tmp_path, path)
         finally:
             if os.path.exists(tmp_path):
@@ -830,83 +1125,683 @@ addons_path = /mnt/extra-addons,/mnt/extra-addons/git_addons,/usr/lib/python3/di
                 except OSError:
                     pass
 
+    def _file_hash(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def _deploy_files(self):
+        """Write docker-compose.yml and odoo.conf, skipping what is already up to date.
+
+        A file whose content on disk already matches the rendering is left
+        alone, and compose content that was validated before is written
+        without running ``docker compose config`` again. Returns the compose path.
+        """
+        self.ensure_one()
+        compose = os.path.join(self.instance_path, 'docker-compose.yml')
+        conf = os.path.join(self.instance_path, 'config', 'odoo.conf')
+        if self._file_hash(compose) != self.compose_hash:
+            self._write_compose_file(
+                compose, self.docker_compose_content,
+                validate=self.validated_compose_hash != self.compose_hash,
+            )
+        if self._file_hash(conf) != self.conf_hash:
+            self._write_file(conf, self.odoo_conf_content)
+
+        vals = {
+            'validated_compose_hash': self.compose_hash,
+            'deployed_compose_hash': self.compose_hash,
+            'deployed_conf_hash': self.conf_hash,
+        }
+        if any(self[fname] != value for fname, value in vals.items()):
+            self.write(vals)
+        return compose
+
+    def _validate_compose_files(self, max_workers=8):
+        """Validate the compose rendering of many instances in parallel.
+
+        Only renderings not validated yet are checked. Instances that pass are
+        marked so that their jobs skip validation; the failing ones are returned.
+        """
+        todo = self.filtered(lambda i: i.compose_hash and i.validated_compose_hash != i.compose_hash)
+        if not todo:
+            return self.browse()
+        contents = [inst.docker_compose_content for inst in todo]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(todo))) as executor:
+            errors = list(executor.map(check_compose_content, contents))
+
+        failed = self.browse()
+        for inst, error in zip(todo, errors):
+            if error:
+                _logger.warning("docker compose config validation failed for %s: %s", inst.name, error)
+                failed |= inst
+        valid = todo - failed
+        if valid:
+            valid.flush_recordset(['compose_hash'])
+            self.env.cr.execute(
+                "UPDATE docker_instance SET validated_compose_hash = compose_hash WHERE id IN %s",
+                [tuple(valid.ids)],
+            )
+            valid.invalidate_recordset(['validated_compose_hash'])
+        return failed
+
+    def _get_container_names(self):
+        """Container names set by the compose generator, in start order"""
+        self.ensure_one()
+        return [f"{self.db_name}_db", f"{self.db_name}_odoo"]
+
+    def _get_container_backend(self):
+        """Return the backend used for operations on existing containers.
+
+        The Engine API backend is only usable for daemons reachable through a
+        local unix socket; anything else falls back to the docker CLI.
+        """
+        settings = self._get_settings_snapshot()
+        if settings.get('container_backend', 'cli') == 'api':
+            docker_host = self.docker_host if len(self) == 1 else False
+            if not docker_host or docker_host.startswith('unix://'):
+                socket_path = (docker_host or '')[len('unix://'):] or settings.get(
+                    'docker_socket') or DEFAULT_SOCKET
+                if os.path.exists(socket_path):
+                    return EngineApiBackend(get_client(socket_path), log=self._log_api_call)
+                _logger.warning("Docker socket %s not found, falling back to the CLI backend", socket_path)
+        return CliBackend(self._run)
+
+    def _log_api_call(self, operation):
+        _logger.info("Docker Engine API: %s", operation)
+        job_id = self.env.context.get('docker_saas_job_id')
+        if job_id:
+            self.env['docker.instance.job'].browse(job_id)._log_command(f"[engine-api] {operation}", '', '')
+
+    def get_container_status(self):
+        """Inspect the instance containers: {service: state}"""
+        self.ensure_one()
+        backend = self._get_container_backend()
+        status = {}
+        for service, name in zip(('db', 'odoo'), self._get_container_names()):
+            try:
+                status[service] = backend.inspect(name).get('State', {}).get('Status')
+            except (UserError, DockerAPIError, IndexError):
+                status[service] = 'missing'
+        return status
+
+    def _get_health_issue(self):
+        """Describe why the instance containers are not healthy, or return None"""
+        self.ensure_one()
+        backend = self._get_container_backend()
+        for name in self._get_container_names():
+            try:
+                state = backend.inspect(name).get('State') or {}
+            except CONTAINER_ERRORS + (IndexError,) as e:
+                return _("%(container)s cannot be inspected: %(error)s", container=name, error=e)
+            if state.get('Status') != 'running':
+                return _("%(container)s is %(status)s.", container=name, status=state.get('Status'))
+            if (state.get('Health') or {}).get('Status') == 'unhealthy':
+                return _("%s is unhealthy.") % name
+        return None
+
+    def get_container_stats(self):
+        """Resource usage of the instance containers: {service: stats}"""
+        self.ensure_one()
+        backend = self._get_container_backend()
+        return {
+            service: backend.stats(name)
+            for service, name in zip(('db', 'odoo'), self._get_container_names())
+        }
+
     def _run(self, cmd):
         _logger.info(f"Running command: {cmd}")
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        env = None
+        if self and self.docker_host:
+            env = dict(os.environ, DOCKER_HOST=self.docker_host)
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, env=env)
+        job_id = self.env.context.get('docker_saas_job_id')
+        if job_id:
+            self.env['docker.instance.job'].browse(job_id)._log_command(cmd, result.stdout, result.stderr)
         if result.returncode:
             raise UserError(f"Command failed:\n{cmd}\n\n{result.stderr}")
         return result.stdout
 
+    def _docker_popen(self, args, **kwargs):
+        """Start a docker CLI process whose stdin/stdout are streamed (exec, run).
+
+        stderr goes to a temporary file so a chatty process cannot block on a
+        full pipe; :meth:`_docker_wait` reports it.
+        """
+        _logger.info("Running command: %s", shlex.join(args))
+        env = None
+        if self and self.docker_host:
+            env = dict(os.environ, DOCKER_HOST=self.docker_host)
+        stderr = tempfile.TemporaryFile()
+        proc = subprocess.Popen(args, env=env, stderr=stderr, **kwargs)
+        proc.stderr_file = stderr
+        return proc
+
+    def _docker_wait(self, proc):
+        """Wait for a process started by :meth:`_docker_popen`, raise UserError if it failed"""
+        for stream in (proc.stdin, proc.stdout):
+            if stream and not stream.closed:
+                stream.close()
+        returncode = proc.wait()
+        proc.stderr_file.seek(0)
+        stderr = proc.stderr_file.read().decode(errors='replace')
+        proc.stderr_file.close()
+        cmd = shlex.join(proc.args)
+        job_id = self.env.context.get('docker_saas_job_id')
+        if job_id:
+            self.env['docker.instance.job'].browse(job_id)._log_command(cmd, '', stderr)
+        if returncode:
+            raise UserError(f"Command failed:\n{cmd}\n\n{stderr}")
+
     # --------------------------------------------------
     # ACTIONS
     # --------------------------------------------------
+    def _enqueue_job(self, operation):
+        """Queue ``operation`` for the instances and return a notification with the job handle"""
+        jobs = self.env['docker.instance.job']._enqueue(self, operation)
+        if len(jobs) == 1:
+            message = _("%s has been queued.")
+            links = [{
+                'label': jobs.name,
+                'url': f'#id={jobs.id}&model=docker.instance.job&view_type=form',
+            }]
+        else:
+            message = _("%s operations have been queued.") % len(jobs)
+            links = []
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Operation Queued"),
+                'message': message,
+                'links': links,
+                'type': 'info',
+                'sticky': False,
+            },
+        }
+
     def action_start_instance(self):
+        for instance in self:
+            if instance.state == 'running':
+                raise UserError(_("Instance already running"))
+        return self._enqueue_job('start')
+
+    def action_stop_instance(self):
+        return self._enqueue_job('stop')
+
+    def action_restart_instance(self):
+        return self._enqueue_job('restart')
+
+    def _start_instance(self):
+        self.ensure_one()
         if self.state == 'running':
             raise UserError(_("Instance already running"))
 
-        self._makedirs(self.instance_path)
-        self._makedirs(os.path.join(self.instance_path, 'config'))
-        self._makedirs(os.path.join(self.instance_path, 'addons'))
-        self._makedirs(os.path.join(self.instance_path, 'addons', 'git_addons'))
+        if not self.provisioned_at:
+            return self._provision_instance()
+
+        self._make_instance_dirs()
 
         if self.need_custom_addons and not self.github_repo_url:
             self.enable_github_integration(raise_on_error=True)
 
-        compose = os.path.join(self.instance_path, 'docker-compose.yml')
-        self._write_compose_file(compose, self.docker_compose_content)
-        conf = os.path.join(self.instance_path, 'config', 'odoo.conf')
-        self._write_file(conf, self.odoo_conf_content)
+        compose = self._deploy_files()
 
         try:
-            self._run(f"docker compose -f {compose} up -d")
+            backend = self._get_container_backend()
+            names = self._get_container_names()
+            if (backend.name != 'cli' and self.applied_compose_hash == self.compose_hash
+                    and all(backend.exists(name) for name in names)):
+                # Up-to-date containers survived a crash: no need to go through compose
+                backend.start(names)
+            else:
+                self._run(f"docker compose -f {compose} up -d")
+                self._mark_applied()
             self.state = 'running'
-            self.message_post(body=_("Instance started successfully."))
-        except UserError as e:
+            self.message_post(body=_("Instance started successfully: %s") % (self.mapped_domain or self.instance_url))
+        except CONTAINER_ERRORS as e:
             self.state = 'error'
             self.message_post(body=_("Failed to start instance: %s") % e)
             _logger.error(f"Failed to start instance {self.name}: {e}")
             raise
 
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Instance Started"),
-                'message': f"{self.name} is running on {self.instance_url}",
-                'type': 'success',
-            },
-        }
+    def _make_instance_dirs(self):
+        self._makedirs(self.instance_path)
+        self._makedirs(os.path.join(self.instance_path, 'config'))
+        self._makedirs(os.path.join(self.instance_path, 'addons'))
+        self._makedirs(os.path.join(self.instance_path, 'addons', 'git_addons'))
 
-    def action_stop_instance(self):
+    def _get_images(self):
+        self.ensure_one()
+        return [POSTGRES_IMAGE, self._get_odoo_image()]
+
+    def _provision_instance(self):
+        """First start of the instance, as a pipeline of stages.
+
+        The repository provisioning, the image pulls and the compose
+        validation do not depend on each other and run concurrently, with
+        only network and process calls in the threads. The duration of each
+        stage is recorded once it completes, in the caller's transaction (a
+        job commits it even when it fails), and a start retried after a
+        failure skips the stages already done.
+        """
+        self.ensure_one()
+        started = time.monotonic()
+        timings = dict(self.provisioning_timings or {})
+        labels = dict(PROVISIONING_STAGES)
+
+        def done(stage, duration):
+            timings[stage] = duration
+            self.provisioning_timings = dict(timings)
+
+        try:
+            if 'directories' not in timings:
+                stage_started = time.monotonic()
+                self._make_instance_dirs()
+                done('directories', time.monotonic() - stage_started)
+
+            tasks = {}
+            if 'scm' not in timings and self.need_custom_addons and not self.github_repo_url:
+                settings = self._get_provisioning_settings()
+                error = self._check_provisioning_settings(settings)
+                if error:
+                    raise UserError(error)
+                spec = self._get_provisioning_spec(settings)
+                provisioner = self._get_provisioner(settings)
+                hook_config = settings['hook_config']
+                tasks['scm'] = lambda: self._provision_one(provisioner, spec, hook_config)
+            if 'pull' not in timings:
+                images = self._get_images()
+                env = dict(os.environ, DOCKER_HOST=self.docker_host) if self.docker_host else None
+                tasks['pull'] = lambda: pull_images(images, env=env)
+            if self.validated_compose_hash != self.compose_hash:
+                content = self.docker_compose_content
+                tasks['validate'] = lambda: check_compose_content(content)
+
+            errors = []
+            job = self.env['docker.instance.job'].browse(self.env.context.get('docker_saas_job_id'))
+            for stage, (ok, result, duration) in run_parallel(tasks).items():
+                if not ok:
+                    errors.append(f"{labels[stage]}: {result}")
+                    continue
+                if stage == 'scm':
+                    self.write({'github_repo_url': result, 'need_custom_addons': True})
+                elif stage == 'pull' and job:
+                    for cmd, stdout, stderr in result:
+                        job._log_command(cmd, stdout, stderr)
+                elif stage == 'validate':
+                    if result:
+                        _logger.warning("docker compose config validation failed for %s: %s", self.name, result)
+                        errors.append(f"{labels[stage]}: {_('Invalid docker-compose generated')}")
+                        continue
+                    self.validated_compose_hash = self.compose_hash
+                timings[stage] = duration
+            self.provisioning_timings = dict(timings)
+            if errors:
+                raise UserError('\n'.join(errors))
+
+            stage_started = time.monotonic()
+            compose = self._deploy_files()
+            done('config', time.monotonic() - stage_started)
+
+            stage_started = time.monotonic()
+            self._run(f"docker compose -f {compose} up -d")
+            self._mark_applied()
+            timings['up'] = time.monotonic() - stage_started
+        except CONTAINER_ERRORS as e:
+            self.write({'state': 'error', 'provisioning_timings': dict(timings)})
+            self.message_post(body=_("Failed to start instance: %s") % e)
+            _logger.error(f"Failed to provision instance {self.name}: {e}")
+            raise
+
+        timings['total'] = time.monotonic() - started
+        self.write({
+            'provisioning_timings': timings,
+            'provisioned_at': fields.Datetime.now(),
+            'state': 'running',
+        })
+        self.message_post(body=_("Instance started successfully in %(duration)s s: %(url)s",
+                                 duration=round(timings['total'], 1),
+                                 url=self.mapped_domain or self.instance_url))
+
+    def _stop_instance(self):
         self.ensure_one()
         compose = os.path.join(self.instance_path, 'docker-compose.yml')
         if not os.path.exists(compose):
             raise UserError(_("docker-compose.yml not found"))
 
         try:
-            self._run(f"docker compose -f {compose} down")
+            backend = self._get_container_backend()
+            if backend.name != 'cli':
+                # Same outcome as "compose down": containers go, named volumes stay
+                names = [name for name in reversed(self._get_container_names()) if backend.exists(name)]
+                backend.stop(names)
+                backend.remove(names)
+            else:
+                self._run(f"docker compose -f {compose} down")
+            self._mark_applied(False)
             self.state = 'stopped'
             self.message_post(body=_("Instance stopped successfully."))
-        except UserError as e:
+        except CONTAINER_ERRORS as e:
             self.state = 'error'
             self.message_post(body=_("Failed to stop instance: %s") % e)
             _logger.error(f"Failed to stop instance {self.name}: {e}")
             raise
 
-    def action_restart_instance(self):
+    def _restart_instance(self):
         self.ensure_one()
         compose = os.path.join(self.instance_path, 'docker-compose.yml')
         try:
-            self._run(f"docker compose -f {compose} restart")
+            backend = self._get_container_backend()
+            if backend.name != 'cli':
+                backend.restart(self._get_container_names())
+            else:
+                self._run(f"docker compose -f {compose} restart")
             if self.state != 'running':
                 self.state = 'running'
             self.message_post(body=_("Instance restarted successfully."))
-        except UserError as e:
+        except CONTAINER_ERRORS as e:
             self.state = 'error'
             self.message_post(body=_("Failed to restart instance: %s") % e)
             _logger.error(f"Failed to restart instance {self.name}: {e}")
             raise
 
+    def _schedule_module_reload(self):
+        """Queue a reload of the Odoo service after a change of custom modules.
+
+        Changes arriving within ``docker_saas.module_reload_delay`` seconds of
+        each other push the same job back, so a batch of uploads costs a
+        single restart once the last one is in.
+        """
+        delay = int(self.env['ir.config_parameter'].sudo().get_param('docker_saas.module_reload_delay', 15) or 0)
+        return self.env['docker.instance.job']._enqueue(self, 'reload_modules', delay=max(delay, 0))
+
+    def _reload_modules(self):
+        """Restart the Odoo container only: the database has no reason to go down"""
+        self.ensure_one()
+        if self.state != 'running':
+            # Picked up at the next start anyway
+            return
+        compose = os.path.join(self.instance_path, 'docker-compose.yml')
+        try:
+            backend = self._get_container_backend()
+            if backend.name != 'cli':
+                backend.restart(self._get_container_names()[1:])
+            else:
+                self._run(f"docker compose -f {compose} restart odoo")
+            self.message_post(body=_("Odoo restarted to load the updated custom modules."))
+        except CONTAINER_ERRORS as e:
+            self.message_post(body=_("Failed to reload custom modules: %s") % e)
+            _logger.error(f"Failed to reload custom modules of instance {self.name}: {e}")
+            raise
+
+    def _recreate_instance(self):
+        self.ensure_one()
+        if self.state == 'draft':
+            raise UserError(_("Cannot recreate a draft instance."))
+        compose = self._deploy_files()
+        try:
+            self._run(f"docker compose -f {compose} up -d --force-recreate")
+            self._mark_applied()
+            self.state = 'running'
+            self.message_post(body=_("Instance containers recreated."))
+        except UserError as e:
+            self.state = 'error'
+            self.message_post(body=_("Failed to recreate instance: %s") % e)
+            _logger.error(f"Failed to recreate instance {self.name}: {e}")
+            raise
+
+    def _apply_pricing_tier_live(self):
+        """Apply the pricing tier limits and push them to the containers"""
+        self.ensure_one()
+        self._apply_pricing_tier()
+        if self.state != 'draft':
+            self._update_resources()
+
+    def _restore_backup(self):
+        """Run the pending backup restore targeting this instance"""
+        self.ensure_one()
+        restore = self.env['docker.backup.restore'].search([
+            ('instance_id', '=', self.id),
+            ('state', '=', 'queued'),
+        ], order='id', limit=1)
+        if not restore:
+            raise UserError(_("No restore is queued for instance %s.") % self.name)
+        restore._execute()
+
+    def _reset_database_identity(self):
+        """Give a database restored from another instance its own identity and URL"""
+        self.ensure_one()
+        db_container, odoo_container = self._get_container_names()
+        base_url = (self.mapped_domain or self.instance_url or '').replace("'", "''")
+        sql = (
+            "UPDATE ir_config_parameter SET value = gen_random_uuid()::text "
+            "WHERE key IN ('database.uuid', 'database.secret');"
+        )
+        if base_url:
+            sql += f" UPDATE ir_config_parameter SET value = '{base_url}' WHERE key = 'web.base.url';"
+        self._run(
+            f"docker exec {shlex.quote(db_container)} psql -q -U {shlex.quote(self.db_user)} "
+            f"-d {shlex.quote(self.db_name)} -c {shlex.quote(sql)}"
+        )
+        # Configuration parameters are cached by the running server
+        self._get_container_backend().restart([odoo_container])
+
+    # --------------------------------------------------
+    # BULK ACTIONS
+    # --------------------------------------------------
+    def _launch_bulk(self, operation):
+        if not self:
+            raise UserError(_("None of the selected instances can run this operation."))
+        if operation in COMPOSE_OPERATIONS:
+            # Validate every compose file up front, in parallel, instead of once per job
+            self._validate_compose_files()
+        batch = self.env['docker.instance.job.batch']._launch(self, operation)
+        return {
+            'name': batch.name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'docker.instance.job.batch',
+            'res_id': batch.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    def action_bulk_start(self):
+        return self.filtered(lambda i: i.state != 'running')._launch_bulk('start')
+
+    def action_bulk_stop(self):
+        return self.filtered(lambda i: i.state != 'draft')._launch_bulk('stop')
+
+    def action_bulk_restart(self):
+        return self.filtered(lambda i: i.state != 'draft')._launch_bulk('restart')
+
+    def action_bulk_recreate(self):
+        return self.filtered(lambda i: i.state != 'draft')._launch_bulk('recreate')
+
+    def action_bulk_apply_pricing_tier(self):
+        return self.filtered('pricing_tier_id')._launch_bulk('apply_tier')
+
+    # --------------------------------------------------
+    # STATE RECONCILIATION
+    # --------------------------------------------------
+    @api.model
+    def _cron_reconcile_states(self):
+        """Align every instance state with the containers actually present.
+
+        Containers are listed once per Docker host and the changed instances
+        are written with one ``write`` per resulting state.
+        """
+        busy = self.env['docker.instance.job'].search([('state', '=', 'running')]).instance_id
+        instances = self.search_fetch(
+            [('state', '!=', 'draft'), ('id', 'not in', busy.ids)],
+            ['db_name', 'state', 'docker_host'],
+        )
+        by_host = {}
+        for instance in instances:
+            by_host.setdefault(instance.docker_host or '', []).append(instance)
+
+        changes = {}
+        for host, host_instances in by_host.items():
+            try:
+                containers = host_instances[0]._get_container_backend().list_containers()
+            except CONTAINER_ERRORS as e:
+                _logger.warning("Cannot list containers of Docker host %s: %s", host or 'local', e)
+                continue
+            for instance in host_instances:
+                state = self._reconciled_state(
+                    instance.state,
+                    (containers.get(f"{instance.db_name}_odoo") or {}).get('state'),
+                    (containers.get(f"{instance.db_name}_db") or {}).get('state'),
+                )
+                if state != instance.state:
+                    changes.setdefault(state, []).append(instance.id)
+
+        for state, ids in changes.items():
+            self.browse(ids).write({'state': state})
+        if changes:
+            _logger.info("Reconciled instance states: %s", {state: len(ids) for state, ids in changes.items()})
+        return changes
+
+    @api.model
+    def _reconciled_state(self, current, odoo_state, db_state):
+        """Instance state implied by its container states (None = missing)"""
+        if odoo_state is None and db_state is None:
+            return 'stopped' if current in ('running', 'error') else current
+        if odoo_state == 'running' and db_state == 'running':
+            return 'running'
+        if current == 'stopped':
+            # Leftover containers of a stopped instance are not an error
+            return current
+        if odoo_state in (None, 'exited', 'dead', 'restarting') or db_state in (None, 'exited', 'dead', 'restarting'):
+            return 'error'
+        return current
+
+    # --------------------------------------------------
+    # CONTAINER EVENTS
+    # --------------------------------------------------
+    @api.model
+    def _cron_listen_events(self):
+        """Apply the container events of every Docker host since the last run.
+
+        Each host is read in its own thread, from the position stored for it
+        up to now minus ``docker_saas.events_debounce`` seconds: the most
+        recent events are left to the next run, so a burst still going on is
+        not split in two. A run reads what is already there and returns, it
+        never waits for new events.
+        """
+        hosts = sorted(set(self.search([('state', '!=', 'draft')]).mapped(lambda i: i.docker_host or '')))
+        return run_in_threads(
+            self.env, hosts,
+            lambda env, host: env['docker.instance']._read_host_events(host),
+            max_workers=len(hosts) or 1,
+        )
+
+    @api.model
+    def _read_host_events(self, docker_host):
+        config = self.env['ir.config_parameter'].sudo()
+        cursor = self.env['docker.event.cursor']._for_host(docker_host)
+        debounce = float(config.get_param('docker_saas.events_debounce', 2.0) or 0)
+        now = time.time_ns()
+        since = cursor.since or format_since(now - EVENTS_WINDOW_SECONDS * 10 ** 9)
+        until = format_since(now - int(debounce * 10 ** 9))
+        if float(until) <= float(since):
+            return {}
+        backend = self.search([('docker_host', '=', docker_host or False)], limit=1)._get_container_backend()
+
+        debouncer = EventDebouncer(0)
+        try:
+            for raw in backend.events(since, until):
+                event = parse_event(raw)
+                if event:
+                    debouncer.feed(event)
+        except CONTAINER_ERRORS + (http.client.HTTPException, ValueError) as e:
+            # Daemon restarting or connection dropped: the next run reads the same range again
+            _logger.warning("Docker events of host %s interrupted: %s", docker_host or 'local', e)
+            return {}
+        changed = self._apply_container_events(debouncer.flush(force=True))
+        cursor.since = until
+        return changed
+
+    @api.model
+    def _process_container_events(self, raw_events):
+        """Apply an iterable of raw Docker events, e.g. a recorded event stream"""
+        debouncer = EventDebouncer(0)
+        for raw in raw_events:
+            event = parse_event(raw)
+            if event:
+                debouncer.feed(event)
+        return self._apply_container_events(debouncer.flush(force=True))
+
+    @api.model
+    def _apply_container_events(self, summaries):
+        """Update instances from debounced event summaries.
+
+        Returns ``{state: instance_ids}`` for the instances whose state changed.
+        """
+        by_db = {}
+        for summary in summaries:
+            db_name, _sep, service = summary['name'].rpartition('_')
+            if db_name and service in ('db', 'odoo'):
+                by_db.setdefault(db_name, {})[service] = summary
+        if not by_db:
+            return {}
+
+        instances = self.search([('db_name', 'in', list(by_db)), ('state', '!=', 'draft')])
+        busy = self.env['docker.instance.job'].search([
+            ('instance_id', 'in', instances.ids),
+            ('state', '=', 'running'),
+        ]).instance_id
+        changes = {}
+        to_restart = self.browse()
+        for instance in instances:
+            services = by_db[instance.db_name]
+            for service, summary in services.items():
+                if summary['oom']:
+                    instance.message_post(body=_(
+                        "The %(service)s container was killed because it ran out of memory.",
+                        service=service,
+                    ))
+                if summary['health'] == 'unhealthy':
+                    instance.message_post(body=_("The %(service)s container is unhealthy.", service=service))
+            if instance in busy:
+                # The running job owns the state; its own stop/start events are expected
+                continue
+            state = self._evented_state(instance.state, services)
+            if state == instance.state:
+                continue
+            changes.setdefault(state, []).append(instance.id)
+            if state == 'error':
+                crashed = ', '.join(
+                    _("%(service)s (exit code %(code)s)", service=service, code=summary['exit_code'])
+                    for service, summary in services.items()
+                    if summary['action'] in ('die', 'oom')
+                )
+                instance.message_post(body=_("Container stopped unexpectedly: %s") % crashed)
+                if instance.auto_restart:
+                    to_restart |= instance
+
+        for state, ids in changes.items():
+            self.browse(ids).write({'state': state})
+        if to_restart:
+            self.env['docker.instance.job']._enqueue(to_restart, 'restart')
+        if changes:
+            _logger.info("Container events changed instance states: %s",
+                         {state: len(ids) for state, ids in changes.items()})
+        return changes
+
+    @api.model
+    def _evented_state(self, current, services):
+        """Instance state implied by the last event of each service ({service: summary})"""
+        actions = {service: summary['action'] for service, summary in services.items()}
+        if any(action in ('die', 'oom') for action in actions.values()):
+            # A stop requested from here also emits die events
+            return current if current == 'stopped' else 'error'
+        if actions.get('odoo') == 'start' and current == 'error':
+            return 'running'
+        return current
+
     def action_open_instance_url(self):
 
         self.ensure_one()
@@ -931,6 +1826,51 @@ addons_path = /mnt/extra-addons,/mnt/extra-addons/git_addons,/usr/lib/python3/di
             instance.backup_config_count = len(instance.backup_config_ids)
             instance.backup_count = len(instance.backup_record_ids)
 
+    def _compute_job_count(self):
+        for instance in self:
+            instance.job_count = len(instance.job_ids)
+
+    def _compute_usage_24h(self):
+        usage = {}
+        if self.ids:
+            groups = self.env['docker.instance.metric']._read_group(
+                [
+                    ('instance_id', 'in', self.ids),
+                    ('resolution', '=', 'minute'),
+                    ('timestamp', '>=', fields.Datetime.subtract(fields.Datetime.now(), days=1)),
+                ],
+                ['instance_id', 'service'],
+                ['cpu_percent:avg', 'mem_max:max'],
+            )
+            for instance, service, cpu, memory in groups:
+                instance_usage = usage.setdefault(instance.id, [0.0, 0.0])
+                if service == 'odoo':
+                    instance_usage[0] = cpu or 0.0
+                instance_usage[1] += (memory or 0.0) / 1024 ** 2
+        for instance in self:
+            instance.cpu_usage_24h, instance.memory_peak_24h = usage.get(instance.id, (0.0, 0.0))
+
+    def action_open_metrics(self):
+        self.ensure_one()
+        return {
+            'name': _('Resource Usage'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'docker.instance.metric',
+            'view_mode': 'graph,pivot,tree',
+            'domain': [('instance_id', '=', self.id)],
+            'context': {'search_default_resolution_minute': 1, 'search_default_last_24h': 1},
+        }
+
+    def action_open_jobs(self):
+        self.ensure_one()
+        return {
+            'name': _('Jobs'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'docker.instance.job',
+            'view_mode': 'tree,form',
+            'domain': [('instance_id', '=', self.id)],
+        }
+
     def action_open_backup_configs(self):
         self.ensure_one()
         return {
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import _, api, fields, models
+
+from ..tools.pool import run_in_threads
+
+_logger = logging.getLogger(__name__)
+
+# operation -> method executed on the docker.instance record
+JOB_OPERATIONS = {
+    'start': '_start_instance',
+    'stop': '_stop_instance',
+    'restart': '_restart_instance',
+    'update_resources': '_update_resources',
+    'recreate': '_recreate_instance',
+    'apply_tier': '_apply_pricing_tier_live',
+    'restore': '_restore_backup',
+    'reload_modules': '_reload_modules',
+    'sync_addons': '_sync_git_addons',
+}
+
+# Jobs left in "running" longer than this are considered orphaned by a dead worker
+STALE_JOB_MINUTES = 60
+# Operations allowed to run longer than STALE_JOB_MINUTES
+LONG_JOB_MINUTES = {'restore': 24 * 60}
+
+
+class DockerInstanceJob(models.Model):
+    _name = 'docker.instance.job'
+    _description = 'Docker Instance Job'
+    _order = 'id desc'
+
+    name = fields.Char(required=True, readonly=True)
+    instance_id = fields.Many2one(
+        'docker.instance',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True,
+    )
+    operation = fields.Selection(
+        [
+            ('start', 'Start'),
+            ('stop', 'Stop'),
+            ('restart', 'Restart'),
+            ('update_resources', 'Update Resources'),
+            ('recreate', 'Recreate'),
+            ('apply_tier', 'Apply Pricing Tier'),
+            ('restore', 'Restore Backup'),
+            ('reload_modules', 'Reload Modules'),
+            ('sync_addons', 'Sync Git Addons'),
+        ],
+        required=True,
+        readonly=True,
+    )
+    batch_id = fields.Many2one('docker.instance.job.batch', ondelete='set null', index=True, readonly=True)
+    docker_host = fields.Char(related='instance_id.docker_host')
+    state = fields.Selection(
+        [
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        default='queued',
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    user_id = fields.Many2one('res.users', string='Requested By', default=lambda self: self.env.user, readonly=True)
+    scheduled_at = fields.Datetime(default=fields.Datetime.now, required=True, index=True, readonly=True)
+    attempts = fields.Integer(readonly=True)
+    max_attempts = fields.Integer(
+        default=lambda self: self._default_max_attempts(),
+        help="Number of times the operation is tried before the job is marked as failed.",
+    )
+    date_started = fields.Datetime(readonly=True)
+    date_done = fields.Datetime(readonly=True)
+    duration = fields.Float(string='Duration (s)', readonly=True)
+    stdout = fields.Text(readonly=True)
+    stderr = fields.Text(readonly=True)
+    message = fields.Text(readonly=True)
+
+    @api.model
+    def _default_max_attempts(self):
+        value = self.env['ir.config_parameter'].sudo().get_param('docker_saas.job_max_attempts', '3')
+        return max(int(value or 1), 1)
+
+    # --------------------------------------------------
+    # ENQUEUE
+    # --------------------------------------------------
+    @api.model
+    def _enqueue(self, instances, operation, batch=None, delay=0):
+        """Queue ``operation`` for every instance.
+
+        Outside of a batch, jobs already waiting for the same operation are
+        reused instead of queueing duplicates. With a ``delay`` (seconds) the
+        jobs are due that long from now, and reused ones are postponed as
+        well, so requests arriving within the window run once at its end.
+        """
+        if operation not in JOB_OPERATIONS:
+            raise ValueError("Unknown docker instance operation: %s" % operation)
+        pending = self.browse()
+        if not batch:
+            pending = self.search([
+                ('instance_id', 'in', instances.ids),
+                ('operation', '=', operation),
+                ('state', '=', 'queued'),
+            ])
+        pending_by_instance = {job.instance_id.id: job for job in pending}
+        label = dict(self._fields['operation'].selection)[operation]
+        scheduled_at = fields.Datetime.now() + timedelta(seconds=delay)
+        if delay and pending:
+            pending.write({'scheduled_at': scheduled_at})
+        vals_list = [
+            {
+                'name': f"{label} {instance.name}",
+                'instance_id': instance.id,
+                'operation': operation,
+                'batch_id': batch.id if batch else False,
+                'scheduled_at': scheduled_at,
+            }
+            for instance in instances
+            if instance.id not in pending_by_instance
+        ]
+        jobs = pending | self.create(vals_list)
+        jobs._trigger_runner(at=scheduled_at if delay else None)
+        return jobs
+
+    def _trigger_runner(self, at=None):
+        cron = self.env.ref('docker_saas.ir_cron_docker_saas_job_runner', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(at=at)
+
+    # --------------------------------------------------
+    # RUNNER
+    # --------------------------------------------------
+    @api.model
+    def _cron_process_jobs(self):
+        self._requeue_stale_jobs()
+        # Workers run on their own cursors: publish the requeued jobs first
+        self.env.cr.commit()
+        config = self.env['ir.config_parameter'].sudo()
+        max_workers = max(int(config.get_param('docker_saas.job_workers', '4') or 1), 1)
+        host_limit = int(config.get_param('docker_saas.job_host_limit', '0') or 0)
+        run_in_threads(
+            self.env, range(max_workers),
+            lambda env, _worker: env['docker.instance.job']._work_loop(host_limit),
+            max_workers=max_workers,
+        )
+
+    @api.model
+    def _work_loop(self, host_limit=0):
+        """Claim and execute due jobs one by one until the queue is drained."""
+        processed = 0
+        while True:
+            job = self._claim_next_job(host_limit)
+            if not job:
+                return processed
+            job._execute()
+            self.env.cr.commit()
+            processed += 1
+
+    @api.model
+    def _claim_next_job(self, host_limit=0):
+        """Lock, mark as running and commit the next due job.
+
+        Only one job runs per instance at a time and, when ``host_limit`` is
+        set, no more than ``host_limit`` jobs run against the same Docker host.
+        """
+        # Serialize claims so concurrent workers see each other's running jobs.
+        # The lock is held by the session and the transaction that waited for
+        # it is committed: the claim then reads from a snapshot taken after the
+        # previous claimer committed, not from before the wait.
+        self.env.cr.execute("SELECT pg_advisory_lock(hashtext('docker_instance_job_claim'))")
+        self.env.cr.commit()
+        try:
+            job = self._select_next_job(host_limit)
+            if job:
+                job.write({'state': 'running', 'date_started': fields.Datetime.now()})
+            # Make the "running" state visible before the slow work starts
+            self.env.cr.commit()
+        except Exception:
+            self.env.cr.rollback()
+            raise
+        finally:
+            self.env.cr.execute("SELECT pg_advisory_unlock(hashtext('docker_instance_job_claim'))")
+        return job
+
+    @api.model
+    def _select_next_job(self, host_limit=0):
+        self.env.cr.execute(
+            """
+            SELECT job.id
+              FROM docker_instance_job job
+              JOIN docker_instance inst ON inst.id = job.instance_id
+             WHERE job.state = 'queued'
+               AND job.scheduled_at <= (now() at time zone 'UTC')
+               AND NOT EXISTS (
+                   SELECT 1 FROM docker_instance_job busy
+                    WHERE busy.state = 'running' AND busy.instance_id = job.instance_id
+               )
+               AND (%(host_limit)s <= 0 OR (
+                   SELECT count(*)
+                     FROM docker_instance_job busy
+                     JOIN docker_instance busy_inst ON busy_inst.id = busy.instance_id
+                    WHERE busy.state = 'running'
+                      AND COALESCE(busy_inst.docker_host, '') = COALESCE(inst.docker_host, '')
+               ) < %(host_limit)s)
+          ORDER BY job.scheduled_at, job.id
+             LIMIT 1
+               FOR UPDATE OF job SKIP LOCKED
+            """,
+            {'host_limit': host_limit},
+        )
+        row = self.env.cr.fetchone()
+        return self.browse(row[0] if row else [])
+
+    @api.model
+    def _requeue_stale_jobs(self):
+        now = fields.Datetime.now()
+        stale = self.search([
+            ('state', '=', 'running'),
+            ('date_started', '<', now - timedelta(minutes=STALE_JOB_MINUTES)),
+        ]).filtered(lambda job: job.date_started < now - timedelta(
+            minutes=LONG_JOB_MINUTES.get(job.operation, STALE_JOB_MINUTES)))
+        if stale:
+            _logger.warning("Requeueing %s orphaned docker jobs", len(stale))
+            stale.write({'state': 'queued', 'scheduled_at': fields.Datetime.now()})
+
+    def _execute(self):
+        self.ensure_one()
+        started = fields.Datetime.now()
+        attempt = self.attempts + 1
+        self.write({
+            'state': 'running',
+            'attempts': attempt,
+            'date_started': started,
+            'message': False,
+        })
+        instance = self.instance_id.with_context(docker_saas_job_id=self.id)
+        try:
+            getattr(instance, JOB_OPERATIONS[self.operation])()
+        except Exception as exc:
+            if isinstance(exc, psycopg2.Error):
+                self.env.cr.rollback()
+            _logger.error("Docker job %s failed (attempt %s): %s", self.name, attempt, exc)
+            self._handle_failure(str(exc), started, attempt)
+            return False
+
+        done = fields.Datetime.now()
+        self.write({
+            'state': 'done',
+            'date_done': done,
+            'duration': (done - started).total_seconds(),
+        })
+        return True
+
+    def _handle_failure(self, message, started, attempt):
+        self.ensure_one()
+        now = fields.Datetime.now()
+        vals = {
+            'attempts': attempt,
+            'message': message,
+            'duration': (now - started).total_seconds(),
+        }
+        if attempt < self.max_attempts:
+            # Exponential backoff: 30s, 60s, 120s...
+            delay = 30 * 2 ** (attempt - 1)
+            vals.update(state='queued', scheduled_at=now + timedelta(seconds=delay))
+            self.write(vals)
+            self._trigger_runner(at=vals['scheduled_at'])
+        else:
+            vals.update(state='failed', date_done=now)
+            self.write(vals)
+            self.instance_id.message_post(
+                body=_("%(job)s failed after %(attempts)s attempts: %(error)s",
+                       job=self.name, attempts=attempt, error=message)
+            )
+
+    def _log_command(self, cmd, stdout, stderr):
+        """Append the output of a command run on behalf of this job."""
+        self.ensure_one()
+        header = f"$ {cmd}\n"
+        self.write({
+            'stdout': (self.stdout or '') + header + (stdout or ''),
+            'stderr': (self.stderr or '') + (header + stderr if stderr else ''),
+        })
+
+    # --------------------------------------------------
+    # ACTIONS
+    # --------------------------------------------------
+    def action_retry(self):
+        self.filtered(lambda job: job.state == 'failed').write({
+            'state': 'queued',
+            'scheduled_at': fields.Datetime.now(),
+            'attempts': 0,
+        })
+        self._trigger_runner()
+
+
+class DockerInstanceJobBatch(models.Model):
+    _name = 'docker.instance.job.batch'
+    _description = 'Docker Instance Bulk Operation'
+    _order = 'id desc'
+
+    name = fields.Char(required=True, readonly=True)
+    operation = fields.Selection(
+        selection=lambda self: self.env['docker.instance.job']._fields['operation'].selection,
+        required=True,
+        readonly=True,
+    )
+    user_id = fields.Many2one('res.users', string='Requested By', default=lambda self: self.env.user, readonly=True)
+    job_ids = fields.One2many('docker.instance.job', 'batch_id', string='Jobs', readonly=True)
+    job_count = fields.Integer(compute='_compute_progress')
+    pending_count = fields.Integer(string='Pending', compute='_compute_progress')
+    done_count = fields.Integer(string='Succeeded', compute='_compute_progress')
+    failed_count = fields.Integer(string='Failed', compute='_compute_progress')
+    progress = fields.Float(compute='_compute_progress')
+    state = fields.Selection(
+        [
+            ('in_progress', 'In Progress'),
+            ('done', 'Done'),
+            ('failed', 'Done with Errors'),
+        ],
+        compute='_compute_progress',
+    )
+
+    @api.depends('job_ids.state')
+    def _compute_progress(self):
+        for batch in self:
+            states = batch.job_ids.mapped('state')
+            batch.job_count = len(states)
+            batch.done_count = states.count('done')
+            batch.failed_count = states.count('failed')
+            batch.pending_count = batch.job_count - batch.done_count - batch.failed_count
+            finished = batch.done_count + batch.failed_count
+            batch.progress = 100.0 * finished / batch.job_count if batch.job_count else 100.0
+            if batch.pending_count:
+                batch.state = 'in_progress'
+            elif batch.failed_count:
+                batch.state = 'failed'
+            else:
+                batch.state = 'done'
+
+    @api.model
+    def _launch(self, instances, operation):
+        label = dict(self.env['docker.instance.job']._fields['operation'].selection)[operation]
+        batch = self.create({
+            'name': _("%(operation)s on %(count)s instances", operation=label, count=len(instances)),
+            'operation': operation,
+        })
+        self.env['docker.instance.job']._enqueue(instances, operation, batch=batch)
+        return batch
+
+    def action_retry_failed(self):
+        self.job_ids.action_retry()
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+from ..tools.metrics import MetricsSampler, cgroup_v2_available, find_container_cgroup, read_cgroup_usage
+from ..tools.pool import run_in_threads
+from .docker_instance import CONTAINER_ERRORS
+
+_logger = logging.getLogger(__name__)
+
+RESOLUTIONS = [
+    ('raw', 'Raw'),
+    ('minute', '1 Minute'),
+    ('hour', '1 Hour'),
+    ('day', '1 Day'),
+]
+# (source, target) resolutions, the target being a date_trunc() unit
+ROLLUPS = [('raw', 'minute'), ('minute', 'hour'), ('hour', 'day')]
+# Retention of each resolution: (config parameter, default, unit)
+RETENTION = {
+    'raw': ('docker_saas.metrics_retention_raw_hours', 6, 'hours'),
+    'minute': ('docker_saas.metrics_retention_minute_days', 3, 'days'),
+    'hour': ('docker_saas.metrics_retention_hour_days', 90, 'days'),
+    'day': ('docker_saas.metrics_retention_day_days', 730, 'days'),
+}
+# Last reading of every container per (database, Docker host), kept across
+# cron runs so that each run only needs a single pass
+_SAMPLERS = {}
+# Delay before a closed bucket is rolled up, covering samples not committed yet
+ROLLUP_GRACE_SECONDS = 60
+METRIC_COLUMNS = [
+    'cpu_percent', 'cpu_max', 'cpu_limit',
+    'mem_usage', 'mem_max', 'mem_limit',
+    'net_rx', 'net_tx', 'blk_read', 'blk_write',
+]
+
+
+class DockerInstanceMetric(models.Model):
+    """Resource usage time series of the instance containers.
+
+    Rows are append-only and written in bulk without the ORM: raw samples
+    taken every minute are rolled up into minute, hour and day buckets, and
+    each resolution is pruned after its own retention. Averages are weighted
+    by ``samples``; network and block I/O hold the bytes transferred during
+    the sample or bucket.
+    """
+    _name = 'docker.instance.metric'
+    _description = 'Docker Instance Resource Metric'
+    _order = 'timestamp desc'
+    _log_access = False
+
+    instance_id = fields.Many2one('docker.instance', required=True, ondelete='cascade')
+    service = fields.Selection([('odoo', 'Odoo'), ('db', 'PostgreSQL')], required=True)
+    resolution = fields.Selection(RESOLUTIONS, required=True, default='raw')
+    timestamp = fields.Datetime(required=True)
+    samples = fields.Integer(default=1)
+
+    cpu_percent = fields.Float(string='CPU (%)', group_operator='avg')
+    cpu_max = fields.Float(string='Peak CPU (%)', group_operator='max')
+    cpu_limit = fields.Float(string='CPU Limit (%)', group_operator='max')
+    mem_usage = fields.Float(string='Memory (bytes)', digits=(20, 0), group_operator='avg')
+    mem_max = fields.Float(string='Peak Memory (bytes)', digits=(20, 0), group_operator='max')
+    mem_limit = fields.Float(string='Memory Limit (bytes)', digits=(20, 0), group_operator='max')
+    net_rx = fields.Float(string='Network In (bytes)', digits=(20, 0))
+    net_tx = fields.Float(string='Network Out (bytes)', digits=(20, 0))
+    blk_read = fields.Float(string='Disk Read (bytes)', digits=(20, 0))
+    blk_write = fields.Float(string='Disk Write (bytes)', digits=(20, 0))
+
+    def init(self):
+        create_index(
+            self._cr, 'docker_instance_metric_instance_idx', self._table,
+            ['instance_id', 'resolution', 'timestamp'],
+        )
+        create_index(
+            self._cr, 'docker_instance_metric_resolution_idx', self._table,
+            ['resolution', 'timestamp'],
+        )
+
+    # --------------------------------------------------
+    # COLLECTION
+    # --------------------------------------------------
+    @api.model
+    def _cron_collect(self):
+        """Sample the containers of every running instance once.
+
+        Hosts are sampled in parallel, all containers of a host in one pass.
+        Usage is measured against the reading of the previous run, kept in
+        memory by the cron worker, so a run never blocks a cron thread for
+        longer than one pass; the first run of a worker only sets the baseline.
+        """
+        instances = self.env['docker.instance'].search([('state', '=', 'running')])
+        hosts = sorted(set(instances.mapped(lambda i: i.docker_host or '')))
+        return run_in_threads(
+            self.env, hosts,
+            lambda env, host: env['docker.instance.metric']._collect_host(host),
+            max_workers=len(hosts) or 1,
+        )
+
+    @api.model
+    def _collect_host(self, docker_host):
+        instances = self.env['docker.instance'].search_fetch(
+            [('state', '=', 'running'), ('docker_host', '=', docker_host or False)],
+            ['db_name', 'cpu_limit', 'postgres_cpu_limit', 'docker_host'],
+        )
+        if not instances:
+            return 0
+        containers = {}
+        for instance in instances:
+            db_container, odoo_container = instance._get_container_names()
+            containers[db_container] = (instance.id, 'db', instance.postgres_cpu_limit * 100)
+            containers[odoo_container] = (instance.id, 'odoo', instance.cpu_limit * 100)
+
+        backend = instances[:1]._get_container_backend()
+        use_cgroup = not docker_host and cgroup_v2_available()
+        sampler = _SAMPLERS.setdefault((self.env.cr.dbname, docker_host), MetricsSampler())
+        started = time.time()
+        try:
+            readings = self._read_usage(backend, list(containers), use_cgroup)
+        except CONTAINER_ERRORS as e:
+            _logger.warning("Cannot sample containers of Docker host %s: %s", docker_host or 'local', e)
+            return 0
+        timestamp = fields.Datetime.now()
+        rows = []
+        for name, usage in readings.items():
+            sample = sampler.sample(name, usage, started)
+            if sample is None:
+                continue
+            instance_id, service, cpu_limit = containers[name]
+            sample.update(cpu_max=sample['cpu_percent'], mem_max=sample['mem_usage'], cpu_limit=cpu_limit)
+            rows.append((instance_id, service, 'raw', timestamp, 1, *(sample[column] for column in METRIC_COLUMNS)))
+        sampler.forget(readings)
+        if rows:
+            self._insert_rows(rows)
+        return len(rows)
+
+    @api.model
+    def _read_usage(self, backend, names, use_cgroup):
+        """Cumulative usage of the running containers among ``names``: {name: usage}.
+
+        Reads the cgroup v2 files of local containers directly, falling back
+        to the backend stats when the cgroups are not visible (e.g. when Odoo
+        itself runs in a container).
+        """
+        listed = backend.list_containers()
+        running = [name for name in names if (listed.get(name) or {}).get('state') == 'running']
+        if use_cgroup and running:
+            usage = {}
+            for name in running:
+                path = find_container_cgroup(listed[name]['id'])
+                if not path:
+                    continue
+                try:
+                    usage[name] = read_cgroup_usage(path)
+                except (OSError, ValueError, IndexError):
+                    # Container stopped while being read
+                    continue
+            if usage:
+                return usage
+        return backend.stats_many(running) if running else {}
+
+    @api.model
+    def _insert_rows(self, rows):
+        columns = ['instance_id', 'service', 'resolution', 'timestamp', 'samples'] + METRIC_COLUMNS
+        execute_values(
+            self.env.cr._obj,
+            f"INSERT INTO {self._table} ({', '.join(columns)}) VALUES %s",
+            rows,
+        )
+
+    # --------------------------------------------------
+    # ROLLUP & RETENTION
+    # --------------------------------------------------
+    @api.model
+    def _cron_rollup(self):
+        """Aggregate complete buckets into the next resolution, then apply retention"""
+        for source, target in ROLLUPS:
+            self._rollup(source, target)
+        self._apply_retention()
+
+    @api.model
+    def _rollup(self, source, target):
+        # Per instance and service, the buckets after the last one already rolled
+        # up, up to the current (incomplete) one: hosts are sampled independently
+        # and a slower one must not have its samples skipped
+        self.env.cr.execute(
+            f"""
+            WITH rolled AS (
+                SELECT instance_id, service, MAX(timestamp) + ('1 ' || %(target)s)::interval AS next_bucket
+                  FROM {self._table}
+                 WHERE resolution = %(target)s
+              GROUP BY instance_id, service
+            )
+            INSERT INTO {self._table}
+                   (instance_id, service, resolution, timestamp, samples, {', '.join(METRIC_COLUMNS)})
+            SELECT m.instance_id, m.service, %(target)s, date_trunc(%(target)s, m.timestamp) AS bucket,
+                   SUM(samples),
+                   SUM(cpu_percent * samples) / NULLIF(SUM(samples), 0), MAX(cpu_max), MAX(cpu_limit),
+                   SUM(mem_usage * samples) / NULLIF(SUM(samples), 0), MAX(mem_max), MAX(mem_limit),
+                   SUM(net_rx), SUM(net_tx), SUM(blk_read), SUM(blk_write)
+              FROM {self._table} m
+         LEFT JOIN rolled r ON r.instance_id = m.instance_id AND r.service = m.service
+             WHERE m.resolution = %(source)s
+               AND m.timestamp >= COALESCE(r.next_bucket, '-infinity')
+               AND m.timestamp < date_trunc(%(target)s, (now() AT TIME ZONE 'UTC') - %(grace)s::interval)
+          GROUP BY m.instance_id, m.service, bucket
+            """,
+            {'source': source, 'target': target, 'grace': f'{ROLLUP_GRACE_SECONDS} seconds'},
+        )
+        if self.env.cr.rowcount:
+            _logger.info("Rolled up %s %s metric buckets", self.env.cr.rowcount, target)
+
+    @api.model
+    def _apply_retention(self):
+        config = self.env['ir.config_parameter'].sudo()
+        for resolution, (param, default, unit) in RETENTION.items():
+            # Raw samples must outlive the rollup cron interval
+            retention = max(int(config.get_param(param, default) or default), 1)
+            self.env.cr.execute(
+                f"""
+                DELETE FROM {self._table}
+                 WHERE resolution = %s AND timestamp < (now() AT TIME ZONE 'UTC') - %s::interval
+                """,
+                [resolution, f'{retention} {unit}'],
+            )
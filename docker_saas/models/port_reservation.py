@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_PORT_RANGE = (8069, 9000)
+
+
+class DockerPortPool(models.Model):
+    _name = 'docker.port.pool'
+    _description = 'Docker Host Port Pool'
+    _order = 'docker_host, port_start'
+
+    name = fields.Char(required=True)
+    docker_host = fields.Char(
+        string='Docker Host',
+        help="Docker host this range applies to. Leave empty for the local daemon."
+    )
+    port_start = fields.Integer(required=True, default=DEFAULT_PORT_RANGE[0])
+    port_end = fields.Integer(required=True, default=DEFAULT_PORT_RANGE[1])
+    active = fields.Boolean(default=True)
+    reservation_count = fields.Integer(compute='_compute_reservation_count')
+
+    @api.constrains('port_start', 'port_end')
+    def _check_range(self):
+        for pool in self:
+            if not 0 < pool.port_start <= pool.port_end <= 65535:
+                raise ValidationError(_("Port range must be within 1-65535 and start before it ends."))
+
+    def _compute_reservation_count(self):
+        Reservation = self.env['docker.port.reservation']
+        for pool in self:
+            pool.reservation_count = Reservation.search_count([
+                ('docker_host', '=', pool.docker_host or False),
+                ('port', '>=', pool.port_start),
+                ('port', '<=', pool.port_end),
+            ])
+
+    @api.model
+    def _lock_ranges(self, docker_host):
+        """Lock the port ranges of ``docker_host`` until the end of the transaction.
+
+        Returns the ``(port_start, port_end)`` of every active pool of the
+        host, lowest first. Concurrent allocations on the same host wait for
+        each other instead of racing for the same free port.
+        """
+        self.env.cr.execute(
+            """
+            SELECT id, port_start, port_end
+              FROM docker_port_pool
+             WHERE active AND COALESCE(docker_host, '') = %s
+          ORDER BY port_start, id
+               FOR UPDATE
+            """,
+            [docker_host or ''],
+        )
+        rows = self.env.cr.fetchall()
+        if rows:
+            return [(port_start, port_end) for _id, port_start, port_end in rows]
+        # No pool configured for this host: serialize on the host name instead
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"docker_port_pool:{docker_host or ''}"])
+        return [DEFAULT_PORT_RANGE]
+
+
+class DockerPortReservation(models.Model):
+    _name = 'docker.port.reservation'
+    _description = 'Docker Port Reservation'
+    _order = 'docker_host, port'
+
+    port = fields.Integer(required=True, index=True)
+    docker_host = fields.Char(string='Docker Host')
+    kind = fields.Selection(
+        [
+            ('http', 'HTTP'),
+            ('longpolling', 'Longpolling'),
+        ],
+        required=True,
+    )
+    instance_id = fields.Many2one('docker.instance', required=True, ondelete='cascade', index=True)
+
+    def init(self):
+        create_unique_index(
+            self._cr, 'docker_port_reservation_host_port_uniq', self._table,
+            ["COALESCE(docker_host, '')", 'port'],
+        )
+
+    @api.model
+    def _insert(self, instance, kind, port):
+        """Reserve ``port`` unless it is taken; return the reservation or an empty recordset.
+
+        The insert is checked against the unique index rather than a prior
+        lookup: a transaction whose snapshot predates a concurrent
+        reservation does not see it, but its insert does.
+        """
+        self.flush_model()
+        self.env.cr.execute(
+            f"""
+            INSERT INTO {self._table}
+                   (port, docker_host, kind, instance_id, create_uid, create_date, write_uid, write_date)
+            VALUES (%(port)s, %(host)s, %(kind)s, %(instance)s, %(uid)s,
+                    now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC')
+                ON CONFLICT DO NOTHING
+         RETURNING id
+            """,
+            {'port': port, 'host': instance.docker_host or None, 'kind': kind,
+             'instance': instance.id, 'uid': self.env.uid},
+        )
+        row = self.env.cr.fetchone()
+        return self.browse(row[0] if row else [])
+
+    @api.model
+    def _allocate(self, instance, kinds):
+        """Reserve the lowest free ports of the host pools for ``kinds`` of ``instance``.
+
+        Returns the ports, in the order of ``kinds``. A candidate reserved by
+        a concurrent transaction since our snapshot fails its insert, and
+        the next candidate is tried.
+        """
+        docker_host = instance.docker_host or False
+        ranges = self.env['docker.port.pool']._lock_ranges(docker_host)
+        self.search([('instance_id', '=', instance.id), ('kind', 'in', list(kinds))]).unlink()
+        ports, taken = [], []
+        for port_start, port_end in ranges:
+            while len(ports) < len(kinds):
+                self.env.cr.execute(
+                    """
+                    SELECT candidate
+                      FROM generate_series(%s, %s) AS candidate
+                     WHERE NOT EXISTS (
+                           SELECT 1 FROM docker_port_reservation res
+                            WHERE COALESCE(res.docker_host, '') = %s AND res.port = candidate
+                     )
+                       AND candidate <> ALL(%s::int[])
+                  ORDER BY candidate
+                     LIMIT %s
+                    """,
+                    [port_start, port_end, docker_host or '', ports + taken, len(kinds) - len(ports)],
+                )
+                candidates = [row[0] for row in self.env.cr.fetchall()]
+                if not candidates:
+                    break
+                for port in candidates:
+                    if self._insert(instance, kinds[len(ports)], port):
+                        ports.append(port)
+                    else:
+                        taken.append(port)
+            if len(ports) == len(kinds):
+                return ports
+        raise ValidationError(_("No free port found in %s") % ', '.join(
+            f"{port_start}–{port_end}" for port_start, port_end in ranges))
+
+    @api.model
+    def _reserve(self, instance, kind, port):
+        """Reserve ``port`` for ``instance``, replacing its previous reservation of that kind"""
+        docker_host = instance.docker_host or False
+        self.env['docker.port.pool']._lock_ranges(docker_host)
+        existing = self.search([
+            ('docker_host', '=', docker_host),
+            ('port', '=', port),
+        ], limit=1)
+        if existing and existing.instance_id != instance:
+            raise ValidationError(_(
+                "Port %(port)s is already used by instance %(instance)s.",
+                port=port, instance=existing.instance_id.name,
+            ))
+        if existing and existing.kind != kind:
+            raise ValidationError(_(
+                "Port %(port)s is already the %(kind)s port of instance %(instance)s.",
+                port=port, kind=dict(self._fields['kind'].selection)[existing.kind],
+                instance=instance.name,
+            ))
+        current = self.search([('instance_id', '=', instance.id), ('kind', '=', kind)])
+        if existing and existing == current:
+            return existing
+        current.unlink()
+        reservation = self._insert(instance, kind, port)
+        if not reservation:
+            # Reserved by a transaction committed after our snapshot was taken
+            raise ValidationError(_("Port %(port)s is already used by another instance.", port=port))
+        return reservation
+
+    @api.model
+    def _backfill_reservations(self):
+        """Reserve the ports of instances created before the reservation table existed"""
+        reserved = set(self.search([]).mapped('instance_id').ids)
+        for instance in self.env['docker.instance'].search([('id', 'not in', list(reserved))]):
+            for kind, value in (('http', instance.http_port), ('longpolling', instance.longpolling_port)):
+                if value and value.isdigit():
+                    try:
+                        with self.env.cr.savepoint():
+                            self._reserve(instance, kind, int(value))
+                    except ValidationError as exc:
+                        _logger.warning("Cannot reserve port %s for %s: %s", value, instance.name, exc)
@@ -1,4 +1,4 @@
-from odoo import _, fields, models
+from odoo import fields, models
 
 
 class DockerPricingTier(models.Model):
@@ -77,26 +77,14 @@ class DockerPricingTier(models.Model):
     notes = fields.Text(string='Internal Notes')
 
     def action_apply_to_instances(self):
+        """Prepare a rollout of the tier limits to the linked instances"""
         self.ensure_one()
-        instances = self.env['docker.instance'].search([('pricing_tier_id', '=', self.id)])
-        for instance in instances:
-            instance._apply_pricing_tier(self)
-        action = {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _('Pricing Tier Applied'),
-                'message': _('Resources updated on %s linked instances.') % len(instances),
-                'type': 'success',
-                'sticky': False,
-            },
+        rollout = self.env['docker.tier.rollout']._prepare(self)
+        return {
+            'name': rollout.name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'docker.tier.rollout',
+            'res_id': rollout.id,
+            'view_mode': 'form',
+            'target': 'current',
         }
-        if instances:
-            action['params']['next'] = {
-                'type': 'ir.actions.act_window',
-                'res_model': 'docker.instance',
-                'view_mode': 'tree,form',
-                'domain': [('id', 'in', instances.ids)],
-            }
-        return action
-
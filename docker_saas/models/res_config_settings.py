@@ -56,6 +56,39 @@ class ResConfigSettings(models.TransientModel):
         help="Jenkins webhook URL for GitHub push notifications (e.g., https://jenkins.example.com/github-webhook/)."
     )
 
+    github_api_url = fields.Char(
+        string='GitHub API URL',
+        config_parameter='docker_saas.github_api_url',
+        help="GitHub API endpoint, for GitHub Enterprise or a local stub server (defaults to https://api.github.com)."
+    )
+    provisioning_workers = fields.Integer(
+        string='Provisioning Workers',
+        config_parameter='docker_saas.provisioning_workers',
+        default=4,
+        help="Number of instances whose repository and job are provisioned in parallel by bulk onboarding."
+    )
+    addons_sync_method = fields.Selection(
+        [
+            ('native', 'Built-in'),
+            ('jenkins', 'Jenkins'),
+        ],
+        string='Addons Synchronization',
+        config_parameter='docker_saas.addons_sync_method',
+        default=lambda self: self.env['docker.instance']._get_addons_sync_method(),
+        help="Built-in: GitHub pushes are fetched into a local mirror and only changed files are deployed. "
+             "Jenkins: a Jenkins job copies the repository into the instance on every push."
+    )
+    git_webhook_secret = fields.Char(
+        string='Webhook Secret',
+        config_parameter='docker_saas.git_webhook_secret',
+        help="Secret GitHub signs its webhooks with for the built-in synchronization. Generated when empty."
+    )
+    git_mirror_path = fields.Char(
+        string='Git Mirrors Path',
+        config_parameter='docker_saas.git_mirror_path',
+        help="Directory holding the local mirrors of the addons repositories (defaults to the Odoo data directory)."
+    )
+
     # Jenkins Configuration
     jenkins_url = fields.Char(
         string='Jenkins URL',
@@ -79,3 +112,145 @@ class ResConfigSettings(models.TransientModel):
         help="Expose host ports for local debugging. Disable to rely solely on Traefik routing and avoid port conflicts."
     )
 
+    # Container Backend
+    container_backend = fields.Selection(
+        [
+            ('cli', 'Docker CLI'),
+            ('api', 'Docker Engine API'),
+        ],
+        string='Container Backend',
+        config_parameter='docker_saas.container_backend',
+        default='cli',
+        help="How start/stop/restart/inspect/stats reach the daemon. The Engine API keeps pooled connections "
+             "to the unix socket instead of spawning a docker process per operation; compose is still used "
+             "to create containers."
+    )
+    docker_socket = fields.Char(
+        string='Docker Socket',
+        config_parameter='docker_saas.docker_socket',
+        default='/var/run/docker.sock',
+        help="Unix socket of the local Docker daemon used by the Engine API backend."
+    )
+    events_debounce = fields.Float(
+        string='Event Debounce (s)',
+        config_parameter='docker_saas.events_debounce',
+        default=2.0,
+        help="Container events are applied once a minute, except those of the last few seconds which are "
+             "left to the next run, so a burst of restarts is less likely to be split over two runs."
+    )
+
+    # Metrics
+    metrics_retention_raw_hours = fields.Integer(
+        string='Raw Samples Retention (hours)',
+        config_parameter='docker_saas.metrics_retention_raw_hours',
+        default=6,
+    )
+    metrics_retention_minute_days = fields.Integer(
+        string='Minute Rollups Retention (days)',
+        config_parameter='docker_saas.metrics_retention_minute_days',
+        default=3,
+    )
+    metrics_retention_hour_days = fields.Integer(
+        string='Hourly Rollups Retention (days)',
+        config_parameter='docker_saas.metrics_retention_hour_days',
+        default=90,
+    )
+    metrics_retention_day_days = fields.Integer(
+        string='Daily Rollups Retention (days)',
+        config_parameter='docker_saas.metrics_retention_day_days',
+        default=730,
+    )
+
+    # Backups
+    backup_accel_redirect_prefix = fields.Char(
+        string='Backup X-Accel-Redirect Prefix',
+        config_parameter='docker_saas.backup_accel_redirect_prefix',
+        help="Internal nginx location serving the filesystem root (e.g. '/protected-backups' with "
+             "'internal; alias /;'). When set, backup downloads are handed over to the proxy."
+    )
+
+    module_upload_max_mb = fields.Integer(
+        string='Maximum Module Upload (MiB)',
+        config_parameter='docker_saas.module_upload_max_mb',
+        default=200,
+        help="Largest module archive accepted, both as uploaded and once extracted."
+    )
+    module_upload_max_entries = fields.Integer(
+        string='Maximum Archive Entries',
+        config_parameter='docker_saas.module_upload_max_entries',
+        default=20000,
+        help="Largest number of files and directories a module archive may contain."
+    )
+    module_reload_delay = fields.Integer(
+        string='Module Reload Delay (s)',
+        config_parameter='docker_saas.module_reload_delay',
+        default=15,
+        help="Custom module changes made within this many seconds of each other are loaded with a single restart of Odoo."
+    )
+
+    backup_max_workers = fields.Integer(
+        string='Parallel Backups',
+        config_parameter='docker_saas.backup_max_workers',
+        default=4,
+        help="Maximum number of scheduled backups running at the same time."
+    )
+    backup_host_limit = fields.Integer(
+        string='Backups per Docker Host',
+        config_parameter='docker_saas.backup_host_limit',
+        default=2,
+        help="Maximum number of concurrent backups of instances living on the same Docker host (0 = no limit)."
+    )
+    backup_disk_limit = fields.Integer(
+        string='Backups per Disk',
+        config_parameter='docker_saas.backup_disk_limit',
+        default=2,
+        help="Maximum number of concurrent backups written to the same filesystem (0 = no limit)."
+    )
+
+    # Job Queue
+    job_workers = fields.Integer(
+        string='Job Workers',
+        config_parameter='docker_saas.job_workers',
+        default=4,
+        help="Number of instance operations (start, stop, restart...) executed in parallel by the job runner."
+    )
+    job_host_limit = fields.Integer(
+        string='Jobs per Docker Host',
+        config_parameter='docker_saas.job_host_limit',
+        default=0,
+        help="Maximum number of operations running at the same time against a single Docker host (0 = no limit)."
+    )
+    job_max_attempts = fields.Integer(
+        string='Job Attempts',
+        config_parameter='docker_saas.job_max_attempts',
+        default=3,
+        help="Number of times a failed instance operation is retried before the job is marked as failed."
+    )
+
+    # Tier Rollouts
+    rollout_batch_size = fields.Integer(
+        string='Rollout Batch Size',
+        config_parameter='docker_saas.rollout_batch_size',
+        default=10,
+        help="Default number of running instances updated per wave when a pricing tier is rolled out."
+    )
+    rollout_pause_minutes = fields.Integer(
+        string='Rollout Pause (minutes)',
+        config_parameter='docker_saas.rollout_pause_minutes',
+        default=2,
+        help="Default time left to a wave before it is health-checked and the next one starts."
+    )
+    rollout_failure_threshold = fields.Float(
+        string='Rollout Failure Threshold (%)',
+        config_parameter='docker_saas.rollout_failure_threshold',
+        default=10.0,
+        help="Default share of failed instances above which a rollout halts and rolls back."
+    )
+
+    def set_values(self):
+        Instance = self.env['docker.instance']
+        rendering = Instance._get_rendering_settings()
+        super().set_values()
+        # Writing the parameters cleared the settings snapshot: re-render only if it matters
+        if Instance._get_rendering_settings() != rendering:
+            Instance._refresh_rendering()
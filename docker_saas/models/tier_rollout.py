@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# docker.instance fields written from a pricing tier, restored on rollback
+TIER_FIELDS = [
+    'cpu_limit', 'cpu_reservation', 'memory_limit', 'memory_reservation',
+    'postgres_cpu_limit', 'postgres_cpu_reservation',
+    'postgres_memory_limit', 'postgres_memory_reservation',
+]
+
+
+class DockerTierRollout(models.Model):
+    """Fleet-wide application of a pricing tier.
+
+    The tier limits are written to every linked instance at once, then
+    pushed to the running ones in waves of ``batch_size`` instances. Each
+    wave runs as a bulk operation; once it is finished and ``pause_minutes``
+    have passed, its instances are health-checked before the next wave
+    starts. When the failed share of the processed instances exceeds
+    ``failure_threshold``, the rollout halts and restores the previous
+    limits.
+    """
+    _name = 'docker.tier.rollout'
+    _description = 'Pricing Tier Rollout'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+
+    name = fields.Char(required=True, readonly=True)
+    tier_id = fields.Many2one('docker.pricing.tier', required=True, ondelete='cascade', readonly=True)
+    user_id = fields.Many2one('res.users', string='Requested By', default=lambda self: self.env.user, readonly=True)
+    batch_size = fields.Integer(
+        default=lambda self: self._default_param('docker_saas.rollout_batch_size', 10),
+        help="Number of running instances updated per wave.",
+    )
+    pause_minutes = fields.Integer(
+        string='Pause (minutes)',
+        default=lambda self: self._default_param('docker_saas.rollout_pause_minutes', 2),
+        help="Time left to a finished wave before it is health-checked and the next one starts.",
+    )
+    failure_threshold = fields.Float(
+        string='Failure Threshold (%)',
+        default=lambda self: self._default_param('docker_saas.rollout_failure_threshold', 10.0),
+        help="The rollout halts and rolls back when more than this share of the processed instances failed.",
+    )
+    state = fields.Selection(
+        [
+            ('draft', 'Draft'),
+            ('running', 'Running'),
+            ('halted', 'Halted'),
+            ('done', 'Done'),
+            ('rolled_back', 'Rolled Back'),
+        ],
+        default='draft',
+        required=True,
+        tracking=True,
+        readonly=True,
+    )
+    wave = fields.Integer(string='Current Wave', readonly=True)
+    wave_count = fields.Integer(string='Waves', readonly=True)
+    wave_batch_id = fields.Many2one('docker.instance.job.batch', string='Current Wave Operation', readonly=True)
+    next_check_at = fields.Datetime(readonly=True)
+    line_ids = fields.One2many('docker.tier.rollout.line', 'rollout_id', string='Instances', readonly=True)
+    line_count = fields.Integer(compute='_compute_counts')
+    done_count = fields.Integer(string='Applied', compute='_compute_counts')
+    failed_count = fields.Integer(string='Failed', compute='_compute_counts')
+    progress = fields.Float(compute='_compute_counts')
+
+    @api.model
+    def _default_param(self, key, default):
+        value = self.env['ir.config_parameter'].sudo().get_param(key)
+        return type(default)(float(value)) if value else default
+
+    @api.depends('line_ids.state')
+    def _compute_counts(self):
+        for rollout in self:
+            states = rollout.line_ids.mapped('state')
+            rollout.line_count = len(states)
+            rollout.done_count = states.count('done')
+            rollout.failed_count = states.count('failed')
+            finished = len(states) - states.count('pending') - states.count('applying')
+            rollout.progress = 100.0 * finished / len(states) if states else 100.0
+
+    # --------------------------------------------------
+    # LAUNCH
+    # --------------------------------------------------
+    @api.model
+    def _prepare(self, tier):
+        instances = self.env['docker.instance'].search([('pricing_tier_id', '=', tier.id)])
+        if not instances:
+            raise UserError(_("No instance is linked to the pricing tier %s.") % tier.name)
+        return self.create({
+            'name': _("%(tier)s rollout (%(count)s instances)", tier=tier.name, count=len(instances)),
+            'tier_id': tier.id,
+            'line_ids': [
+                fields.Command.create({'instance_id': instance.id})
+                for instance in instances
+            ],
+        })
+
+    def action_start(self):
+        """Write the tier limits to all instances at once and schedule the first wave"""
+        for rollout in self.filtered(lambda r: r.state == 'draft'):
+            if rollout.batch_size < 1:
+                raise UserError(_("The batch size must be at least 1."))
+            lines = rollout.line_ids
+            instances = lines.instance_id
+            previous = {row['id']: row for row in instances.read(TIER_FIELDS)}
+            for line in lines:
+                line.previous_values = {
+                    fname: previous[line.instance_id.id][fname] for fname in TIER_FIELDS
+                }
+            instances.write(instances[:1]._prepare_pricing_tier_values(rollout.tier_id))
+
+            # Stopped instances pick the limits up on their next start
+            running = lines.filtered(lambda l: l.instance_id.state == 'running')
+            (lines - running).write({'state': 'done', 'message': _("Applied on next start.")})
+            for index, line in enumerate(running):
+                line.wave = index // rollout.batch_size + 1
+            rollout.write({
+                'state': 'running',
+                'wave': 0,
+                'wave_count': max(running.mapped('wave') or [0]),
+                'next_check_at': fields.Datetime.now(),
+            })
+        self._trigger_runner()
+        return True
+
+    def _trigger_runner(self, at=None):
+        cron = self.env.ref('docker_saas.ir_cron_docker_saas_tier_rollout', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(at=at)
+
+    # --------------------------------------------------
+    # WAVES
+    # --------------------------------------------------
+    @api.model
+    def _cron_advance(self):
+        rollouts = self.search([
+            ('state', '=', 'running'),
+            ('next_check_at', '<=', fields.Datetime.now()),
+        ])
+        for rollout in rollouts:
+            rollout._advance()
+            self.env.cr.commit()
+
+    def _advance(self):
+        self.ensure_one()
+        now = fields.Datetime.now()
+        if self.wave_batch_id:
+            if self.wave_batch_id.state == 'in_progress':
+                self._schedule(now + timedelta(minutes=1))
+                return
+            finished = [date for date in self.wave_batch_id.job_ids.mapped('date_done') if date] or [now]
+            settle_until = max(finished) + timedelta(minutes=self.pause_minutes)
+            if now < settle_until:
+                # Let the containers of the wave settle before checking them
+                self._schedule(settle_until)
+                return
+            self._check_wave()
+            self.wave_batch_id = False
+            if self._threshold_exceeded():
+                self._rollback(_("more than %s%% of the processed instances failed.") % self.failure_threshold)
+                return
+
+        if self.wave >= self.wave_count:
+            self.write({'state': 'done', 'next_check_at': False})
+            self.message_post(body=_("Rollout completed: %(done)s applied, %(failed)s failed.",
+                                     done=self.done_count, failed=self.failed_count))
+            return
+        self._start_wave(self.wave + 1)
+
+    def _schedule(self, at):
+        self.next_check_at = at
+        self._trigger_runner(at=at)
+
+    def _start_wave(self, wave):
+        lines = self.line_ids.filtered(lambda l: l.wave == wave and l.state == 'pending')
+        batch = self.env['docker.instance.job.batch']._launch(lines.instance_id, 'update_resources')
+        jobs_by_instance = {job.instance_id.id: job for job in batch.job_ids}
+        for line in lines:
+            line.write({'state': 'applying', 'job_id': jobs_by_instance[line.instance_id.id].id})
+        self.write({'wave': wave, 'wave_batch_id': batch.id})
+        self._schedule(fields.Datetime.now() + timedelta(minutes=1))
+        _logger.info("Tier rollout %s: wave %s/%s started on %s instances", self.name, wave, self.wave_count, len(lines))
+
+    def _check_wave(self):
+        """Mark the lines of the finished wave as done or failed"""
+        for line in self.line_ids.filtered(lambda l: l.wave == self.wave and l.state == 'applying'):
+            if line.job_id.state != 'done':
+                line.write({'state': 'failed', 'message': line.job_id.message or _("Update failed.")})
+                continue
+            issue = line.instance_id._get_health_issue()
+            if issue:
+                line.write({'state': 'failed', 'message': issue})
+            else:
+                line.write({'state': 'done', 'message': False})
+
+    def _threshold_exceeded(self):
+        processed = self.line_ids.filtered(lambda l: l.wave and l.state in ('done', 'failed'))
+        failed = processed.filtered(lambda l: l.state == 'failed')
+        return bool(failed) and 100.0 * len(failed) / len(processed) > self.failure_threshold
+
+    # --------------------------------------------------
+    # HALT / ROLLBACK
+    # --------------------------------------------------
+    def action_halt(self):
+        self.filtered(lambda r: r.state == 'running').write({'state': 'halted', 'next_check_at': False})
+
+    def action_resume(self):
+        self.filtered(lambda r: r.state == 'halted').write({
+            'state': 'running',
+            'next_check_at': fields.Datetime.now(),
+        })
+        self._trigger_runner()
+
+    def action_rollback(self):
+        for rollout in self.filtered(lambda r: r.state in ('running', 'halted', 'done')):
+            rollout._rollback(_("Rolled back by %s.") % self.env.user.name)
+
+    def _rollback(self, reason):
+        """Restore the previous limits of every instance and re-apply them where they were applied"""
+        self.ensure_one()
+        lines = self.line_ids.filtered(lambda l: l.state != 'rolled_back')
+        # One write per distinct set of previous values
+        groups = {}
+        for line in lines:
+            key = tuple(sorted((line.previous_values or {}).items()))
+            groups.setdefault(key, self.env['docker.tier.rollout.line'])
+            groups[key] |= line
+        for key, group in groups.items():
+            if key:
+                group.instance_id.write(dict(key))
+
+        applied = lines.filtered(lambda l: l.wave and l.state != 'pending').instance_id
+        if applied:
+            self.env['docker.instance.job.batch']._launch(applied, 'update_resources')
+        lines.write({'state': 'rolled_back'})
+        self.write({'state': 'rolled_back', 'wave_batch_id': False, 'next_check_at': False})
+        self.message_post(body=_("Rollout halted and rolled back: %s") % reason)
+        _logger.warning("Tier rollout %s rolled back: %s", self.name, reason)
+
+
+class DockerTierRolloutLine(models.Model):
+    _name = 'docker.tier.rollout.line'
+    _description = 'Pricing Tier Rollout Instance'
+    _order = 'wave, id'
+
+    rollout_id = fields.Many2one('docker.tier.rollout', required=True, ondelete='cascade', index=True)
+    instance_id = fields.Many2one('docker.instance', required=True, ondelete='cascade')
+    wave = fields.Integer(help="Wave the instance is updated in (0 = not running, applied on next start).")
+    state = fields.Selection(
+        [
+            ('pending', 'Pending'),
+            ('applying', 'Applying'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+            ('rolled_back', 'Rolled Back'),
+        ],
+        default='pending',
+        required=True,
+    )
+    job_id = fields.Many2one('docker.instance.job', ondelete='set null')
+    previous_values = fields.Json()
+    message = fields.Text()
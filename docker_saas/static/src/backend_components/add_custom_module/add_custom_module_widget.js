@@ -10,6 +10,7 @@ export class AddCustomModuleWidget extends Component {
         this.fileInput = useRef("file");
         this.state = useState({
             fileList: [],
+            modules: {},
             loading: false,
             error: null,
             uploadProgress: 0,
@@ -20,6 +21,9 @@ export class AddCustomModuleWidget extends Component {
         this.instanceName = this.props.record?.data?.name || "";
         this.assetsLoaded = false;
         this.pond = null;
+        // ETag of the module index currently displayed, sent back to skip unchanged listings
+        this.indexEtag = null;
+        this.indexEtagKey = null;
 
         this.deleteFile = this.deleteFile.bind(this);
         this.handleHelpSwal = this.handleHelpSwal.bind(this);
@@ -55,6 +59,7 @@ export class AddCustomModuleWidget extends Component {
                 if (wasInteractive) {
                     this.destroyFilePond();
                     this.state.fileList = [];
+                    this.state.modules = {};
                 }
                 return;
             }
@@ -74,7 +79,7 @@ export class AddCustomModuleWidget extends Component {
     }
 
     get canInteract() {
-        return Boolean(this.addonsPath && this.instanceName);
+        return Boolean(this.addonsPath && this.instanceName && this.props.record?.resId);
     }
 
     get isReadonly() {
@@ -112,21 +117,50 @@ export class AddCustomModuleWidget extends Component {
         this.state.loading = true;
         this.state.error = null;
         try {
-            const { files = [] } = await jsonrpc("/docker_saas/files/list", {
-                addons_path: this.addonsPath,
-            });
-            this.state.fileList = files;
+            const instanceId = this.props.record.resId;
+            const indexKey = `${instanceId}:${this.addonsPath}`;
+            const headers = {};
+            if (this.indexEtag && this.indexEtagKey === indexKey) {
+                headers["If-None-Match"] = this.indexEtag;
+            }
+            const response = await fetch(`/docker_saas/modules/index/${instanceId}`, { headers });
+            if (response.status === 304) {
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(await response.text());
+            }
+            const { modules = [] } = await response.json();
+            this.indexEtag = response.headers.get("ETag");
+            this.indexEtagKey = indexKey;
+            this.state.modules = Object.fromEntries(modules.map((module) => [module.name, module]));
+            this.state.fileList = modules.map((module) => module.name);
         } catch (error) {
             console.error("Unable to retrieve module list:", error);
             this.state.error =
                 (this.env._t && this.env._t("Unable to retrieve module list.")) ||
                 "Unable to retrieve module list.";
+            this.indexEtag = null;
             this.state.fileList = [];
+            this.state.modules = {};
         } finally {
             this.state.loading = false;
         }
     }
 
+    formatSize(size) {
+        if (!size) {
+            return "";
+        }
+        const units = ["B", "KB", "MB", "GB"];
+        let index = 0;
+        while (size >= 1024 && index < units.length - 1) {
+            size /= 1024;
+            index++;
+        }
+        return `${size.toFixed(index ? 1 : 0)} ${units[index]}`;
+    }
+
     initFilePond() {
         this.destroyFilePond();
         if (!window.FilePond || !this.fileInput.el) {
@@ -148,46 +182,31 @@ export class AddCustomModuleWidget extends Component {
                         reject("Invalid file type");
                     }
                 }),
+            // Large archives go in 5 MB chunks that are retried and resumed after a disconnect
+            chunkUploads: true,
+            chunkSize: 5000000,
+            chunkRetryDelays: [500, 1000, 3000, 5000],
             server: {
                 process: {
                     url: uploadUrl,
                     headers: {
                         "X-CSRFToken": odoo.csrf_token,
                     },
-                    onload: (response) => {
-                        this.state.isUploading = false;
-                        this.state.uploadProgress = 0;
-                        this.fetchFiles();
-                        // Show success message
-                        if (window.Swal) {
-                            window.Swal.fire({
-                                icon: "success",
-                                title: "Upload Successful!",
-                                text: "Module uploaded and extracted successfully. Instance is restarting...",
-                                timer: 3000,
-                                showConfirmButton: false,
-                            });
-                        }
-                    },
-                    onerror: (error) => {
-                        console.error("File upload error:", error);
-                        this.state.isUploading = false;
-                        this.state.uploadProgress = 0;
-                        this.state.error = "Upload failed. Please try again.";
-                        // Show error message
-                        if (window.Swal) {
-                            window.Swal.fire({
-                                icon: "error",
-                                title: "Upload Failed",
-                                text: error.toString() || "An error occurred during upload.",
-                            });
-                        }
-                    },
+                    // The response is the id of a chunked transfer, or the result of a direct upload
+                    onload: (response) => response,
+                    onerror: (response) => response,
                     ondata: (formData) => {
                         this.state.isUploading = true;
                         return formData;
                     },
                 },
+                patch: {
+                    url: "/docker_saas/file/upload/chunk/",
+                    headers: {
+                        "X-CSRFToken": odoo.csrf_token,
+                    },
+                    onerror: (response) => response,
+                },
             },
         });
 
@@ -201,7 +220,31 @@ export class AddCustomModuleWidget extends Component {
         });
 
         this.pond.on("processfile", (error, file) => {
-            if (!error && this.pond) {
+            this.state.isUploading = false;
+            this.state.uploadProgress = 0;
+            if (error) {
+                console.error("File upload error:", error);
+                this.state.error = "Upload failed. Please try again.";
+                if (window.Swal) {
+                    window.Swal.fire({
+                        icon: "error",
+                        title: "Upload Failed",
+                        text: (error.body || error.main || "").toString() || "An error occurred during upload.",
+                    });
+                }
+                return;
+            }
+            this.fetchFiles();
+            if (window.Swal) {
+                window.Swal.fire({
+                    icon: "success",
+                    title: "Upload Successful!",
+                    text: "Module uploaded successfully. Odoo will reload it shortly...",
+                    timer: 3000,
+                    showConfirmButton: false,
+                });
+            }
+            if (this.pond) {
                 setTimeout(() => {
                     if (this.pond) {
                         this.pond.removeFile(file.id);
@@ -273,7 +316,7 @@ export class AddCustomModuleWidget extends Component {
                     window.Swal.fire({
                         icon: "success",
                         title: "Deleted!",
-                        text: `"${fileName}" has been deleted. Instance is restarting...`,
+                        text: `"${fileName}" has been deleted. Odoo will reload shortly...`,
                         timer: 3000,
                         showConfirmButton: false,
                     });
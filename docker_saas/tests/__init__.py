@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+from . import test_container_events
+from . import test_git_sync
+from . import test_provisioning
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import json
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools.misc import file_path
+
+
+@tagged('post_install', '-at_install')
+class TestContainerEvents(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Instance = cls.env['docker.instance']
+        cls.alpha = Instance.create({'name': 'Events Alpha', 'auto_restart': True})
+        cls.beta = Instance.create({'name': 'Events Beta'})
+        cls.gamma = Instance.create({'name': 'Events Gamma'})
+        (cls.alpha | cls.beta).write({'state': 'running'})
+        cls.gamma.write({'state': 'error'})
+        with open(file_path('docker_saas/tests/data/docker_events.jsonl')) as f:
+            cls.raw_events = [json.loads(line) for line in f if line.strip()]
+
+    def test_recorded_stream(self):
+        changes = self.env['docker.instance']._process_container_events(self.raw_events)
+
+        self.assertEqual(changes, {'error': [self.alpha.id], 'running': [self.gamma.id]})
+        self.assertEqual(self.alpha.state, 'error')
+        self.assertEqual(self.beta.state, 'running')
+        self.assertEqual(self.gamma.state, 'running')
+        self.assertIn('ran out of memory', ''.join(self.alpha.message_ids.mapped('body')))
+        self.assertIn('unhealthy', ''.join(self.beta.message_ids.mapped('body')))
+        restart = self.env['docker.instance.job'].search([('instance_id', '=', self.alpha.id), ('operation', '=', 'restart')])
+        self.assertEqual(len(restart), 1)
+
+    def test_running_job_owns_state(self):
+        self.env['docker.instance.job'].create({
+            'name': 'Restart Events Alpha',
+            'instance_id': self.alpha.id,
+            'operation': 'restart',
+            'state': 'running',
+        })
+        changes = self.env['docker.instance']._process_container_events(self.raw_events)
+
+        self.assertEqual(changes, {'running': [self.gamma.id]})
+        self.assertEqual(self.alpha.state, 'running')
+
+    def test_stopped_instance_ignores_die(self):
+        self.alpha.write({'state': 'stopped'})
+        self.env['docker.instance']._process_container_events(self.raw_events)
+
+        self.assertEqual(self.alpha.state, 'stopped')
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import tempfile
+
+from odoo.tests import BaseCase, tagged
+
+from ..tools.git_sync import GitMirror, needs_reload
+
+
+@tagged('post_install', '-at_install')
+class TestGitMirror(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory(prefix='docker_saas_git_')
+        self.addCleanup(tmp.cleanup)
+        self.remote = os.path.join(tmp.name, 'remote.git')
+        self.work = os.path.join(tmp.name, 'work')
+        self.target = os.path.join(tmp.name, 'addons')
+        self.mirror = GitMirror(os.path.join(tmp.name, 'mirrors'), self.remote)
+        self._git('init', '--bare', '--quiet', '--initial-branch=main', self.remote)
+        self._git('clone', '--quiet', self.remote, self.work)
+
+    def _git(self, *args, cwd=None):
+        return subprocess.run(
+            ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+            cwd=cwd, check=True, capture_output=True, text=True,
+        ).stdout.strip()
+
+    def _commit(self, files, removed=()):
+        """Commit and push ``files`` ({path: content}) to the remote; return the commit"""
+        for path, content in files.items():
+            full_path = os.path.join(self.work, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write(content)
+        for path in removed:
+            self._git('rm', '--quiet', path, cwd=self.work)
+        self._git('add', '--all', cwd=self.work)
+        self._git('commit', '--quiet', '-m', 'update', cwd=self.work)
+        self._git('push', '--quiet', 'origin', 'HEAD:main', cwd=self.work)
+        return self._git('rev-parse', 'HEAD', cwd=self.work)
+
+    def _read(self, path):
+        with open(os.path.join(self.target, path)) as f:
+            return f.read()
+
+    def test_fetch_and_checkout(self):
+        first = self._commit({
+            'my_module/__manifest__.py': "{'name': 'My Module'}",
+            'my_module/views/views.xml': '<odoo/>',
+            'my_module/README.md': 'v1',
+        })
+        os.makedirs(self.target)
+        with open(os.path.join(self.target, 'leftover.txt'), 'w') as f:
+            f.write('copied by hand')
+
+        self.mirror.fetch()
+        self.assertEqual(self.mirror.resolve('main'), first)
+        previous, changed = self.mirror.checkout(first, self.target)
+        self.assertIsNone(previous)
+        self.assertCountEqual(changed, [
+            'my_module/__manifest__.py', 'my_module/views/views.xml', 'my_module/README.md',
+        ])
+        self.assertFalse(os.path.exists(os.path.join(self.target, 'leftover.txt')))
+        self.assertEqual(self._read('my_module/views/views.xml'), '<odoo/>')
+
+        second = self._commit({'my_module/views/views.xml': '<odoo><data/></odoo>'},
+                              removed=['my_module/README.md'])
+        self.mirror.fetch()
+        self.assertEqual(self.mirror.resolve('main'), second)
+        previous, changed = self.mirror.checkout(second, self.target)
+        self.assertEqual(previous, first)
+        self.assertCountEqual(changed, ['my_module/views/views.xml', 'my_module/README.md'])
+        self.assertFalse(needs_reload(changed))
+        self.assertEqual(self._read('my_module/views/views.xml'), '<odoo><data/></odoo>')
+        self.assertFalse(os.path.exists(os.path.join(self.target, 'my_module/README.md')))
+
+        third = self._commit({'my_module/models/__init__.py': ''})
+        self.mirror.fetch()
+        _previous, changed = self.mirror.checkout(third, self.target)
+        self.assertEqual(changed, ['my_module/models/__init__.py'])
+        self.assertTrue(needs_reload(changed))
+
+        self.assertEqual(self.mirror.checkout(third, self.target), (third, []))
+
+    def test_empty_and_unknown_branch(self):
+        self.mirror.fetch()
+        self.assertIsNone(self.mirror.resolve('main'))
+        self._commit({'my_module/__manifest__.py': '{}'})
+        self.mirror.fetch()
+        self.assertIsNone(self.mirror.resolve('unknown'))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import jenkins
+from github import Github
+
+from odoo.tests import BaseCase, tagged
+
+from ..tools.provisioning import Provisioner, RateLimiter
+from ..tools.provisioning_stub import make_server
+
+JOB_CONFIG = '<project><description>%s</description></project>'
+
+
+@tagged('post_install', '-at_install')
+class TestProvisioner(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        server, self.state = make_server(owner='acme')
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.github = Github('acme', 'token', base_url=url)
+        self.jenkins = jenkins.Jenkins(url, username='admin', password='secret')
+
+    def _provisioner(self, **kwargs):
+        return Provisioner(self.github, self.jenkins, write_rate=0, **kwargs)
+
+    @staticmethod
+    def _provision(provisioner, name):
+        repo = provisioner.ensure_repo(name, f"Addons of {name}", {'url': f"https://example.com/{name}"})
+        provisioner.ensure_job(f"{name}_job", JOB_CONFIG % name)
+        return repo.full_name
+
+    def test_batch_lists_once(self):
+        self.state.repos['existing'] = {'id': 1, 'private': True, 'description': None}
+        names = ['existing', 'alpha', 'beta', 'gamma']
+
+        results = self._provisioner().run(names, self._provision)
+
+        self.assertEqual(results, {name: (True, f"acme/{name}") for name in names})
+        self.assertEqual(self.state.calls['GET', '/user/repos'], 1)
+        self.assertEqual(self.state.calls['GET', '/api/json'], 1)
+        self.assertEqual(self.state.calls['POST', '/user/repos'], 3)
+        self.assertEqual(self.state.calls['POST', '/createItem'], 4)
+        self.assertFalse(any(path.startswith('/repos/') for method, path in self.state.calls if method == 'GET'),
+                         "a batch must not look the repositories up one by one")
+        self.assertEqual(sorted(self.state.hooks), ['alpha', 'beta', 'gamma'])
+        self.assertEqual(sorted(self.state.jobs), [f"{name}_job" for name in sorted(names)])
+
+    def test_second_batch_reuses(self):
+        names = ['alpha', 'beta']
+        self._provisioner().run(names, self._provision)
+        self.state.jobs['alpha_job'] = '<project/>'
+
+        results = self._provisioner().run(names, self._provision)
+
+        self.assertTrue(all(ok for ok, _result in results.values()))
+        self.assertEqual(self.state.calls['POST', '/user/repos'], 2, "existing repositories are not created again")
+        self.assertEqual(self.state.calls['POST', '/createItem'], 2, "existing jobs are not created again")
+        self.assertEqual(self.state.calls['POST', '/job/alpha_job/config.xml'], 1)
+        self.assertEqual(self.state.jobs['alpha_job'], JOB_CONFIG % 'alpha', "existing jobs are reconfigured")
+        self.assertEqual({name: len(hooks) for name, hooks in self.state.hooks.items()}, {'alpha': 1, 'beta': 1})
+
+    def test_single_lookup(self):
+        self.state.repos['existing'] = {'id': 1, 'private': True, 'description': None}
+        provisioner = self._provisioner(prefetch=False)
+
+        self.assertEqual(provisioner.ensure_repo('existing', 'Addons').full_name, 'acme/existing')
+        self.assertEqual(self.state.calls['GET', '/repos/acme/existing'], 1)
+        self.assertFalse(self.state.calls['GET', '/user/repos'], "a single instance does not list every repository")
+        self.assertFalse(self.state.calls['POST', '/user/repos'])
+
+    def test_owner_filter(self):
+        self.state.repos['shared'] = {'id': 1, 'private': True, 'description': None, 'owner': 'other'}
+
+        self.assertNotIn('shared', self._provisioner()._existing_repos())
+        self.assertIsNone(self._provisioner(prefetch=False)._find_repo('shared'))
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(20)
+        calls = []
+
+        def call():
+            limiter.wait()
+            calls.append(time.monotonic())
+
+        threads = [threading.Thread(target=call) for _i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        calls.sort()
+        gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+        self.assertEqual(len(gaps), 3)
+        self.assertTrue(all(gap >= 0.04 for gap in gaps), gaps)
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from . import pool
+from . import backup_stream
+from . import docker_api
+from . import container_backend
+from . import docker_events
+from . import metrics
+from . import compose
+from . import archive
+from . import chunk_store
+from . import module_upload
+from . import module_index
+from . import git_sync
+from . import provisioning
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import tarfile
+
+# Top-level directories of a pg_dump backup archive, in archive order: the
+# database comes first so a restore can start pg_restore while the filestore
+# is still being unpacked.
+DUMP_PREFIX = 'dump'
+FILESTORE_PREFIX = 'filestore'
+METADATA_NAME = 'backup.json'
+
+
+def _prefixed(prefix, name):
+    while name.startswith('./'):
+        name = name[2:]
+    name = name.strip('/')
+    return f"{prefix}/{name}" if name and name != '.' else prefix
+
+
+def add_tar_stream(target, source, prefix):
+    """Copy every member of the tar stream ``source`` into ``target`` under ``prefix``.
+
+    ``source`` is read sequentially (e.g. a process stdout) and ``target``
+    may be a streaming ``w|`` tarfile, so nothing has to be seekable.
+    Returns the number of file bytes copied.
+    """
+    copied = 0
+    with tarfile.open(fileobj=source, mode='r|') as inner:
+        for member in inner:
+            member.name = _prefixed(prefix, member.name)
+            if member.islnk():
+                member.linkname = _prefixed(prefix, member.linkname)
+            fileobj = inner.extractfile(member) if member.isfile() else None
+            target.addfile(member, fileobj)
+            copied += member.size if member.isfile() else 0
+    return copied
+
+
+def add_json(target, name, data):
+    payload = json.dumps(data, indent=2, sort_keys=True).encode()
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    info.mode = 0o644
+    target.addfile(info, io.BytesIO(payload))
+
+
+class TarSplitter:
+    """Route the members of an archive to one streaming tarfile per top-level prefix.
+
+    ``open_target(prefix)`` returns a writable binary stream (e.g. the stdin
+    of an extracting process) the first time a prefix is met.
+    ``on_switch(prefix)`` is called when the archive moves past a prefix, so
+    work on that part can begin while the rest is still being read; it is
+    responsible for closing the stream of that prefix.
+    """
+
+    def __init__(self, open_target, on_switch=None):
+        self.open_target = open_target
+        self.on_switch = on_switch
+        self.metadata = {}
+        self._prefix = None
+        self._tar = None
+
+    def _switch(self, prefix):
+        if self._tar is not None:
+            self._tar.close()
+            if self.on_switch:
+                self.on_switch(self._prefix)
+        self._prefix = prefix
+        self._tar = tarfile.open(fileobj=self.open_target(prefix), mode='w|') if prefix else None
+
+    def split(self, source):
+        with tarfile.open(fileobj=source, mode='r|*') as archive:
+            for member in archive:
+                if member.name == METADATA_NAME:
+                    self.metadata = json.load(archive.extractfile(member))
+                    continue
+                prefix, _sep, rest = member.name.partition('/')
+                if prefix != self._prefix:
+                    self._switch(prefix)
+                member.name = rest or '.'
+                if member.islnk():
+                    member.linkname = member.linkname.partition('/')[2]
+                self._tar.addfile(member, archive.extractfile(member) if member.isfile() else None)
+        self._switch(None)
+        return self.metadata
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import tempfile
+import time
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupWriter:
+    """Write a backup archive to disk chunk by chunk.
+
+    Data goes to a hidden temporary file next to ``final_path`` while its
+    SHA-256 and size are computed on the fly; the file is atomically renamed
+    into place on success and removed on failure, so readers never see a
+    partial archive. ``progress_callback(bytes_written)`` is called at most
+    once every ``progress_interval`` seconds.
+    """
+
+    def __init__(self, final_path, progress_callback=None, progress_interval=5.0):
+        self.final_path = final_path
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = None
+        self._tmp_path = None
+        self._last_report = 0.0
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def open(self):
+        directory = os.path.dirname(self.final_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(self.final_path)}.", suffix='.partial', dir=directory
+        )
+        self._file = os.fdopen(fd, 'wb')
+        self._last_report = time.monotonic()
+        return self
+
+    def write(self, data):
+        if not data:
+            return 0
+        self._file.write(data)
+        self._digest.update(data)
+        self.size += len(data)
+        if self.progress_callback and time.monotonic() - self._last_report >= self.progress_interval:
+            self._last_report = time.monotonic()
+            self.progress_callback(self.size)
+        return len(data)
+
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.final_path)
+        self._tmp_path = None
+
+    def abort(self):
+        if self._file and not self._file.closed:
+            self._file.close()
+        if self._tmp_path and os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+        self._tmp_path = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
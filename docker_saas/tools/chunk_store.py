@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+import bisect
+import hashlib
+import io
+import itertools
+import json
+import os
+import tarfile
+import tempfile
+import time
+
+from .compression import EXTENSIONS, compress, decompress
+
+CHUNKS_DIR = 'chunks'
+MANIFESTS_DIR = 'manifests'
+MANIFEST_SUFFIX = '.json'
+# Upper bound of a chunk; tar members are cut at their own boundaries first
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+# Small tar members are packed together up to this size before a cut
+MIN_CHUNK_SIZE = 256 * 1024
+# Suffix of the chunks :meth:`ChunkStore.collect` is about to remove
+COLLECTING_SUFFIX = '.collecting'
+BLOCK = tarfile.BLOCKSIZE
+
+
+class ChunkStore:
+    """Content-addressed chunk repository shared by the backups of a directory.
+
+    Chunks are stored once under ``chunks/<2 hex>/<sha256>`` and each backup
+    is a manifest under ``manifests/`` listing its chunks in order, so a
+    backup only costs the chunks no other backup already holds. Writing a
+    chunk that exists only refreshes its mtime, which tells :meth:`collect`
+    that a running backup is still using it.
+
+    New chunks are compressed one by one with ``compression`` (the file
+    extension tells how), which keeps them shareable between backups.
+    """
+
+    def __init__(self, root, compression='none', level=None, threads=0):
+        self.root = root
+        self.compression = compression
+        self.level = level
+        self.threads = threads
+
+    def chunk_path(self, digest, compression='none'):
+        return os.path.join(self.root, CHUNKS_DIR, digest[:2], digest + EXTENSIONS[compression])
+
+    def _find_chunk(self, digest):
+        """Return (path, compression) of a stored chunk, or (None, None)"""
+        for compression in EXTENSIONS:
+            path = self.chunk_path(digest, compression)
+            if os.path.exists(path):
+                return path, compression
+        return None, None
+
+    def manifest_path(self, name):
+        return os.path.join(self.root, MANIFESTS_DIR, name + MANIFEST_SUFFIX)
+
+    def put(self, data):
+        """Store ``data`` unless already present; return (digest, bytes written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path, _compression = self._find_chunk(digest)
+        if path:
+            try:
+                os.utime(path)
+                return digest, 0
+            except FileNotFoundError:
+                # Being collected: store it again
+                pass
+        stored = compress(data, self.compression, self.level, self.threads)
+        _atomic_write(self.chunk_path(digest, self.compression), stored)
+        return digest, len(stored)
+
+    def get(self, digest):
+        path, compression = self._find_chunk(digest)
+        if not path:
+            raise FileNotFoundError(f"Chunk {digest} missing from {self.root}")
+        with open(path, 'rb') as f:
+            return decompress(f.read(), compression)
+
+    def write_manifest(self, name, manifest):
+        _atomic_write(self.manifest_path(name), json.dumps(manifest).encode())
+
+    def read_manifest(self, name):
+        with open(self.manifest_path(name), 'rb') as f:
+            return json.load(f)
+
+    def remove_manifest(self, name):
+        path = self.manifest_path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def collect(self, grace=86400):
+        """Remove the chunks no manifest references; return (chunks, bytes) freed.
+
+        Chunks touched during the last ``grace`` seconds are kept: they may
+        belong to a backup whose manifest is not written yet. A chunk is
+        renamed aside before being removed, and put back if a backup touched
+        it in the meantime; a backup touching it afterwards finds it gone and
+        writes it again.
+        """
+        referenced = set()
+        manifests_dir = os.path.join(self.root, MANIFESTS_DIR)
+        if os.path.isdir(manifests_dir):
+            for entry in os.scandir(manifests_dir):
+                if entry.name.endswith(MANIFEST_SUFFIX):
+                    with open(entry.path, 'rb') as f:
+                        referenced.update(digest for digest, _size in json.load(f)['chunks'])
+
+        removed = freed = 0
+        threshold = time.time() - grace
+        chunks_dir = os.path.join(self.root, CHUNKS_DIR)
+        if not os.path.isdir(chunks_dir):
+            return removed, freed
+        for bucket in os.scandir(chunks_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith('.'):
+                    # Chunks still being written, or set aside by an interrupted collection
+                    if entry.name.endswith(COLLECTING_SUFFIX) and entry.stat().st_mtime < threshold:
+                        os.remove(entry.path)
+                    continue
+                if entry.name.partition('.')[0] in referenced or entry.stat().st_mtime >= threshold:
+                    continue
+                aside = os.path.join(bucket.path, f'.{entry.name}{COLLECTING_SUFFIX}')
+                try:
+                    os.rename(entry.path, aside)
+                except FileNotFoundError:
+                    continue
+                stat = os.stat(aside)
+                if stat.st_mtime >= threshold:
+                    os.rename(aside, entry.path)
+                    continue
+                os.remove(aside)
+                removed += 1
+                freed += stat.st_size
+        return removed, freed
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.partial', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class TarChunker:
+    """Split a byte stream into chunks, cutting tar streams at member boundaries.
+
+    Consecutive small members (header and data) are packed into one chunk
+    until it reaches ``min_size``, the next member boundary then starts a
+    new one. A member of ``min_size`` or more always starts its own chunk,
+    so an unchanged attachment yields the same chunks whatever was added or
+    removed before it. Members larger than ``max_size`` and non-tar streams
+    are cut every ``max_size`` bytes.
+    """
+
+    def __init__(self, max_size=MAX_CHUNK_SIZE, min_size=MIN_CHUNK_SIZE):
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self._buffer = bytearray()
+        self._is_tar = None
+        self._header = bytearray()
+        # Bytes of member data (padding included) still expected; None after the end-of-archive block
+        self._remaining = 0
+
+    def feed(self, data):
+        """Consume ``data`` and return the chunks it completed"""
+        chunks = []
+        view = memoryview(data)
+        if self._is_tar is None:
+            self._header += view
+            if len(self._header) < BLOCK:
+                return chunks
+            view, self._header = memoryview(bytes(self._header)), bytearray()
+            self._is_tar = view[257:262].tobytes() == b'ustar'
+        if not self._is_tar:
+            self._append(view, chunks)
+            return chunks
+
+        while view:
+            if self._remaining is None:
+                self._append(view, chunks)
+                break
+            if self._remaining:
+                taken = view[:self._remaining]
+                self._append(taken, chunks)
+                self._remaining -= len(taken)
+                view = view[len(taken):]
+                continue
+            # Expecting a member header
+            missing = BLOCK - len(self._header)
+            self._header += view[:missing]
+            view = view[missing:]
+            if len(self._header) < BLOCK:
+                break
+            header, self._header = bytes(self._header), bytearray()
+            end = header == bytes(BLOCK)
+            size = 0 if end else tarfile.nti(header[124:136])
+            if self._buffer and (len(self._buffer) >= self.min_size or size >= self.min_size):
+                chunks.append(bytes(self._buffer))
+                self._buffer = bytearray()
+            self._buffer += header
+            if end:
+                self._remaining = None
+                continue
+            self._remaining = -(-size // BLOCK) * BLOCK
+        return chunks
+
+    def _append(self, data, chunks):
+        while data:
+            room = self.max_size - len(self._buffer)
+            self._buffer += data[:room]
+            data = data[room:]
+            if len(self._buffer) >= self.max_size:
+                chunks.append(bytes(self._buffer))
+                self._buffer = bytearray()
+
+    def flush(self):
+        """Return the last chunks once the stream is complete"""
+        rest = bytes(self._buffer) + bytes(self._header)
+        self._header, self._buffer = bytearray(), bytearray()
+        chunks = []
+        while rest:
+            chunks.append(rest[:self.max_size])
+            rest = rest[self.max_size:]
+        return chunks
+
+
+class RepositoryWriter:
+    """Drop-in for :class:`BackupWriter` storing the stream in a :class:`ChunkStore`.
+
+    Only chunks missing from the repository hit the disk (``stored_size``);
+    the manifest is written last, so an interrupted backup leaves no
+    manifest and its new chunks are collected later.
+    """
+
+    def __init__(self, store, name, progress_callback=None, progress_interval=5.0):
+        self.store = store
+        self.name = name
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.size = 0
+        self.stored_size = 0
+        # Bytes of the new chunks before compression
+        self.new_size = 0
+        self._digest = hashlib.sha256()
+        self._chunker = TarChunker()
+        self._chunks = []
+        self._last_report = 0.0
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def open(self):
+        self._last_report = time.monotonic()
+        return self
+
+    def write(self, data):
+        if not data:
+            return 0
+        self._digest.update(data)
+        self.size += len(data)
+        self._store(self._chunker.feed(data))
+        if self.progress_callback and time.monotonic() - self._last_report >= self.progress_interval:
+            self._last_report = time.monotonic()
+            self.progress_callback(self.size)
+        return len(data)
+
+    def _store(self, chunks):
+        for chunk in chunks:
+            digest, written = self.store.put(chunk)
+            self.stored_size += written
+            self.new_size += len(chunk) if written else 0
+            self._chunks.append((digest, len(chunk)))
+
+    def commit(self):
+        self._store(self._chunker.flush())
+        self.store.write_manifest(self.name, {
+            'size': self.size,
+            'sha256': self.sha256,
+            'chunks': self._chunks,
+        })
+
+    def abort(self):
+        self._chunks = []
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+class ManifestReader(io.RawIOBase):
+    """Read-only stream rebuilding a backup from its manifest, chunk by chunk.
+
+    Seeking only loads the chunk holding the new position, found from the
+    chunk sizes listed in the manifest.
+    """
+
+    def __init__(self, store, name):
+        super().__init__()
+        self.store = store
+        self._chunks = store.read_manifest(name)['chunks']
+        # Offset of every chunk in the backup, followed by its total size
+        self._starts = list(itertools.accumulate((size for _digest, size in self._chunks), initial=0))
+        self._index = None
+        self._current = b''
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._starts[-1]
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        index = bisect.bisect_right(self._starts, self._position) - 1
+        if index >= len(self._chunks):
+            return 0
+        if index != self._index:
+            self._current, self._index = self.store.get(self._chunks[index][0]), index
+        offset = self._position - self._starts[index]
+        size = min(len(buffer), len(self._current) - offset)
+        buffer[:size] = self._current[offset:offset + size]
+        self._position += size
+        return size
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+def check_compose_content(content, timeout=60):
+    """Run ``docker compose config`` on ``content``; return the error output, or None if valid.
+
+    Only touches a temporary file, so it can run from any thread.
+    """
+    fd, path = tempfile.mkstemp(prefix='docker-compose-', suffix='.yml')
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(content)
+        try:
+            result = subprocess.run(
+                ['docker', 'compose', '-f', path, 'config', '--quiet'],
+                capture_output=True, text=True, timeout=timeout,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return str(e)
+        if result.returncode:
+            return result.stderr or f"exit code {result.returncode}"
+        return None
+    finally:
+        os.unlink(path)
+
+
+def pull_images(images, env=None, timeout=1800):
+    """Pull the images missing from the Docker daemon, concurrently.
+
+    Images already present are not pulled again. Only runs processes, so
+    it can run from any thread. Returns ``(cmd, stdout, stderr)`` for every
+    pull run; raises RuntimeError naming the images that could not be pulled.
+    """
+    def pull(image):
+        present = subprocess.run(
+            ['docker', 'image', 'inspect', '--format', '{{.Id}}', image],
+            capture_output=True, text=True, env=env, timeout=timeout,
+        )
+        if not present.returncode:
+            return None
+        result = subprocess.run(['docker', 'pull', '--quiet', image],
+                                capture_output=True, text=True, env=env, timeout=timeout)
+        if result.returncode:
+            raise RuntimeError(f"docker pull {image} failed: {result.stderr.strip()}")
+        return f"docker pull --quiet {image}", result.stdout, result.stderr
+
+    images = list(dict.fromkeys(image for image in images if image))
+    if not images:
+        return []
+    with ThreadPoolExecutor(max_workers=len(images)) as executor:
+        futures = [executor.submit(pull, image) for image in images]
+    errors, logs = [], []
+    for future in futures:
+        try:
+            log = future.result()
+        except (OSError, subprocess.TimeoutExpired, RuntimeError) as e:
+            errors.append(str(e))
+            continue
+        if log:
+            logs.append(log)
+    if errors:
+        raise RuntimeError('\n'.join(errors))
+    return logs
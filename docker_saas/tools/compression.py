@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = [
+    ('none', 'None'),
+    ('gzip', 'gzip'),
+    ('zstd', 'Zstandard'),
+]
+EXTENSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_LEVELS = {'none': 0, 'gzip': 6, 'zstd': 3}
+
+
+def zstd_available():
+    return zstandard is not None
+
+
+class CompressingWriter:
+    """Compress everything written to it into the binary stream ``target``.
+
+    ``raw_size`` counts the bytes before compression. ``close`` flushes the
+    compressor but leaves ``target`` open. zstd runs ``threads`` workers
+    (0 compresses in the calling thread), gzip always uses one.
+    """
+
+    def __init__(self, target, method, level=None, threads=0):
+        self.target = target
+        self.method = method
+        self.raw_size = 0
+        self._stream = self._compressor = None
+        level = DEFAULT_LEVELS[method] if level is None else level
+        if method == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=level, threads=threads or 0)
+            self._stream = compressor.stream_writer(target, closefd=False)
+        elif method == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def write(self, data):
+        if not data:
+            return 0
+        self.raw_size += len(data)
+        if self._stream is not None:
+            self._stream.write(data)
+        elif self._compressor is not None:
+            self.target.write(self._compressor.compress(data))
+        else:
+            self.target.write(data)
+        return len(data)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.flush(zstandard.FLUSH_FRAME)
+            self._stream.close()
+            self._stream = None
+        elif self._compressor is not None:
+            self.target.write(self._compressor.flush())
+            self._compressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+def compress(data, method, level=None, threads=0):
+    """Compress a whole buffer (one repository chunk)"""
+    level = DEFAULT_LEVELS[method] if level is None else level
+    if method == 'zstd':
+        return zstandard.ZstdCompressor(level=level, threads=threads or 0).compress(data)
+    if method == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return data
+
+
+def decompress(data, method):
+    if method == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if method == 'gzip':
+        return gzip.decompress(data)
+    return data
+
+
+def open_decompressed(path, method):
+    """Open the file at ``path`` for reading its decompressed content"""
+    if method == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if method == 'gzip':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import abc
+import json
+import re
+import shlex
+
+from .docker_api import DockerAPIError
+from .docker_events import WATCHED_ACTIONS
+
+_SIZE_UNITS = {
+    'b': 1, 'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3, 'tb': 1000 ** 4,
+    'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3, 'tib': 1024 ** 4,
+}
+
+
+def parse_size(value):
+    """Convert CLI sizes such as '12.5MiB' or '1.2kB' to bytes"""
+    match = re.match(r'\s*([\d.]+)\s*([a-zA-Z]*)', value or '')
+    if not match:
+        return 0
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS.get(unit.lower() or 'b', 1))
+
+
+def parse_memory(value):
+    """Convert a compose memory value such as '512m' or '4g' to bytes, or None"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([bkmg]?)b?\s*', (value or '').lower())
+    if not match:
+        return None
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** 'bkmg'.index(unit or 'b'))
+
+
+def _split_pair(value):
+    left, _sep, right = (value or '').partition('/')
+    return parse_size(left), parse_size(right)
+
+
+class ContainerBackend(abc.ABC):
+    """Operations on existing containers, independent of how they are reached.
+
+    ``list_containers`` returns ``{name: {'id', 'state', 'status'}}`` and
+    ``stats`` returns a dict with ``cpu_percent``, ``mem_usage``,
+    ``mem_limit``, ``net_rx``, ``net_tx``, ``blk_read`` and ``blk_write``.
+    ``stats_many`` returns the same dicts for several running containers,
+    with the cumulative ``cpu_usec`` when the backend can read it.
+    """
+    name = None
+
+    @abc.abstractmethod
+    def list_containers(self):
+        pass
+
+    @abc.abstractmethod
+    def exists(self, name):
+        pass
+
+    @abc.abstractmethod
+    def start(self, names):
+        pass
+
+    @abc.abstractmethod
+    def stop(self, names):
+        pass
+
+    @abc.abstractmethod
+    def remove(self, names):
+        pass
+
+    @abc.abstractmethod
+    def restart(self, names):
+        pass
+
+    @abc.abstractmethod
+    def inspect(self, name):
+        pass
+
+    @abc.abstractmethod
+    def stats(self, name):
+        pass
+
+    @abc.abstractmethod
+    def stats_many(self, names):
+        pass
+
+    @abc.abstractmethod
+    def update(self, name, cpus, memory, memory_reservation=0):
+        """Change the CPU and memory limits of a running container in place.
+
+        The swap limit follows Docker's default of as much swap as memory.
+        """
+
+    @abc.abstractmethod
+    def events(self, since, until):
+        """Yield raw container events between the ``since`` and ``until`` timestamps"""
+
+
+class CliBackend(ContainerBackend):
+    """Shell out to the docker CLI through ``run(cmd) -> stdout``"""
+    name = 'cli'
+
+    def __init__(self, run):
+        self.run = run
+
+    def _names(self, names):
+        return ' '.join(shlex.quote(name) for name in names)
+
+    def list_containers(self):
+        output = self.run("docker ps -a --no-trunc --format '{{json .}}'")
+        containers = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            for name in data.get('Names', '').split(','):
+                containers[name] = {'id': data.get('ID'), 'state': data.get('State'), 'status': data.get('Status')}
+        return containers
+
+    def exists(self, name):
+        output = self.run(f"docker ps -a --filter name=^{shlex.quote(name)}$ --format '{{{{.Names}}}}'")
+        return name in output.split()
+
+    def start(self, names):
+        self.run(f"docker start {self._names(names)}")
+
+    def stop(self, names):
+        self.run(f"docker stop {self._names(names)}")
+
+    def remove(self, names):
+        self.run(f"docker rm {self._names(names)}")
+
+    def restart(self, names):
+        self.run(f"docker restart {self._names(names)}")
+
+    def inspect(self, name):
+        return json.loads(self.run(f"docker inspect {shlex.quote(name)}"))[0]
+
+    def stats(self, name):
+        data = json.loads(self.run(f"docker stats --no-stream --format '{{{{json .}}}}' {shlex.quote(name)}"))
+        return self._parse_stats(data)
+
+    def stats_many(self, names):
+        # A single docker process samples every running container at once
+        output = self.run("docker stats --no-stream --format '{{json .}}'")
+        wanted = set(names)
+        stats = {}
+        for line in output.splitlines():
+            if line.strip():
+                data = json.loads(line)
+                if data.get('Name') in wanted:
+                    stats[data['Name']] = self._parse_stats(data)
+        return stats
+
+    def update(self, name, cpus, memory, memory_reservation=0):
+        self.run(
+            f"docker update --cpus {cpus} --memory {memory} --memory-swap {memory * 2} "
+            f"--memory-reservation {memory_reservation} {shlex.quote(name)}"
+        )
+
+    def _parse_stats(self, data):
+        mem_usage, mem_limit = _split_pair(data.get('MemUsage'))
+        net_rx, net_tx = _split_pair(data.get('NetIO'))
+        blk_read, blk_write = _split_pair(data.get('BlockIO'))
+        return {
+            'cpu_percent': float((data.get('CPUPerc') or '0').rstrip('%') or 0),
+            'mem_usage': mem_usage,
+            'mem_limit': mem_limit,
+            'net_rx': net_rx,
+            'net_tx': net_tx,
+            'blk_read': blk_read,
+            'blk_write': blk_write,
+        }
+
+    def events(self, since, until):
+        filters = ' '.join(f"--filter event={action}" for action in WATCHED_ACTIONS)
+        output = self.run(
+            f"docker events --since {shlex.quote(str(since))} --until {shlex.quote(str(until))} "
+            f"--filter type=container {filters} --format '{{{{json .}}}}'"
+        )
+        for line in output.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+
+class EngineApiBackend(ContainerBackend):
+    """Talk to the daemon through a pooled :class:`DockerEngineClient`"""
+    name = 'api'
+
+    def __init__(self, client, log=None):
+        self.client = client
+        self.log = log or (lambda operation: None)
+
+    def list_containers(self):
+        self.log("GET /containers/json?all=true")
+        containers = {}
+        for data in self.client.containers(all=True):
+            for name in data.get('Names', []):
+                containers[name.lstrip('/')] = {
+                    'id': data.get('Id'),
+                    'state': data.get('State'),
+                    'status': data.get('Status'),
+                }
+        return containers
+
+    def exists(self, name):
+        try:
+            self.client.inspect(name)
+        except DockerAPIError as err:
+            if err.status == 404:
+                return False
+            raise
+        return True
+
+    def start(self, names):
+        for name in names:
+            self.log(f"POST /containers/{name}/start")
+            self.client.start(name)
+
+    def stop(self, names):
+        for name in names:
+            self.log(f"POST /containers/{name}/stop")
+            self.client.stop(name)
+
+    def remove(self, names):
+        for name in names:
+            self.log(f"DELETE /containers/{name}")
+            self.client.remove(name)
+
+    def restart(self, names):
+        for name in names:
+            self.log(f"POST /containers/{name}/restart")
+            self.client.restart(name)
+
+    def inspect(self, name):
+        return self.client.inspect(name)
+
+    def stats(self, name):
+        return self._parse_stats(self.client.stats(name))
+
+    def stats_many(self, names):
+        stats = {}
+        for name in names:
+            try:
+                stats[name] = self._parse_stats(self.client.stats(name, one_shot=True))
+            except DockerAPIError as err:
+                if err.status != 404:
+                    raise
+        return stats
+
+    def update(self, name, cpus, memory, memory_reservation=0):
+        self.log(f"POST /containers/{name}/update")
+        self.client.update(name, {
+            'NanoCpus': int(cpus * 10 ** 9),
+            'Memory': memory,
+            'MemorySwap': memory * 2,
+            'MemoryReservation': memory_reservation,
+        })
+
+    def _parse_stats(self, data):
+        cpu = data.get('cpu_stats', {})
+        precpu = data.get('precpu_stats', {})
+        cpu_delta = cpu.get('cpu_usage', {}).get('total_usage', 0) - precpu.get('cpu_usage', {}).get('total_usage', 0)
+        system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+        online_cpus = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or []) or 1
+        cpu_percent = cpu_delta / system_delta * online_cpus * 100.0 if system_delta > 0 and cpu_delta > 0 else 0.0
+
+        memory = data.get('memory_stats', {})
+        networks = (data.get('networks') or {}).values()
+        blkio = (data.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []
+        return {
+            'cpu_percent': cpu_percent,
+            'cpu_usec': cpu.get('cpu_usage', {}).get('total_usage', 0) // 1000,
+            'mem_usage': memory.get('usage', 0) - (memory.get('stats') or {}).get('inactive_file', 0),
+            'mem_limit': memory.get('limit', 0),
+            'net_rx': sum(net.get('rx_bytes', 0) for net in networks),
+            'net_tx': sum(net.get('tx_bytes', 0) for net in networks),
+            'blk_read': sum(entry.get('value', 0) for entry in blkio if entry.get('op', '').lower() == 'read'),
+            'blk_write': sum(entry.get('value', 0) for entry in blkio if entry.get('op', '').lower() == 'write'),
+        }
+
+    def events(self, since, until):
+        return self.client.stream('GET', '/events', params={
+            'since': since,
+            'until': until,
+            'filters': {'type': ['container'], 'event': list(WATCHED_ACTIONS)},
+        })
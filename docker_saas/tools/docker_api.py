@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import http.client
+import json
+import logging
+import queue
+import socket
+import threading
+from urllib.parse import quote, urlencode
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+API_VERSION = 'v1.41'
+
+
+class DockerAPIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 connection over the Docker daemon unix socket"""
+
+    def __init__(self, socket_path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerEngineClient:
+    """Minimal Docker Engine API client keeping a pool of keep-alive connections.
+
+    Connections are reused across requests (and threads), which avoids the
+    process start-up and YAML parsing cost of shelling out to the CLI.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, pool_size=8, timeout=60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    # --------------------------------------------------
+    # CONNECTIONS
+    # --------------------------------------------------
+    def _acquire(self, timeout=None):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        conn.timeout = timeout or self.timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(conn.timeout)
+        return conn
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def is_available(self):
+        try:
+            self._request('GET', '/_ping', raw=True)
+        except (OSError, DockerAPIError, http.client.HTTPException):
+            return False
+        return True
+
+    def _url(self, path, params=None):
+        url = f"/{API_VERSION}{path}"
+        if params:
+            url += '?' + urlencode({
+                key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                for key, value in params.items()
+                if value is not None
+            })
+        return url
+
+    def _request(self, method, path, params=None, body=None, raw=False, timeout=None):
+        headers = {'Host': 'docker'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        url = self._url(path, params)
+        # A pooled connection may have been closed by the daemon: retry once on a fresh one
+        for attempt in range(2):
+            conn = self._acquire(timeout)
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            break
+
+        if response.status >= 400:
+            try:
+                message = json.loads(data).get('message', data)
+            except ValueError:
+                message = data.decode(errors='replace')
+            raise DockerAPIError(response.status, message)
+        if raw or not data:
+            return data
+        return json.loads(data)
+
+    def stream(self, method, path, params=None, timeout=None):
+        """Yield the JSON documents of a streaming endpoint (events, stats)"""
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout or self.timeout)
+        try:
+            conn.request(method, self._url(path, params), headers={'Host': 'docker'})
+            response = conn.getresponse()
+            if response.status >= 400:
+                raise DockerAPIError(response.status, response.read().decode(errors='replace'))
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    # --------------------------------------------------
+    # CONTAINERS
+    # --------------------------------------------------
+    def containers(self, all=True, filters=None):
+        return self._request('GET', '/containers/json', params={
+            'all': 'true' if all else 'false',
+            'filters': filters,
+        })
+
+    def inspect(self, name):
+        return self._request('GET', f"/containers/{quote(name)}/json")
+
+    def start(self, name):
+        # Answers 304, not an error, when the container is already started
+        self._request('POST', f"/containers/{quote(name)}/start")
+
+    def stop(self, name, timeout=10):
+        # Answers 304, not an error, when the container is already stopped
+        self._request('POST', f"/containers/{quote(name)}/stop", params={'t': timeout},
+                      timeout=self.timeout + timeout)
+
+    def restart(self, name, timeout=10):
+        self._request('POST', f"/containers/{quote(name)}/restart", params={'t': timeout},
+                      timeout=self.timeout + timeout)
+
+    def update(self, name, resources):
+        return self._request('POST', f"/containers/{quote(name)}/update", body=resources)
+
+    def remove(self, name, force=False):
+        self._request('DELETE', f"/containers/{quote(name)}", params={'force': 'true' if force else 'false'})
+
+    def stats(self, name, one_shot=False):
+        """Single stats reading. ``one_shot`` skips the second sample used for ``precpu_stats``"""
+        return self._request('GET', f"/containers/{quote(name)}/stats", params={
+            'stream': 'false',
+            'one-shot': 'true' if one_shot else 'false',
+        })
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(socket_path=DEFAULT_SOCKET):
+    """Return the process-wide client of ``socket_path`` so its pool is shared"""
+    with _clients_lock:
+        client = _clients.get(socket_path)
+        if client is None:
+            client = _clients[socket_path] = DockerEngineClient(socket_path)
+        return client
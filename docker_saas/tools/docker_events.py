@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import time
+
+WATCHED_ACTIONS = ('start', 'die', 'oom', 'health_status')
+
+
+def parse_event(raw):
+    """Normalize a Docker container event, or return None if it is not watched.
+
+    Returns ``{'name', 'action', 'time_nano', 'exit_code', 'health'}``.
+    """
+    if (raw.get('Type') or 'container') != 'container':
+        return None
+    action = raw.get('Action') or raw.get('status') or ''
+    health = None
+    if action.startswith('health_status'):
+        action, _sep, health = action.partition(':')
+        health = health.strip() or None
+    if action not in WATCHED_ACTIONS:
+        return None
+    attributes = (raw.get('Actor') or {}).get('Attributes') or {}
+    name = attributes.get('name')
+    if not name:
+        return None
+    time_nano = raw.get('timeNano') or int(raw.get('time') or 0) * 10 ** 9
+    exit_code = attributes.get('exitCode')
+    return {
+        'name': name,
+        'action': action,
+        'time_nano': int(time_nano),
+        'exit_code': int(exit_code) if exit_code not in (None, '') else None,
+        'health': health,
+    }
+
+
+def format_since(time_nano):
+    """Docker ``since`` value resuming right after the event at ``time_nano``"""
+    time_nano += 1
+    return f"{time_nano // 10 ** 9}.{time_nano % 10 ** 9:09d}"
+
+
+class EventDebouncer:
+    """Collapse bursts of events per container.
+
+    A crash-looping container emits die/start pairs several times a second;
+    events are accumulated per container and only released once the
+    container has been quiet for ``window`` seconds. The summary keeps the
+    last action along with whether an OOM kill or a failing health check
+    happened during the burst.
+    """
+
+    def __init__(self, window=2.0, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._pending = {}
+
+    def feed(self, event):
+        summary = self._pending.get(event['name'])
+        if summary is None:
+            summary = self._pending[event['name']] = {
+                'name': event['name'],
+                'action': None,
+                'oom': False,
+                'exit_code': None,
+                'health': None,
+                'count': 0,
+            }
+        if event['action'] == 'health_status':
+            summary['health'] = event['health']
+        else:
+            summary['action'] = event['action']
+        if event['action'] == 'oom':
+            summary['oom'] = True
+        if event['exit_code'] is not None:
+            summary['exit_code'] = event['exit_code']
+        summary['count'] += 1
+        summary['time_nano'] = event['time_nano']
+        summary['seen_at'] = self.clock()
+
+    def flush(self, force=False):
+        """Return the summaries of containers quiet for at least ``window`` seconds"""
+        now = self.clock()
+        ready = [
+            name for name, summary in self._pending.items()
+            if force or now - summary['seen_at'] >= self.window
+        ]
+        return [self._pending.pop(name) for name in ready]
+
+    def __len__(self):
+        return len(self._pending)
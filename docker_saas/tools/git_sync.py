@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import base64
+import contextlib
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+# Per target directory state (index and deployed commit), kept in the mirror
+SYNC_DIR = 'docker-saas-sync'
+GIT_TIMEOUT = 600
+# Changes to these files need Odoo to be restarted to be picked up
+RELOAD_SUFFIXES = ('.py',)
+
+
+class GitError(Exception):
+    pass
+
+
+def _git(args, git_dir=None, env=None, timeout=GIT_TIMEOUT):
+    cmd = ['git'] + (['--git-dir', git_dir] if git_dir else []) + list(args)
+    try:
+        result = subprocess.run(cmd, capture_output=True, env=env, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise GitError(f"git {args[0]} failed: {e}") from e
+    if result.returncode:
+        raise GitError(f"git {args[0]} failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout.decode(errors='replace')
+
+
+def normalize_repo_url(url):
+    """Comparable form of a repository URL: host/owner/name, without scheme or credentials"""
+    url = (url or '').strip().lower()
+    url, scheme = re.subn(r'^[a-z+]+://', '', url)
+    url = re.sub(r'^[^@/]*@', '', url)
+    if scheme:
+        # Drop a port
+        url = re.sub(r'^([^/:]*):\d+/', r'\1/', url)
+    else:
+        # scp-like syntax: host:owner/name
+        url = url.replace(':', '/', 1)
+    url = url.rstrip('/')
+    return url[:-4] if url.endswith('.git') else url
+
+
+class GitMirror:
+    """Local bare mirror of the branches of a remote repository.
+
+    The first fetch clones the repository; later fetches only transfer the
+    objects the mirror is missing. Credentials are handed to git through
+    the environment as an HTTP header, never written to its config or shown
+    in a command line. Mirrors of different URLs live side by side in
+    ``root`` and concurrent fetches of the same mirror are serialized.
+    """
+
+    def __init__(self, root, url, auth=None):
+        self.root = root
+        self.url = url
+        self.auth = auth
+        self.path = os.path.join(root, hashlib.sha1(url.encode()).hexdigest() + '.git')
+
+    def _env(self):
+        env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        if self.auth:
+            token = base64.b64encode(':'.join(self.auth).encode()).decode()
+            env.update({
+                'GIT_CONFIG_COUNT': '1',
+                'GIT_CONFIG_KEY_0': 'http.extraHeader',
+                'GIT_CONFIG_VALUE_0': f'Authorization: Basic {token}',
+            })
+        return env
+
+    @contextlib.contextmanager
+    def locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def fetch(self):
+        with self.locked():
+            if not os.path.isdir(self.path):
+                tmp_path = tempfile.mkdtemp(prefix='.clone-', dir=self.root)
+                try:
+                    _git(['clone', '--bare', '--quiet', self.url, tmp_path], env=self._env())
+                    _git(['config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*'], git_dir=tmp_path)
+                    os.replace(tmp_path, self.path)
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                return
+            _git(['remote', 'set-url', 'origin', self.url], git_dir=self.path)
+            _git(['fetch', '--prune', '--quiet', 'origin'], git_dir=self.path, env=self._env())
+
+    def resolve(self, branch=None):
+        """Commit at the tip of ``branch`` (the default branch when empty), or None for an empty repository"""
+        ref = f'refs/heads/{branch}' if branch else 'HEAD'
+        try:
+            return _git(['rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}'], git_dir=self.path).strip() or None
+        except GitError:
+            return None
+
+    def has_commit(self, commit):
+        try:
+            _git(['cat-file', '-e', f'{commit}^{{commit}}'], git_dir=self.path)
+            return True
+        except GitError:
+            return False
+
+    def changed_paths(self, old, new):
+        """Paths differing between commits ``old`` and ``new``; every path of ``new`` without ``old``"""
+        if old and self.has_commit(old):
+            output = _git(['diff', '--name-only', '--no-renames', '-z', old, new], git_dir=self.path)
+        else:
+            output = _git(['ls-tree', '-r', '--name-only', '-z', new], git_dir=self.path)
+        return [path for path in output.split('\0') if path]
+
+    def checkout(self, commit, target):
+        """Bring the directory ``target`` to ``commit``, touching only what changed.
+
+        Each target has its own index in the mirror: git compares it to the
+        new tree and only writes, or removes, the files that differ from the
+        previously deployed commit. The first checkout into a directory
+        clears what it held, since those files are not tracked. Returns
+        (previous commit, changed paths).
+        """
+        state = os.path.join(self.path, SYNC_DIR, hashlib.sha1(os.path.realpath(target).encode()).hexdigest())
+        index_path, commit_path = state + '.index', state + '.commit'
+        previous = None
+        if os.path.exists(index_path) and os.path.exists(commit_path):
+            with open(commit_path) as f:
+                previous = f.read().strip() or None
+        if previous == commit:
+            return previous, []
+
+        os.makedirs(os.path.dirname(state), exist_ok=True)
+        os.makedirs(target, exist_ok=True)
+        if previous is None:
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            for entry in os.scandir(target):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+
+        env = dict(os.environ, GIT_INDEX_FILE=index_path, GIT_WORK_TREE=target)
+        _git(['read-tree', '--reset', '-u', commit], git_dir=self.path, env=env)
+        changed = self.changed_paths(previous, commit)
+        with open(commit_path + '.tmp', 'w') as f:
+            f.write(commit)
+        os.replace(commit_path + '.tmp', commit_path)
+        return previous, changed
+
+
+def needs_reload(paths):
+    return any(path.endswith(RELOAD_SUFFIXES) for path in paths)
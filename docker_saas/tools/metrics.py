@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+COUNTERS = ('net_rx', 'net_tx', 'blk_read', 'blk_write')
+
+# Where the docker cgroup of a container lives, for the systemd and cgroupfs drivers
+_CGROUP_LAYOUTS = (
+    'system.slice/docker-{id}.scope',
+    'docker/{id}',
+)
+
+
+def cgroup_v2_available(root=CGROUP_ROOT):
+    return os.path.exists(os.path.join(root, 'cgroup.controllers'))
+
+
+def find_container_cgroup(container_id, root=CGROUP_ROOT):
+    for layout in _CGROUP_LAYOUTS:
+        path = os.path.join(root, layout.format(id=container_id))
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _read_keyed(path):
+    values = {}
+    for line in _read(path).splitlines():
+        key, _sep, value = line.partition(' ')
+        values[key] = value
+    return values
+
+
+def read_cgroup_usage(path, proc_root='/proc'):
+    """Cumulative usage of the container whose cgroup v2 directory is ``path``.
+
+    Returns ``cpu_usec``, ``mem_usage``, ``mem_limit`` and the cumulative
+    ``net_rx``, ``net_tx``, ``blk_read``, ``blk_write`` byte counters.
+    Network counters come from the network namespace of the first process
+    of the cgroup.
+    """
+    usage = {'cpu_usec': int(_read_keyed(os.path.join(path, 'cpu.stat')).get('usage_usec', 0))}
+
+    memory = int(_read(os.path.join(path, 'memory.current')))
+    inactive_file = int(_read_keyed(os.path.join(path, 'memory.stat')).get('inactive_file', 0))
+    usage['mem_usage'] = memory - inactive_file
+    limit = _read(os.path.join(path, 'memory.max')).strip()
+    usage['mem_limit'] = 0 if limit == 'max' else int(limit)
+
+    usage['blk_read'] = usage['blk_write'] = 0
+    io_stat = os.path.join(path, 'io.stat')
+    if os.path.exists(io_stat):
+        for line in _read(io_stat).splitlines():
+            fields = dict(item.split('=', 1) for item in line.split()[1:] if '=' in item)
+            usage['blk_read'] += int(fields.get('rbytes', 0))
+            usage['blk_write'] += int(fields.get('wbytes', 0))
+
+    usage['net_rx'] = usage['net_tx'] = 0
+    pids = _read(os.path.join(path, 'cgroup.procs')).split()
+    if pids:
+        for line in _read(os.path.join(proc_root, pids[0], 'net', 'dev')).splitlines()[2:]:
+            interface, _sep, data = line.partition(':')
+            if interface.strip() == 'lo':
+                continue
+            values = data.split()
+            usage['net_rx'] += int(values[0])
+            usage['net_tx'] += int(values[8])
+    return usage
+
+
+class MetricsSampler:
+    """Turn cumulative usage readings into per-interval samples.
+
+    The first reading of a container only sets its baseline. Later readings
+    return the bytes transferred since the previous one and the CPU usage
+    over the interval, as a percentage of one core (like ``docker stats``).
+    A counter going backwards means the container restarted, in which case
+    the new value is counted as is.
+    """
+
+    def __init__(self):
+        self._previous = {}
+
+    def sample(self, name, usage, now):
+        previous = self._previous.get(name)
+        self._previous[name] = dict(usage, at=now)
+        if previous is None:
+            return None
+        elapsed = now - previous['at']
+        if elapsed <= 0:
+            return None
+
+        if usage.get('cpu_usec') is not None and previous.get('cpu_usec') is not None:
+            cpu_delta = usage['cpu_usec'] - previous['cpu_usec']
+            if cpu_delta < 0:
+                cpu_delta = usage['cpu_usec']
+            cpu_percent = cpu_delta / (elapsed * 10 ** 6) * 100.0
+        else:
+            cpu_percent = usage.get('cpu_percent') or 0.0
+
+        sample = {
+            'cpu_percent': cpu_percent,
+            'mem_usage': usage.get('mem_usage') or 0,
+            'mem_limit': usage.get('mem_limit') or 0,
+        }
+        for counter in COUNTERS:
+            delta = (usage.get(counter) or 0) - (previous.get(counter) or 0)
+            sample[counter] = delta if delta >= 0 else usage.get(counter) or 0
+        return sample
+
+    def forget(self, names):
+        """Drop the baselines of containers that are no longer running"""
+        for name in list(self._previous):
+            if name not in names:
+                del self._previous[name]
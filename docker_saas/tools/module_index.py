@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import ast
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from .module_upload import IGNORED_DIRS, IGNORED_SUFFIXES, module_digest
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_NAMES = ('__manifest__.py', '__openerp__.py')
+# Addons directories whose index is kept in memory
+MAX_CACHED_PATHS = 512
+
+
+def _manifest_path(path):
+    for name in MANIFEST_NAMES:
+        manifest_path = os.path.join(path, name)
+        if os.path.isfile(manifest_path):
+            return manifest_path
+    return None
+
+
+def _module_stamp(path, manifest_path):
+    """Modification times telling whether a module must be indexed again"""
+    return os.stat(path).st_mtime_ns, os.stat(manifest_path).st_mtime_ns
+
+
+def _read_manifest(path):
+    manifest_path = _manifest_path(path)
+    if manifest_path is None:
+        return None
+    with open(manifest_path, 'rb') as f:
+        return ast.literal_eval(f.read().decode())
+
+
+def _directory_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+        size += sum(
+            os.lstat(os.path.join(root, name)).st_size
+            for name in files if not name.endswith(IGNORED_SUFFIXES)
+        )
+    return size
+
+
+def index_module(path):
+    """Describe the module directory at ``path`` from its manifest and content"""
+    entry = {
+        'name': os.path.basename(path),
+        'title': False,
+        'version': False,
+        'depends': [],
+        'installable': False,
+        'size': _directory_size(path),
+        'hash': module_digest(path),
+    }
+    try:
+        manifest = _read_manifest(path)
+    except (SyntaxError, ValueError, UnicodeDecodeError) as exc:
+        _logger.warning("Unreadable manifest in %s: %s", path, exc)
+        entry['error'] = str(exc)
+        return entry
+    if manifest is not None:
+        entry.update({
+            'title': manifest.get('name') or entry['name'],
+            'version': manifest.get('version') or False,
+            'depends': list(manifest.get('depends') or []),
+            'installable': bool(manifest.get('installable', True)),
+        })
+    return entry
+
+
+class ModuleIndex:
+    """In-memory catalog of the module directories of addons paths.
+
+    Only directories holding a manifest are modules: others, like the
+    ``git_addons`` checkout, are neither hashed nor listed. A path is
+    listed again only when the modification time of the directory
+    changes, which every module added, removed or replaced through an
+    upload (a rename) does. Each module keeps its entry while
+    its own directory and manifest are unchanged, so only new or replaced
+    modules have their manifest parsed and their content hashed again.
+    ``etag`` identifies a listing for conditional requests.
+    """
+
+    def __init__(self, max_paths=MAX_CACHED_PATHS):
+        self.max_paths = max_paths
+        self._lock = threading.Lock()
+        # path -> (directory mtime, {module: (stamp, entry)}, modules, etag)
+        self._cache = collections.OrderedDict()
+
+    def get(self, addons_path):
+        """Return (modules, etag) for ``addons_path``"""
+        addons_path = os.path.realpath(addons_path)
+        if not os.path.isdir(addons_path):
+            return [], self._etag([])
+        mtime = os.stat(addons_path).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(addons_path)
+            if cached:
+                self._cache.move_to_end(addons_path)
+        if cached and cached[0] == mtime:
+            return cached[2], cached[3]
+
+        previous = cached[1] if cached else {}
+        entries = {}
+        for dir_entry in sorted(os.scandir(addons_path), key=lambda e: e.name):
+            if dir_entry.name.startswith('.') or not dir_entry.is_dir():
+                continue
+            manifest_path = _manifest_path(dir_entry.path)
+            if manifest_path is None:
+                continue
+            try:
+                stamp = _module_stamp(dir_entry.path, manifest_path)
+                known = previous.get(dir_entry.name)
+                entry = known[1] if known and known[0] == stamp else index_module(dir_entry.path)
+            except FileNotFoundError:
+                # Replaced or removed while being listed
+                continue
+            entries[dir_entry.name] = (stamp, entry)
+        modules = [entry for _stamp, entry in entries.values()]
+        etag = self._etag(modules)
+
+        with self._lock:
+            self._cache[addons_path] = (mtime, entries, modules, etag)
+            self._cache.move_to_end(addons_path)
+            while len(self._cache) > self.max_paths:
+                self._cache.popitem(last=False)
+        return modules, etag
+
+    @staticmethod
+    def _etag(modules):
+        payload = json.dumps(modules, sort_keys=True).encode()
+        return hashlib.sha256(payload).hexdigest()[:32]
+
+
+# Shared by the requests of a server process
+module_index = ModuleIndex()
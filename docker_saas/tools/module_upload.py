@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import zipfile
+
+from .backup_stream import CHUNK_SIZE
+
+META_NAME = 'upload.json'
+DATA_NAME = 'upload.part'
+# Transfers left unfinished longer than this are removed
+STALE_UPLOAD_SECONDS = 24 * 3600
+# Written by the running server, not part of a module's content
+IGNORED_DIRS = {'__pycache__'}
+IGNORED_SUFFIXES = ('.pyc', '.pyo')
+
+
+class UploadError(Exception):
+    """Rejected upload; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUpload:
+    """Server side of FilePond's chunked upload protocol.
+
+    A transfer lives in ``<root>/<id>/`` with the metadata given when it was
+    opened and the data received so far. Chunks are written at the offset
+    the client sends and ``offset`` only moves once a chunk has been fully
+    received, so after a disconnect the client resumes from the last whole
+    chunk and its retry overwrites any partial attempt.
+    """
+
+    def __init__(self, root, transfer_id):
+        if not transfer_id or not all(c in '0123456789abcdef' for c in transfer_id):
+            raise UploadError("Invalid transfer id", status=404)
+        self.root = root
+        self.transfer_id = transfer_id
+        self.path = os.path.join(root, transfer_id)
+
+    @classmethod
+    def open(cls, root, length, metadata):
+        cls.cleanup(root)
+        upload = cls(root, uuid.uuid4().hex)
+        os.makedirs(upload.path)
+        upload._write_metadata(dict(metadata, length=length, offset=0))
+        open(upload.data_path, 'wb').close()
+        return upload
+
+    def _write_metadata(self, metadata):
+        tmp_path = os.path.join(self.path, f'.{META_NAME}')
+        with open(tmp_path, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, os.path.join(self.path, META_NAME))
+
+    @classmethod
+    def cleanup(cls, root, max_age=STALE_UPLOAD_SECONDS):
+        if not os.path.isdir(root):
+            return
+        threshold = time.time() - max_age
+        for entry in os.scandir(root):
+            if entry.is_dir() and entry.stat().st_mtime < threshold:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    @property
+    def data_path(self):
+        return os.path.join(self.path, DATA_NAME)
+
+    @property
+    def metadata(self):
+        try:
+            with open(os.path.join(self.path, META_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Unknown transfer", status=404)
+
+    @property
+    def offset(self):
+        return self.metadata['offset']
+
+    def write_chunk(self, offset, size, stream):
+        """Write the ``size`` bytes chunk read from ``stream`` at ``offset``.
+
+        Returns True once the whole upload has been received.
+        """
+        metadata = self.metadata
+        if offset > metadata['offset']:
+            raise UploadError("Chunk offset beyond received data", status=409)
+        if offset + size > metadata['length']:
+            raise UploadError("Upload larger than announced", status=413)
+        with open(self.data_path, 'r+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            remaining = size
+            while remaining:
+                data = stream.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                remaining -= len(data)
+        if remaining:
+            raise UploadError("Incomplete chunk", status=400)
+        metadata['offset'] = offset + size
+        self._write_metadata(metadata)
+        return metadata['offset'] == metadata['length']
+
+    def discard(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _member_target(root, name):
+    """Absolute extraction path of archive member ``name``, refusing paths escaping ``root``"""
+    target = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, target]) != root:
+        raise UploadError(f"Unsafe path in archive: {name}")
+    return target
+
+
+def module_digest(path):
+    """SHA-256 of the files below ``path`` (relative names and content).
+
+    Bytecode caches are left out, so a module compiled by the running
+    server still matches the archive it came from.
+    """
+    digest = hashlib.sha256()
+    if not os.path.isdir(path):
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(data)
+        return digest.hexdigest()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS)
+        for name in sorted(files):
+            if name.endswith(IGNORED_SUFFIXES):
+                continue
+            full_path = os.path.join(root, name)
+            digest.update(os.path.relpath(full_path, path).encode() + b'\0')
+            if os.path.islink(full_path):
+                digest.update(os.readlink(full_path).encode() + b'\0')
+                continue
+            with open(full_path, 'rb') as f:
+                for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    digest.update(data)
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def extract_modules(zip_path, addons_path, max_size, max_entries):
+    """Extract the module archive at ``zip_path`` into ``addons_path``.
+
+    The entry count and declared sizes are checked before anything is
+    written, and the bytes actually inflated are counted while extracting
+    member by member. Members are unpacked into a staging directory first;
+    each top-level directory whose content differs from the installed one
+    then replaces it in one rename. Returns the names of the top-level
+    entries that changed, so re-uploading identical modules is a no-op.
+    """
+    addons_path = os.path.realpath(addons_path)
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        raise UploadError("Invalid ZIP archive")
+    with archive:
+        members = [info for info in archive.infolist() if not info.filename.startswith('__MACOSX/')]
+        if len(members) > max_entries:
+            raise UploadError(f"Archive has more than {max_entries} entries")
+        if sum(info.file_size for info in members) > max_size:
+            raise UploadError(f"Archive expands to more than {max_size // 1024 ** 2} MiB")
+
+        staging = os.path.join(addons_path, f'.extract-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+        try:
+            inflated = 0
+            for info in members:
+                target = _member_target(staging, info.filename)
+                # Symbolic links are not extracted
+                if (info.external_attr >> 16) & 0o170000 == 0o120000:
+                    continue
+                if info.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(info) as source, open(target, 'wb') as destination:
+                    while True:
+                        data = source.read(CHUNK_SIZE)
+                        if not data:
+                            break
+                        inflated += len(data)
+                        if inflated > max_size:
+                            raise UploadError(f"Archive expands to more than {max_size // 1024 ** 2} MiB")
+                        destination.write(data)
+
+            changed = []
+            for name in sorted(name for name in os.listdir(staging) if not name.startswith('.')):
+                source = os.path.join(staging, name)
+                destination = os.path.join(addons_path, name)
+                if (os.path.exists(destination) and not os.path.islink(destination)
+                        and os.path.isdir(destination) == os.path.isdir(source)
+                        and module_digest(destination) == module_digest(source)):
+                    continue
+                if os.path.isdir(destination) and not os.path.islink(destination):
+                    shutil.rmtree(destination)
+                elif os.path.lexists(destination):
+                    os.remove(destination)
+                os.replace(source, destination)
+                changed.append(name)
+            return changed
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import api
+
+_logger = logging.getLogger(__name__)
+
+
+def _interleave(items, key):
+    """Order items round-robin by key so one busy key does not hold every worker."""
+    buckets = defaultdict(list)
+    for item in items:
+        buckets[key(item)].append(item)
+    ordered = []
+    queues = list(buckets.values())
+    while queues:
+        for queue in list(queues):
+            ordered.append(queue.pop(0))
+            if not queue:
+                queues.remove(queue)
+    return ordered
+
+
+def run_in_threads(env, items, func, max_workers=4, limits=()):
+    """Run ``func(env, item)`` for every item, each in its own cursor.
+
+    Every call gets a fresh environment bound to a dedicated cursor that is
+    committed when ``func`` returns and rolled back when it raises, so one
+    failing item never affects the others. ``limits`` is a sequence of
+    ``(key, limit)`` pairs capping how many items sharing the same key
+    (e.g. a Docker host or a disk) run at the same time.
+
+    Returns a dict mapping each item to ``(ok, result_or_exception)``.
+    """
+    items = list(items)
+    if not items:
+        return {}
+
+    registry = env.registry
+    uid, context = env.uid, dict(env.context)
+    dbname = env.cr.dbname
+    limits = [(key, limit) for key, limit in limits if limit and limit > 0]
+    semaphores = [
+        defaultdict(lambda limit=limit: threading.BoundedSemaphore(limit))
+        for _key, limit in limits
+    ]
+    semaphores_lock = threading.Lock()
+
+    def _call(item):
+        threading.current_thread().dbname = dbname
+        # Always acquired in the same order, so limits cannot deadlock each other
+        with semaphores_lock:
+            acquired = [pool[key(item)] for (key, _limit), pool in zip(limits, semaphores)]
+        for semaphore in acquired:
+            semaphore.acquire()
+        try:
+            with registry.cursor() as cr:
+                return func(api.Environment(cr, uid, context), item)
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    if limits:
+        items = _interleave(items, limits[0][0])
+
+    results = {}
+    if registry.in_test_mode() or max_workers <= 1:
+        # Test cursors share a single connection: stay sequential.
+        for item in items:
+            try:
+                results[item] = (True, _call(item))
+            except Exception as exc:
+                _logger.exception("Threaded task failed for %s", item)
+                results[item] = (False, exc)
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='docker_saas') as executor:
+        futures = {executor.submit(_call, item): item for item in items}
+        for future, item in futures.items():
+            try:
+                results[item] = (True, future.result())
+            except Exception as exc:
+                _logger.exception("Threaded task failed for %s", item)
+                results[item] = (False, exc)
+    return results
+
+
+def run_parallel(tasks, max_workers=None):
+    """Run the callables of ``tasks`` ({name: func}) concurrently, without any cursor.
+
+    Meant for network and process calls only: ``func`` must not touch the
+    ORM. Returns ``{name: (ok, result_or_exception, seconds)}``.
+    """
+    def _timed(func):
+        started = time.monotonic()
+        try:
+            return True, func(), time.monotonic() - started
+        except Exception as exc:
+            return False, exc, time.monotonic() - started
+
+    if not tasks:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks), thread_name_prefix='docker_saas') as executor:
+        futures = {name: executor.submit(_timed, func) for name, func in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from github import Github, UnknownObjectException
+import jenkins
+
+_logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = 'https://api.github.com'
+# GitHub asks integrations to space out content-creating requests
+GITHUB_WRITES_PER_SECOND = 1.0
+HTTP_POOL_SIZE = 10
+JENKINS_TIMEOUT = 30
+
+JenkinsNotFound = getattr(jenkins, 'NotFoundException', Exception)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _cached_client(key, factory):
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory()
+        return client
+
+
+def get_github_client(user, token, base_url=GITHUB_API_URL):
+    """Authenticated GitHub client shared by the process for these credentials.
+
+    Its HTTP session keeps connections to the API open between calls and
+    between threads.
+    """
+    base_url = (base_url or GITHUB_API_URL).rstrip('/')
+    return _cached_client(
+        ('github', base_url, user, token),
+        lambda: Github(user, token, base_url=base_url, pool_size=HTTP_POOL_SIZE),
+    )
+
+
+def get_jenkins_client(url, username, password, timeout=JENKINS_TIMEOUT):
+    """Jenkins client shared by the process for these credentials (one pooled session)"""
+    return _cached_client(
+        ('jenkins', url, username, password),
+        lambda: jenkins.Jenkins(url, username=username, password=password, timeout=timeout),
+    )
+
+
+class RateLimiter:
+    """Space calls shared by several threads at most ``rate`` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Provisioner:
+    """Create the GitHub repositories and Jenkins jobs of many instances at once.
+
+    Existing repositories and jobs are listed once for the whole batch
+    instead of being probed one by one (a single instance, with
+    ``prefetch=False``, is looked up directly), and the batch runs on
+    ``max_workers`` threads sharing the clients. Requests creating content
+    on GitHub are spaced to stay under its secondary rate limits. Only
+    network calls happen here: no database access, so it is safe to run
+    outside of a cursor.
+    """
+
+    def __init__(self, github, jenkins_server=None, max_workers=4, write_rate=GITHUB_WRITES_PER_SECOND,
+                 prefetch=True):
+        self.github = github
+        self.jenkins = jenkins_server
+        self.prefetch = prefetch
+        self.max_workers = max(max_workers, 1)
+        self.github_writes = RateLimiter(write_rate)
+        self._lock = threading.Lock()
+        self._user = None
+        self._repos = None
+        self._jobs = None
+
+    @property
+    def user(self):
+        with self._lock:
+            if self._user is None:
+                self._user = self.github.get_user()
+            return self._user
+
+    def _existing_repos(self):
+        user = self.user
+        with self._lock:
+            if self._repos is None:
+                # Repositories of organizations or shared with the user may carry the same names
+                self._repos = {
+                    repo.name: repo for repo in user.get_repos(type='owner')
+                    if repo.owner.login == user.login
+                }
+            return self._repos
+
+    def _existing_jobs(self):
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = {job['name'] for job in self.jenkins.get_jobs()}
+            return self._jobs
+
+    def _find_repo(self, name):
+        if self.prefetch:
+            return self._existing_repos().get(name)
+        user = self.user
+        try:
+            repo = self.github.get_repo(f"{user.login}/{name}")
+        except UnknownObjectException:
+            return None
+        return repo if repo.owner.login == user.login else None
+
+    def _job_exists(self, name):
+        if self.prefetch:
+            return name in self._existing_jobs()
+        return bool(self.jenkins.job_exists(name))
+
+    def ensure_repo(self, name, description, hook_config=None):
+        """Return the repository ``name``, created as a private one when missing"""
+        repo = self._find_repo(name)
+        if repo is not None:
+            _logger.info("GitHub repository %s already exists; reusing.", name)
+            return repo
+        self.github_writes.wait()
+        repo = self.user.create_repo(name, description=description, private=True)
+        _logger.info("Created GitHub repository %s", repo.clone_url)
+        if self._repos is not None:
+            with self._lock:
+                self._repos[name] = repo
+        if hook_config and hook_config.get('url'):
+            try:
+                self.github_writes.wait()
+                repo.create_hook(
+                    name="web",
+                    config=dict(hook_config, content_type="json"),
+                    events=["push", "pull_request"],
+                    active=True,
+                )
+                _logger.info("Configured webhook for repository %s", name)
+            except Exception as hook_error:
+                _logger.warning("Failed to configure webhook for repo %s: %s", name, hook_error)
+        return repo
+
+    def ensure_job(self, name, config_xml):
+        if self._job_exists(name):
+            self.jenkins.reconfig_job(name, config_xml)
+            _logger.info("Updated existing Jenkins job %s", name)
+            return
+        try:
+            self.jenkins.create_job(name, config_xml)
+        except jenkins.JenkinsException:
+            # Created since the jobs were listed
+            self.jenkins.reconfig_job(name, config_xml)
+        _logger.info("Created Jenkins job %s", name)
+        if self._jobs is not None:
+            with self._lock:
+                self._jobs.add(name)
+
+    def run(self, items, func):
+        """Call ``func(self, item)`` for every item concurrently.
+
+        Returns a dict mapping each item to ``(ok, result_or_exception)``.
+        """
+        items = list(items)
+        results = {}
+        if not items:
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)),
+                                thread_name_prefix='docker_saas_provision') as executor:
+            futures = {executor.submit(func, self, item): item for item in items}
+            for future, item in futures.items():
+                try:
+                    results[item] = (True, future.result())
+                except Exception as exc:
+                    _logger.error("Provisioning failed for %s: %s", item, exc)
+                    results[item] = (False, exc)
+        return results
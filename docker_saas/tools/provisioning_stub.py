@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Offline stand-in for the GitHub and Jenkins APIs used by provisioning.
+
+Implements the few endpoints :mod:`provisioning` calls, in memory::
+
+    python provisioning_stub.py --port 8765 --owner acme
+
+then point the "GitHub API URL" and "Jenkins URL" settings at
+``http://localhost:8765``. ``--latency`` adds a delay to every request to
+mimic a remote API when measuring batch provisioning.
+"""
+import argparse
+import collections
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubState:
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.repos = {}
+        self.hooks = {}
+        self.jobs = {}
+        self.requests = 0
+        # Requests per (method, path), e.g. ('GET', '/user/repos')
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def base_url(self):
+        return f"http://{self.headers.get('Host') or '%s:%s' % self.server.server_address}"
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, payload=None, content_type='application/json'):
+        if payload is None:
+            data = b''
+        elif isinstance(payload, (bytes, str)):
+            data = payload.encode() if isinstance(payload, str) else payload
+        else:
+            data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _repo_json(self, name, repo):
+        # Repositories may belong to someone else, like those shared with the user
+        owner = repo.get('owner') or self.state.owner
+        url = f"{self.base_url}/repos/{owner}/{name}"
+        return {
+            'id': repo['id'],
+            'name': name,
+            'full_name': f"{owner}/{name}",
+            'owner': {'login': owner, 'id': 1, 'type': 'User', 'url': f"{self.base_url}/users/{owner}"},
+            'private': repo['private'],
+            'description': repo['description'],
+            'url': url,
+            'hooks_url': f"{url}/hooks",
+            'html_url': f"{self.base_url}/{owner}/{name}",
+            'clone_url': f"{self.base_url}/{owner}/{name}.git",
+            'default_branch': 'main',
+        }
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/') or '/'
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.calls[method, path] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        query = parse_qs(url.query)
+        body = self._body() if method == 'POST' else b''
+        owner = self.state.owner
+
+        # ---- GitHub ----
+        if method == 'GET' and path == '/user':
+            return self._send(200, {'login': owner, 'id': 1, 'type': 'User', 'url': f"{self.base_url}/users/{owner}"})
+        if method == 'GET' and path == '/user/repos':
+            with self.state.lock:
+                repos = list(self.state.repos.items())
+            return self._send(200, [self._repo_json(name, repo) for name, repo in repos])
+        if method == 'POST' and path == '/user/repos':
+            data = json.loads(body or b'{}')
+            name = data.get('name')
+            with self.state.lock:
+                if name in self.state.repos:
+                    return self._send(422, {'message': 'Repository creation failed.',
+                                            'errors': [{'message': 'name already exists on this account'}]})
+                repo = self.state.repos[name] = {
+                    'id': len(self.state.repos) + 1,
+                    'private': bool(data.get('private')),
+                    'description': data.get('description'),
+                }
+            return self._send(201, self._repo_json(name, repo))
+        match = re.fullmatch(r'/repos/([^/]+)/([^/]+)(/hooks)?', path)
+        if match and match.group(1) == owner:
+            name, hooks = match.group(2), match.group(3)
+            with self.state.lock:
+                repo = self.state.repos.get(name)
+            if repo is None:
+                return self._send(404, {'message': 'Not Found'})
+            if not hooks and method == 'GET':
+                return self._send(200, self._repo_json(name, repo))
+            if hooks and method == 'POST':
+                data = json.loads(body or b'{}')
+                with self.state.lock:
+                    hook_list = self.state.hooks.setdefault(name, [])
+                    hook = dict(data, id=len(hook_list) + 1, url=f"{self.base_url}{path}/{len(hook_list) + 1}")
+                    hook_list.append(hook)
+                return self._send(201, hook)
+
+        # ---- Jenkins ----
+        if method == 'GET' and path == '/crumbIssuer/api/json':
+            return self._send(404, {})
+        if method == 'GET' and path == '/api/json':
+            with self.state.lock:
+                names = sorted(self.state.jobs)
+            return self._send(200, {'jobs': [
+                {'name': name, 'url': f"{self.base_url}/job/{name}/", 'color': 'notbuilt',
+                 '_class': 'hudson.model.FreeStyleProject'}
+                for name in names
+            ]})
+        if method == 'POST' and path == '/createItem':
+            name = (query.get('name') or [''])[0]
+            with self.state.lock:
+                if name in self.state.jobs:
+                    return self._send(400, 'A job already exists with the name', 'text/plain')
+                self.state.jobs[name] = body.decode()
+            return self._send(200, '', 'text/plain')
+        match = re.fullmatch(r'/job/([^/]+)/(api/json|config\.xml)', path)
+        if match:
+            name, resource = match.groups()
+            with self.state.lock:
+                config = self.state.jobs.get(name)
+                if config is not None and method == 'POST' and resource == 'config.xml':
+                    self.state.jobs[name] = body.decode()
+            if config is None:
+                return self._send(404, 'Not Found', 'text/plain')
+            if resource == 'api/json':
+                return self._send(200, {'name': name, 'url': f"{self.base_url}/job/{name}/"})
+            if method == 'GET':
+                return self._send(200, config, 'application/xml')
+            return self._send(200, '', 'text/plain')
+
+        return self._send(404, {'message': 'Not Found'})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+def make_server(port=0, owner='stub', latency=0.0, host='127.0.0.1'):
+    """Return a stub server (not started) and its in-memory state"""
+    state = StubState(owner)
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state, 'latency': latency})
+    return ThreadingHTTPServer((host, port), handler), state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--owner', default='stub')
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    args = parser.parse_args()
+    server, _state = make_server(args.port, args.owner, args.latency, args.host)
+    print(f"GitHub / Jenkins stub listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()